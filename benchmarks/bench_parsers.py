@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+MICRO-BENCHMARKS FOR THE INDEX_02 PARSERS
+Times split_into_enhanced_clauses, iter_enhanced_clauses, detect_markdown_table,
+extract_table_data, extract_definitions_from_text and
+create_synthetic_sentences_from_table on generated inputs:
+- small / large documents (benchmarks/synth_corpus.py generator)
+- pathological inputs: a huge table, thousands of definitions, many
+  tables in one clause, no numbered sections
+- Reports median ns per input line and tracemalloc peak bytes per case
+- Scaling check: every case also runs at 1/4 size; the fitted exponent
+  (time ~ lines^e) is ~1 for linear code and ~2 for quadratic code
+- Equivalence check: iter_enhanced_clauses must produce exactly the
+  chunks and facts of split_into_enhanced_clauses on every generated
+  input and every document in cache/
+- Baselines in benchmarks/baselines/parsers.json (--update-baseline);
+  exit 1 when a case gets slower than the tolerance allows or its
+  exponent climbs past --max-exponent (or the splitters disagree), exit 2 when the parsers can't load
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_test import git_revision
+from utils.doc_cache import is_cache_file, read_cache
+from synth_corpus import generate_document, make_table, make_definitions, make_paragraph, make_terms
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+BASELINE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "parsers.json")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+REPORT_SCHEMA = 1
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_SETUP_ERROR = 2
+
+# Fraction of the full size used for the scaling run
+SCALING_FACTOR = 4
+
+# --- Inputs (each builder takes a size and returns markdown text) ---
+
+def build_document(clauses, seed=0):
+    text, _, _ = generate_document(random.Random(seed), 0, clauses,
+                                   table_density=0.1, definition_density=0.5)
+    return text
+
+def build_huge_table(rows, seed=0):
+    rng = random.Random(seed)
+    lines = ["## 1. KEY COMMERCIAL TERMS", "", "| Subject | Key Information |", "|---|---|"]
+    for i in range(rows):
+        lines.append(f"| **Item {i} Rate** | {rng.randint(1, 99)}% per annum |")
+    return "\n".join(lines)
+
+def build_definitions(count, seed=0):
+    rng = random.Random(seed)
+    lines = ["## 1. DEFINITIONS AND INTERPRETATION", ""]
+    lines.extend(make_definitions(rng, make_terms(rng, count), 10))
+    return "\n".join(lines)
+
+def build_many_tables(tables, seed=0):
+    """One clause holding `tables` small tables (summaries are prepended per table)"""
+    rng = random.Random(seed)
+    lines = ["## 1. SCHEDULE OF RATES", ""]
+    for _ in range(tables):
+        lines.extend([make_paragraph(rng, [], 10, 1), ""])
+        lines.extend(make_table(rng, 4) + [""])
+    return "\n".join(lines)
+
+def build_unnumbered(paragraphs, seed=0):
+    """No `## N.` headings - exercises the full scan before the fallback"""
+    rng = random.Random(seed)
+    lines = ["# AGREEMENT", ""]
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            lines.extend([f"## Part {chr(65 + (i // 20) % 26)}", ""])
+        lines.extend([make_paragraph(rng, [], 10, 3), ""])
+    return "\n".join(lines)
+
+# --- Benchmarked calls (each prepares the input and returns a zero-arg thunk) ---
+
+def prepare_split(parsers, text):
+    split = parsers['split_into_enhanced_clauses']
+
+    def run():
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            return split(text, "bench.pdf", facts=[])
+    return run
+
+def prepare_iter_split(parsers, text):
+    iter_split = parsers['iter_enhanced_clauses']
+
+    def run():
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            return list(iter_split(text, "bench.pdf", facts=[]))
+    return run
+
+def prepare_table_scan(parsers, text):
+    """The per-line detect_markdown_table walk split_into_enhanced_clauses does"""
+    detect = parsers['detect_markdown_table']
+    lines = text.split('\n')
+
+    def run():
+        tables = 0
+        i = 0
+        while i < len(lines):
+            is_table, table_end = detect(lines, i)
+            if is_table:
+                tables += 1
+                i = table_end + 1
+            else:
+                i += 1
+        return tables
+    return run
+
+def prepare_extract_table(parsers, text):
+    lines = text.split('\n')
+    return lambda: parsers['extract_table_data'](lines, 0, len(lines) - 1)
+
+def prepare_synthetic_sentences(parsers, text):
+    # Table extraction happens here so only sentence generation is timed
+    lines = text.split('\n')
+    table_data = parsers['extract_table_data'](lines, 0, len(lines) - 1)
+    return lambda: parsers['create_synthetic_sentences_from_table'](table_data, "Key Commercial Terms")
+
+def prepare_definitions(parsers, text):
+    return lambda: parsers['extract_definitions_from_text'](text)
+
+# name → (input builder, full size, prepare)
+CASES = {
+    'split/small_doc':                (build_document, 20, prepare_split),
+    'split/large_doc':                (build_document, 800, prepare_split),
+    'split/huge_table':               (build_huge_table, 20000, prepare_split),
+    'split/thousands_definitions':    (build_definitions, 4000, prepare_split),
+    'split/many_tables_one_clause':   (build_many_tables, 1000, prepare_split),
+    'iter_split/small_doc':           (build_document, 20, prepare_iter_split),
+    'iter_split/large_doc':           (build_document, 800, prepare_iter_split),
+    'iter_split/huge_table':          (build_huge_table, 20000, prepare_iter_split),
+    'iter_split/thousands_definitions': (build_definitions, 4000, prepare_iter_split),
+    'iter_split/many_tables_one_clause': (build_many_tables, 1000, prepare_iter_split),
+    'table_scan/large_doc':           (build_document, 800, prepare_table_scan),
+    'table_scan/huge_table':          (build_huge_table, 20000, prepare_table_scan),
+    'table_scan/no_sections':         (build_unnumbered, 4000, prepare_table_scan),
+    'extract_table/huge_table':       (build_huge_table, 20000, prepare_extract_table),
+    'synthetic_sentences/huge_table': (build_huge_table, 20000, prepare_synthetic_sentences),
+    'definitions/thousands':          (build_definitions, 4000, prepare_definitions),
+    'definitions/large_doc':          (build_document, 800, prepare_definitions),
+    'definitions/no_sections':        (build_unnumbered, 4000, prepare_definitions),
+}
+
+def load_parsers():
+    """The index_02 parser functions (imported lazily - index_02 pulls in llama_index)"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        from pipeline import index_02
+    names = ['split_into_enhanced_clauses', 'iter_enhanced_clauses', 'detect_markdown_table', 'extract_table_data',
+             'extract_definitions_from_text', 'create_synthetic_sentences_from_table']
+    return {name: getattr(index_02, name) for name in names}
+
+def iter_equivalence_inputs():
+    """(label, text) for every split case input plus the documents in cache/"""
+    for name, (builder, size, prepare) in CASES.items():
+        if prepare is prepare_split:
+            yield name, builder(size)
+    if os.path.isdir(CACHE_DIR):
+        for cache_file in sorted(os.listdir(CACHE_DIR)):
+            if not is_cache_file(cache_file):
+                continue
+            try:
+                cache_data = read_cache(os.path.join(CACHE_DIR, cache_file))
+            except (OSError, ValueError):
+                continue
+            # Element caches (ingest_01 --format elements) have no markdown to split
+            if cache_data and isinstance(cache_data, list) and cache_data[0].get('text'):
+                yield f"cache/{cache_file}", cache_data[0]['text']
+
+def check_equivalence(parsers):
+    """
+    Run both splitters on every equivalence input.
+
+    Returns:
+        (inputs checked, labels whose chunks or facts differ)
+    """
+    checked = 0
+    mismatches = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for label, text in iter_equivalence_inputs():
+            split_facts, iter_facts = [], []
+            split_chunks = parsers['split_into_enhanced_clauses'](text, label, facts=split_facts)
+            iter_chunks = list(parsers['iter_enhanced_clauses'](text, label, facts=iter_facts))
+            checked += 1
+            if split_chunks != iter_chunks or split_facts != iter_facts:
+                mismatches.append(label)
+    return checked, mismatches
+
+def time_thunk(thunk, repeat):
+    """Median and min wall time in ns over `repeat` runs (after one warm-up)"""
+    thunk()
+    samples = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter_ns()
+        thunk()
+        samples.append(time.perf_counter_ns() - started)
+    return statistics.median(samples), min(samples)
+
+def peak_allocation(thunk):
+    """tracemalloc peak bytes allocated during one run"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        thunk()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - before)
+
+def run_case(parsers, name, repeat, scaling=True):
+    """
+    Time one case at full size (and 1/SCALING_FACTOR size for the exponent).
+
+    Returns:
+        Dict with lines, median/min ns, ns per line, peak bytes and exponent
+    """
+    builder, size, prepare = CASES[name]
+    text = builder(size)
+    lines = text.count('\n') + 1
+    thunk = prepare(parsers, text)
+
+    median_ns, min_ns = time_thunk(thunk, repeat)
+    peak = peak_allocation(thunk)
+    result = {
+        'size': size,
+        'lines': lines,
+        'median_ns': int(median_ns),
+        'min_ns': int(min_ns),
+        'ns_per_line': round(median_ns / lines, 1),
+        'peak_bytes': peak,
+        'bytes_per_line': round(peak / lines, 1),
+    }
+
+    if scaling:
+        small_text = builder(max(1, size // SCALING_FACTOR))
+        small_lines = small_text.count('\n') + 1
+        _, small_min_ns = time_thunk(prepare(parsers, small_text), repeat)
+        # time ~ lines^e  →  e = log(t_full / t_small) / log(lines_full / lines_small)
+        # (fastest runs: the least noisy estimate of the work itself)
+        if small_min_ns > 0 and lines > small_lines:
+            result['exponent'] = round(math.log(min_ns / small_min_ns) / math.log(lines / small_lines), 2)
+    return result
+
+def build_report(args, cases, equivalence):
+    commit, dirty = git_revision()
+    return {
+        'schema': REPORT_SCHEMA,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'equivalence': equivalence,
+        'cases': cases,
+    }
+
+def print_report(report, max_exponent):
+    print("\n" + "=" * 78)
+    print(f"{'case':<34}{'lines':>8}{'ns/line':>10}{'median ms':>11}{'peak KB':>10}{'exp':>6}")
+    print("=" * 78)
+    for name, case in report['cases'].items():
+        exponent = case.get('exponent')
+        flag = "  ⚠️" if exponent is not None and exponent > max_exponent else ""
+        print(f"{name:<34}{case['lines']:>8}{case['ns_per_line']:>10.0f}"
+              f"{case['median_ns'] / 1e6:>11.2f}{case['peak_bytes'] / 1024:>10.0f}"
+              f"{'-' if exponent is None else f'{exponent:.2f}':>6}{flag}")
+
+def check_regressions(report, baseline, time_tolerance, alloc_tolerance, max_exponent):
+    """
+    Compare against the stored baseline.
+
+    A case regresses when ns/line or peak bytes grow past the tolerances,
+    or its exponent rises above `max_exponent` when the baseline's didn't
+    (known superlinear cases only fail if they get markedly worse).
+
+    Returns:
+        List of human-readable regressions (empty when the run passes)
+    """
+    regressions = []
+    for name, old in baseline['cases'].items():
+        new = report['cases'].get(name)
+        if new is None:
+            continue
+        if new['ns_per_line'] > old['ns_per_line'] * (1 + time_tolerance):
+            regressions.append(f"{name}: {old['ns_per_line']:.0f} → {new['ns_per_line']:.0f} ns/line")
+        if new['peak_bytes'] > old['peak_bytes'] * (1 + alloc_tolerance) + 64 * 1024:
+            regressions.append(f"{name}: peak {old['peak_bytes'] // 1024} → {new['peak_bytes'] // 1024} KB")
+
+        old_exp = old.get('exponent')
+        new_exp = new.get('exponent')
+        if new_exp is None:
+            continue
+        limit = max_exponent if old_exp is None or old_exp <= max_exponent else old_exp + 0.3
+        if new_exp > limit:
+            regressions.append(f"{name}: scaling exponent {old_exp} → {new_exp} (limit {limit:.2f})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the index_02 parsing functions")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument("--cases", default=None,
+                        help="Comma-separated case name prefixes, e.g. 'split,definitions'")
+    parser.add_argument("--no-scaling", action="store_true", help="Skip the 1/4-size runs")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of checking it")
+    parser.add_argument("--time-tolerance", type=float, default=1.0,
+                        help="Allowed relative ns/line growth (default: 1.0 = 2x, hosts differ)")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.5,
+                        help="Allowed relative peak-allocation growth (default: 0.5)")
+    parser.add_argument("--max-exponent", type=float, default=1.5,
+                        help="Scaling exponent treated as superlinear (default: 1.5)")
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("⏱️  INDEX_02 PARSER MICRO-BENCHMARKS")
+    print("=" * 78)
+
+    try:
+        parsers = load_parsers()
+    except ImportError as e:
+        print(f"❌ Could not import pipeline/index_02.py: {e}")
+        return EXIT_SETUP_ERROR
+
+    print("🔁 Checking iter_enhanced_clauses against split_into_enhanced_clauses...")
+    checked, mismatches = check_equivalence(parsers)
+    if mismatches:
+        for label in mismatches:
+            print(f"   ❌ Different chunks or facts: {label}")
+    else:
+        print(f"   ✅ Identical output on {checked} input(s)")
+
+    names = list(CASES)
+    if args.cases:
+        prefixes = [p.strip() for p in args.cases.split(',') if p.strip()]
+        names = [name for name in names if any(name.startswith(p) for p in prefixes)]
+
+    cases = {}
+    for name in names:
+        print(f"   ▶ {name}")
+        cases[name] = run_case(parsers, name, args.repeat, scaling=not args.no_scaling)
+
+    report = build_report(args, cases, {'inputs': checked, 'mismatches': mismatches})
+    print_report(report, args.max_exponent)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        commit = (report['git_commit'] or 'nogit')[:8]
+        output = os.path.join(RESULTS_DIR, f"parsers_{commit}_{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report: {output}")
+
+    if mismatches:
+        print("❌ Streaming splitter output differs - not checking or updating the baseline")
+        return EXIT_REGRESSION
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return EXIT_OK
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at {args.baseline} - rerun with --update-baseline to store one")
+        return EXIT_OK
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = check_regressions(
+        report, baseline, args.time_tolerance, args.alloc_tolerance, args.max_exponent
+    )
+    print(f"\n📊 vs baseline (commit {str(baseline.get('git_commit'))[:8]})")
+    if regressions:
+        for regression in regressions:
+            print(f"   ❌ {regression}")
+        return EXIT_REGRESSION
+    print("   ✅ No regressions")
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+RETRIEVAL QUALITY + LATENCY BENCHMARK
+Scores every retrieval method against a versioned golden query set:
+- Methods: vector-only, BM25-only, hybrid with each fusion mode
+  (pipeline/chat_03.py FUSION_MODES) and `engine`, the path chat queries
+  take (ChatEngine.retrieve: facts lookup, hybrid search, routed merge)
+- Quality: recall@k, MRR and nDCG@k per method (k from the golden set)
+- Latency: p50/p95/p99 per method over --repeat runs; the query embedding
+  is computed once and reported separately so methods compare fairly
+- Writes a JSON report to benchmarks/results/ and checks it against the
+  stored baseline (benchmarks/baselines/): exit 1 when recall/MRR drops or
+  p95 latency grows past the tolerances, exit 2 when the run can't start
+  or no baseline is stored for the golden set
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_test import git_revision, summarize
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "benchmarks")
+GOLDEN_PATH = os.path.join(BENCH_DIR, "golden", "retrieval_v2.json")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+REPORT_SCHEMA = 1
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_SETUP_ERROR = 2
+
+def load_golden(path):
+    """Golden set: {"version", "k_values", "queries": [{id, query, relevant: [...]}]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    for query in golden['queries']:
+        for item in query.get('relevant', []):
+            item['clause_number'] = str(item['clause_number'])
+            item.setdefault('grade', 1)
+    return golden
+
+def matches(node, item):
+    """A chunk matches a golden item on clause (or sub-clause) and, if given, file"""
+    metadata = node.metadata or {}
+    clause = str(metadata.get('clause_number', ''))
+    expected = item['clause_number']
+    if clause != expected and not clause.startswith(expected + '.'):
+        return False
+    return not item.get('filename') or metadata.get('filename') == item['filename']
+
+def first_hit_ranks(nodes, relevant):
+    """1-based rank of the first chunk matching each golden item (None if absent)"""
+    ranks = []
+    for item in relevant:
+        rank = next((i for i, node in enumerate(nodes, 1) if matches(node, item)), None)
+        ranks.append(rank)
+    return ranks
+
+def score_query(nodes, relevant, k_values):
+    """
+    Quality metrics for one ranked list.
+
+    Each golden item counts once (its first matching chunk), so several
+    chunks of the same clause don't inflate recall or nDCG.
+
+    Returns:
+        Dict with recall@k, ndcg@k for each k and the reciprocal rank
+    """
+    ranks = first_hit_ranks(nodes, relevant)
+    grades = [item['grade'] for item in relevant]
+    scores = {}
+
+    for k in k_values:
+        hits = [rank for rank in ranks if rank is not None and rank <= k]
+        scores[f"recall@{k}"] = len(hits) / len(relevant)
+
+        dcg = sum(grade / math.log2(rank + 1)
+                  for rank, grade in zip(ranks, grades) if rank is not None and rank <= k)
+        ideal = sorted(grades, reverse=True)[:k]
+        idcg = sum(grade / math.log2(i + 2) for i, grade in enumerate(ideal))
+        scores[f"ndcg@{k}"] = dcg / idcg if idcg else 0.0
+
+    found = [rank for rank in ranks if rank is not None]
+    scores['mrr'] = 1.0 / min(found) if found else 0.0
+    return scores
+
+def build_methods(engine):
+    """Name → function(query, embedding) returning ranked nodes"""
+    from llama_index.core import QueryBundle
+    from pipeline.chat_03 import hybrid_retrieve, FUSION_MODES, SIMILARITY_TOP_K
+
+    methods = {
+        'vector': lambda query, embedding: engine.vector_retriever.retrieve(
+            QueryBundle(query_str=query, embedding=embedding)
+        ),
+        # What users get: facts hits short-circuit, table queries merge the routed subset
+        'engine': lambda query, embedding: engine.retrieve(query, query_embedding=embedding)['nodes'],
+    }
+    if engine.bm25_retriever is not None:
+        methods['bm25'] = lambda query, embedding: engine.bm25_retriever.retrieve(
+            QueryBundle(query_str=query)
+        )
+        for mode in FUSION_MODES:
+            methods[f"hybrid_{mode}"] = (
+                lambda query, embedding, mode=mode: hybrid_retrieve(
+                    engine.vector_retriever, engine.bm25_retriever, query,
+                    top_k=SIMILARITY_TOP_K, query_embedding=embedding, fusion=mode
+                )
+            )
+    return methods
+
+def run_benchmark(engine, golden, repeat=5, methods=None):
+    """
+    Run every method over the golden set.
+
+    Args:
+        engine: Loaded ChatEngine (embed_model, retrievers and retrieve(); no LLM)
+        golden: Parsed golden set (see load_golden)
+        repeat: Timed runs per query and method (the first also gives the ranking)
+        methods: Optional name → function override (defaults to build_methods)
+
+    Returns:
+        (per-method results, embed latencies in ms)
+    """
+    methods = methods or build_methods(engine)
+    k_values = golden['k_values']
+    results = {name: {'per_query': {}, 'latency_ms': []} for name in methods}
+    embed_ms = []
+
+    for query in golden['queries']:
+        started = time.perf_counter()
+        embedding = engine.embed_model.get_query_embedding(query['query'])
+        embed_ms.append((time.perf_counter() - started) * 1000)
+
+        for name, method in methods.items():
+            nodes = None
+            for _ in range(max(1, repeat)):
+                started = time.perf_counter()
+                ranked = method(query['query'], embedding)
+                results[name]['latency_ms'].append((time.perf_counter() - started) * 1000)
+                if nodes is None:
+                    nodes = ranked
+
+            entry = {
+                'top': [
+                    {'clause_number': str((n.metadata or {}).get('clause_number', '?')),
+                     'filename': (n.metadata or {}).get('filename'),
+                     'score': round(float(n.score or 0.0), 4)}
+                    for n in nodes[:max(k_values)]
+                ],
+            }
+            if query.get('relevant'):
+                entry['scores'] = score_query(nodes, query['relevant'], k_values)
+            results[name]['per_query'][query['id']] = entry
+
+    return results, embed_ms
+
+def aggregate(results, k_values):
+    """Mean quality over labelled queries plus latency percentiles, per method"""
+    summary = {}
+    for name, result in results.items():
+        scored = [q['scores'] for q in result['per_query'].values() if 'scores' in q]
+        metrics = [f"recall@{k}" for k in k_values] + [f"ndcg@{k}" for k in k_values] + ['mrr']
+        quality = {
+            metric: round(sum(s[metric] for s in scored) / len(scored), 4) if scored else None
+            for metric in metrics
+        }
+        summary[name] = {
+            'quality': quality,
+            'labelled_queries': len(scored),
+            'latency_ms': summarize(result['latency_ms']),
+        }
+    return summary
+
+def build_report(args, golden, results, embed_ms):
+    commit, dirty = git_revision()
+    return {
+        'schema': REPORT_SCHEMA,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'golden': {
+            'path': os.path.relpath(args.golden, PROJECT_ROOT),
+            'version': golden['version'],
+            'queries': len(golden['queries']),
+            'k_values': golden['k_values'],
+        },
+        'repeat': args.repeat,
+        'embed_latency_ms': summarize(embed_ms),
+        'methods': aggregate(results, golden['k_values']),
+        'per_query': {name: result['per_query'] for name, result in results.items()},
+    }
+
+def print_report(report):
+    k_values = report['golden']['k_values']
+    print("\n" + "=" * 70)
+    print(f"🎯 Golden set v{report['golden']['version']}: {report['golden']['queries']} queries, "
+          f"{report['repeat']} timed run(s) each")
+    print(f"   embed p50 {report['embed_latency_ms'].get('p50', 0):.1f} ms (computed once per query)")
+    print("=" * 70)
+    header = "".join(f"{'R@' + str(k):>7}" for k in k_values)
+    print(f"{'method':<18}{header}{'MRR':>7}{'nDCG@' + str(k_values[-1]):>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in report['methods'].items():
+        quality = stats['quality']
+        latency = stats['latency_ms']
+        recalls = "".join(f"{_fmt(quality[f'recall@{k}']):>7}" for k in k_values)
+        print(f"{name:<18}{recalls}{_fmt(quality['mrr']):>7}{_fmt(quality[f'ndcg@{k_values[-1]}']):>9}"
+              f"{latency.get('p50', 0):>9.1f}{latency.get('p95', 0):>9.1f}{latency.get('p99', 0):>9.1f}")
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.3f}"
+
+def check_regressions(report, baseline, recall_tolerance, latency_tolerance, latency_slack_ms):
+    """
+    Compare a report against the stored baseline.
+
+    Returns:
+        List of human-readable regressions (empty when the run passes)
+    """
+    regressions = []
+    if baseline['golden']['version'] != report['golden']['version']:
+        regressions.append(
+            f"golden set changed (v{baseline['golden']['version']} → "
+            f"v{report['golden']['version']}) - refresh the baseline with --update-baseline"
+        )
+        return regressions
+
+    for name, old in baseline['methods'].items():
+        new = report['methods'].get(name)
+        if new is None:
+            regressions.append(f"{name}: method missing from this run")
+            continue
+
+        for metric, old_value in old['quality'].items():
+            if not (metric.startswith('recall@') or metric == 'mrr') or old_value is None:
+                continue
+            new_value = new['quality'].get(metric)
+            if new_value is None or new_value < old_value - recall_tolerance:
+                regressions.append(f"{name}: {metric} {old_value:.3f} → {_fmt(new_value)}")
+
+        old_p95 = old['latency_ms'].get('p95')
+        new_p95 = new['latency_ms'].get('p95')
+        if old_p95 is not None and new_p95 is not None:
+            limit = old_p95 * (1 + latency_tolerance) + latency_slack_ms
+            if new_p95 > limit:
+                regressions.append(
+                    f"{name}: p95 latency {old_p95:.1f} → {new_p95:.1f} ms (limit {limit:.1f} ms)"
+                )
+    return regressions
+
+def baseline_path_for(golden_path):
+    return os.path.join(BASELINE_DIR, os.path.basename(golden_path))
+
+def load_engine():
+    """Warm retrieval stack without the LLM backend, or None"""
+    from pipeline.chat_03 import ChatEngine, _quiet
+
+    print("🔄 Loading retrieval stack...")
+    return ChatEngine.load(log=_quiet)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="Golden query set (JSON)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed runs per query and method (default: 5)")
+    parser.add_argument("--baseline", default=None,
+                        help="Baseline report (default: benchmarks/baselines/<golden file name>)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of checking it")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02,
+                        help="Allowed absolute drop in recall@k / MRR (default: 0.02)")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5,
+                        help="Allowed relative p95 latency growth (default: 0.5 = +50%%)")
+    parser.add_argument("--latency-slack-ms", type=float, default=2.0,
+                        help="Absolute p95 slack so sub-ms methods don't flap (default: 2 ms)")
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print("=" * 70)
+    print("🎯 SOLAR PPA RETRIEVAL BENCHMARK")
+    print("=" * 70)
+
+    try:
+        golden = load_golden(args.golden)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Could not read golden set {args.golden}: {e}")
+        return EXIT_SETUP_ERROR
+
+    engine = load_engine()
+    if engine is None:
+        print("❌ Retrieval stack unavailable - run the indexer first")
+        return EXIT_SETUP_ERROR
+
+    results, embed_ms = run_benchmark(engine, golden, repeat=args.repeat)
+    report = build_report(args, golden, results, embed_ms)
+    print_report(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        commit = (report['git_commit'] or 'nogit')[:8]
+        output = os.path.join(RESULTS_DIR, f"retrieval_{commit}_{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report: {output}")
+
+    baseline_path = args.baseline or baseline_path_for(args.golden)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        # Baselines keep the aggregates only - per-query rankings live in the reports
+        baseline = {key: value for key, value in report.items() if key != 'per_query'}
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"📌 Baseline updated: {baseline_path}")
+        return EXIT_OK
+
+    if not os.path.exists(baseline_path):
+        # Without a baseline nothing is checked - fail rather than pass silently
+        print(f"❌ No baseline at {baseline_path} - rerun with --update-baseline to store one")
+        return EXIT_SETUP_ERROR
+
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = check_regressions(
+        report, baseline, args.recall_tolerance, args.latency_tolerance, args.latency_slack_ms
+    )
+    print(f"\n📊 vs baseline (commit {str(baseline.get('git_commit'))[:8]})")
+    if regressions:
+        for regression in regressions:
+            print(f"   ❌ {regression}")
+        return EXIT_REGRESSION
+    print("   ✅ No regressions")
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+LOAD TEST FOR THE FULL QUERY PATH
+Replays a question corpus against the chat pipeline and reports throughput
+and p50/p95/p99 latency per stage (embed, vector, BM25, fusion, prompt,
+LLM queue, LLM).
+- Targets: in-process ChatEngine (behind chat_server's ChatService, with its
+  thread pools and embedding batcher), or a running chat_server over HTTP
+- Stage timings come from the query's trace spans (utils/tracing.py)
+- Closed loop: N concurrent users, each sends its next question on reply
+- Open loop: Poisson arrivals at a fixed rate, latency measured from the
+  scheduled send time (no coordinated omission)
+- The LLM is pipeline/llm_standin.py by default, so runs are offline,
+  repeatable and spend no provider quota; --real-llm calls the real API
+- Writes a JSON report (git commit, host, config, stats) to
+  benchmarks/results/; --compare prints the deltas against an older report
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+from utils.tracing import percentile
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+REPORT_SCHEMA = 1
+
+STAGES = ['embed_ms', 'vector_ms', 'bm25_ms', 'fusion_ms', 'prompt_ms',
+          'llm_queue_ms', 'llm_ms', 'total_ms']
+
+DEFAULT_QUESTIONS = [
+    "What is the Effective Date?",
+    "What happens in case of Abandonment?",
+    "Who is responsible for the Grid connection?",
+    "What is the Default Rate?",
+    "What are the conditions for termination of the agreement?",
+    "How is the contract price adjusted each year?",
+    "What are the seller's obligations regarding metering?",
+    "What insurance must the seller maintain?",
+    "What does Force Majeure mean?",
+    "When are invoices due and how are they paid?",
+]
+
+def load_questions(path):
+    """Questions from a .jsonl ({"question": ...}) or plain text file (one per line)"""
+    if not path:
+        return list(DEFAULT_QUESTIONS)
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = str(json.loads(line).get('question', '')).strip()
+            if line:
+                questions.append(line)
+    return questions
+
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 3),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(values[-1], 3),
+    }
+
+def git_revision():
+    """(commit, dirty) of the working tree, (None, None) outside git"""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+        status = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True
+        )
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def start_standin(args):
+    """Launch the local LLM stand-in and wait until it accepts connections"""
+    command = [
+        sys.executable, os.path.join(PROJECT_ROOT, "pipeline", "llm_standin.py"),
+        "--port", str(args.standin_port),
+        "--latency-ms", str(args.standin_latency_ms),
+        "--latency-jitter-ms", str(args.standin_jitter_ms),
+        "--tokens-per-sec", str(args.standin_tokens_per_sec),
+        "--error-rate", str(args.standin_error_rate),
+        "--seed", str(args.seed),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", args.standin_port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"LLM stand-in did not start on port {args.standin_port}")
+
+class InProcessTarget:
+    """
+    Drives a warm ChatEngine through chat_server's ChatService, so in-process
+    runs use the same bounded retrieval/LLM pools, embedding micro-batcher
+    and torch thread count as the single-process server.
+    """
+
+    def __init__(self, engine, args, max_pending):
+        from pipeline.chat_server import (
+            ChatService, attach_batcher, configure_torch_threads, thread_sizing
+        )
+
+        retrieval_workers, torch_threads = thread_sizing(1, args.retrieval_workers, args.torch_threads)
+        configure_torch_threads(torch_threads)
+        if attach_batcher(engine, args):
+            print(f"📦 Query embedding micro-batching: up to {args.embed_batch_size} "
+                  f"queries / {args.embed_max_wait_ms:g} ms")
+        print(f"🧵 {retrieval_workers} retrieval thread(s), {args.llm_workers} LLM thread(s)")
+        self.service = ChatService(engine, retrieval_workers, args.llm_workers, max_pending)
+
+    async def query(self, question):
+        from utils.async_http import HTTPError
+
+        try:
+            body = await self.service.query(json.dumps({'question': question}).encode('utf-8'))
+        except HTTPError as e:
+            return ('rejected' if e.status == 503 else 'error'), {}
+        timings = body.get('timings') or {}
+        if body.get('answer'):
+            return 'ok', timings
+        return ('error' if 'llm_ms' in timings else 'no_context'), timings
+
+    async def close(self):
+        self.service.shutdown()
+
+class HTTPTarget:
+    """POSTs to a running chat_server over pooled keep-alive connections"""
+
+    def __init__(self, base_url, connections):
+        import httpx
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=120.0
+        )
+
+    async def query(self, question):
+        response = await self.client.post('/query', json={'question': question})
+        if response.status_code == 503:
+            return 'rejected', {}
+        if response.status_code != 200:
+            return 'error', {}
+
+        body = response.json()
+        timings = body.get('timings') or {}
+        if body.get('answer'):
+            return 'ok', timings
+        return ('error' if 'llm_ms' in timings else 'no_context'), timings
+
+    async def close(self):
+        await self.client.aclose()
+
+async def timed_query(target, question, scheduled_at):
+    """One request; latency counts from `scheduled_at` (perf_counter seconds)"""
+    try:
+        status, timings = await target.query(question)
+        error = None
+    except Exception as e:
+        status, timings, error = 'error', {}, f"{type(e).__name__}: {e}"
+    timings = {k: v for k, v in timings.items() if v is not None}
+    timings['total_ms'] = round((time.perf_counter() - scheduled_at) * 1000, 3)
+    return {'status': status, 'timings': timings, 'error': error}
+
+async def closed_loop(target, questions, concurrency, duration, max_requests):
+    results = []
+    counter = iter(range(max_requests or 10 ** 12))
+    deadline = time.perf_counter() + duration
+
+    async def user(offset):
+        position = offset
+        while time.perf_counter() < deadline and next(counter, None) is not None:
+            question = questions[position % len(questions)]
+            position += concurrency
+            results.append(await timed_query(target, question, time.perf_counter()))
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return results
+
+async def open_loop(target, questions, rate, duration, max_requests, max_inflight, seed):
+    results = []
+    tasks = set()
+    dropped = 0
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    next_arrival = start
+    sent = 0
+
+    while next_arrival - start < duration and (not max_requests or sent < max_requests):
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_inflight:
+            # Client-side saturation - recorded rather than silently queued
+            dropped += 1
+        else:
+            task = asyncio.create_task(
+                timed_query(target, questions[sent % len(questions)], next_arrival)
+            )
+            task.add_done_callback(lambda t: (tasks.discard(t), results.append(t.result())))
+            tasks.add(task)
+        sent += 1
+        next_arrival += rng.expovariate(rate)
+
+    if tasks:
+        await asyncio.wait(tasks)
+    for _ in range(dropped):
+        results.append({'status': 'dropped', 'timings': {}, 'error': None})
+    return results
+
+def build_report(args, results, elapsed, target_name):
+    commit, dirty = git_revision()
+    statuses = {}
+    for record in results:
+        statuses[record['status']] = statuses.get(record['status'], 0) + 1
+    answered = [r for r in results if r['status'] == 'ok']
+    errors = [r['error'] for r in results if r['error']]
+
+    return {
+        'schema': REPORT_SCHEMA,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'target': target_name,
+            'mode': args.mode,
+            'concurrency': args.concurrency if args.mode == 'closed' else None,
+            'rate_qps': args.rate if args.mode == 'open' else None,
+            'duration_s': args.duration,
+            'max_requests': args.requests,
+            'warmup': args.warmup,
+            'questions': len(load_questions(args.questions)),
+            'standin': {
+                'latency_ms': args.standin_latency_ms,
+                'jitter_ms': args.standin_jitter_ms,
+                'tokens_per_sec': args.standin_tokens_per_sec,
+                'error_rate': args.standin_error_rate,
+            } if not args.real_llm else None,
+            'in_process': {
+                'retrieval_workers': args.retrieval_workers,
+                'llm_workers': args.llm_workers,
+                'torch_threads': args.torch_threads,
+                'embed_batch_size': args.embed_batch_size,
+                'embed_max_wait_ms': args.embed_max_wait_ms,
+            } if target_name == 'inprocess' else None,
+            'llm_requests_per_minute': os.getenv("LLM_REQUESTS_PER_MINUTE"),
+            'llm_tokens_per_minute': os.getenv("LLM_TOKENS_PER_MINUTE"),
+        },
+        'elapsed_s': round(elapsed, 3),
+        'requests': len(results),
+        'statuses': statuses,
+        'throughput_qps': round(len(answered) / elapsed, 3) if elapsed else 0.0,
+        'stages': {
+            stage: summarize(r['timings'].get(stage) for r in answered)
+            for stage in STAGES
+        },
+        'sample_errors': errors[:5],
+    }
+
+def print_report(report):
+    print("\n" + "=" * 70)
+    print(f"🏁 {report['requests']} request(s) in {report['elapsed_s']:.1f}s → "
+          f"{report['throughput_qps']:.2f} answered q/s")
+    print("   " + " | ".join(f"{status}: {count}" for status, count in sorted(report['statuses'].items())))
+    print("=" * 70)
+    print(f"{'stage':<14}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for stage, stats in report['stages'].items():
+        if not stats['count']:
+            continue
+        print(f"{stage[:-3]:<14}{stats['count']:>7}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+              f"{stats['p99']:>10.1f}{stats['max']:>10.1f}")
+    for error in report['sample_errors']:
+        print(f"   ⚠️  {error}")
+
+def _delta(new, old):
+    if new is None or old in (None, 0):
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+def compare_reports(report, baseline_path):
+    """Print throughput and per-stage p50/p99 changes against an older report"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n📊 vs {os.path.basename(baseline_path)} "
+          f"(commit {str(baseline.get('git_commit'))[:8]})")
+    if baseline.get('config', {}).get('mode') != report['config']['mode']:
+        print("   ⚠️  Different load mode - numbers are not directly comparable")
+    print(f"   throughput  {baseline['throughput_qps']:.2f} → {report['throughput_qps']:.2f} q/s "
+          f"{_delta(report['throughput_qps'], baseline['throughput_qps'])}")
+    for stage, stats in report['stages'].items():
+        old = baseline.get('stages', {}).get(stage, {})
+        if not stats['count'] or not old.get('count'):
+            continue
+        print(f"   {stage[:-3]:<11} p50 {old['p50']:>8.1f} → {stats['p50']:>8.1f} "
+              f"{_delta(stats['p50'], old['p50'])}   p99 {old['p99']:>8.1f} → {stats['p99']:>8.1f} "
+              f"{_delta(stats['p99'], old['p99'])}")
+
+def load_engine():
+    """Warm in-process ChatEngine with a quiet log, or None"""
+    from pipeline.chat_03 import ChatEngine, create_llm_backend, _quiet
+
+    engine = ChatEngine.load()
+    if engine is None:
+        return None
+    engine.llm = create_llm_backend()
+    if engine.llm is None:
+        return None
+    engine.log = _quiet
+    return engine
+
+async def run(args, target, questions):
+    if args.warmup:
+        print(f"🔥 Warm-up: {args.warmup} request(s)")
+        for question in (questions * args.warmup)[:args.warmup]:
+            await timed_query(target, question, time.perf_counter())
+
+    label = (f"closed loop, {args.concurrency} user(s)" if args.mode == 'closed'
+             else f"open loop, {args.rate:g} q/s Poisson arrivals")
+    print(f"🚀 Load: {label} for up to {args.duration:g}s")
+    start = time.perf_counter()
+    if args.mode == 'closed':
+        results = await closed_loop(target, questions, args.concurrency, args.duration, args.requests)
+    else:
+        results = await open_loop(target, questions, args.rate, args.duration, args.requests,
+                                  args.max_inflight, args.seed)
+    elapsed = time.perf_counter() - start
+    await target.close()
+    return results, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the full query path")
+    parser.add_argument("--target", default="inprocess",
+                        help="'inprocess' or a chat_server URL such as http://127.0.0.1:8000")
+    parser.add_argument("--questions", default=None,
+                        help="Question corpus (.jsonl or one question per line; default: built-in set)")
+    parser.add_argument("--mode", choices=['closed', 'open'], default='closed')
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Closed loop: concurrent users (default: 8)")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Open loop: mean arrivals per second (default: 5)")
+    parser.add_argument("--max-inflight", type=int, default=256,
+                        help="Open loop: requests in flight before new arrivals are dropped")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load (default: 30)")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="Untimed requests sent first (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--retrieval-workers", type=int, default=None,
+                        help="In-process: embedding/retrieval threads (default: CPU count, as chat_server)")
+    parser.add_argument("--llm-workers", type=int, default=32,
+                        help="In-process: concurrent LLM calls (default: 32, as chat_server)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="In-process: intra-op threads per encode (default: CPU count / retrieval workers)")
+    parser.add_argument("--embed-batch-size", type=int, default=16,
+                        help="In-process: max queries per embedding batch, 1 disables (default: 16)")
+    parser.add_argument("--embed-max-wait-ms", type=float, default=5.0,
+                        help="In-process: how long a batch waits for more queries (default: 5 ms)")
+    parser.add_argument("--real-llm", action="store_true",
+                        help="Call the configured LLM provider instead of starting the local "
+                             "stand-in (spends API quota)")
+    parser.add_argument("--standin-port", type=int, default=8100)
+    parser.add_argument("--standin-latency-ms", type=float, default=300.0)
+    parser.add_argument("--standin-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--standin-tokens-per-sec", type=float, default=500.0)
+    parser.add_argument("--standin-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/...)")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print("=" * 70)
+    print("🏋️  SOLAR PPA LOAD TEST")
+    print("=" * 70)
+
+    questions = load_questions(args.questions)
+    if not questions:
+        print("❌ No questions to replay")
+        return 1
+
+    standin = None
+    if args.real_llm:
+        print("💸 Using the real LLM provider - this run spends API quota")
+    else:
+        standin = start_standin(args)
+        print(f"🧪 LLM stand-in on port {args.standin_port} "
+              f"({args.standin_latency_ms:g} ms to first token, {args.standin_tokens_per_sec:g} tok/s)")
+        if args.target != 'inprocess':
+            print(f"   The server must run with LLM_BACKEND=http "
+                  f"LLM_BASE_URL=http://127.0.0.1:{args.standin_port}/v1 to use it")
+        else:
+            os.environ["LLM_BACKEND"] = "http"
+            os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.standin_port}/v1"
+            # The stand-in has no provider quota - don't let the scheduler throttle the test
+            os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+            os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+    try:
+        if args.target == 'inprocess':
+            engine = load_engine()
+            if engine is None:
+                return 1
+            max_pending = args.concurrency if args.mode == 'closed' else args.max_inflight
+            target = InProcessTarget(engine, args, max_pending)
+        else:
+            connections = args.concurrency if args.mode == 'closed' else args.max_inflight
+            target = HTTPTarget(args.target, connections)
+
+        results, elapsed = asyncio.run(run(args, target, questions))
+    finally:
+        if standin is not None:
+            standin.terminate()
+
+    report = build_report(args, results, elapsed, args.target)
+    print_report(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        commit = (report['git_commit'] or 'nogit')[:8]
+        output = os.path.join(RESULTS_DIR, f"load_{args.mode}_{commit}_{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report: {output}")
+
+    if args.compare:
+        compare_reports(report, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
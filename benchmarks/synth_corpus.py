@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+SYNTHETIC PPA CORPUS GENERATOR
+Emits Docling-style markdown shaped like what pipeline/index_02.py parses,
+so indexing, BM25 and query behaviour can be measured at 10k-100k clauses
+without real PDFs:
+- `## N. TITLE` numbered sections with numbered sub-clause paragraphs
+- A definitions clause with `" Term " means ...` entries (spaces inside
+  the quotes, as in the real agreements)
+- `| key | value |` tables with a `|---|---|` separator
+- Parameterized by document count, clauses per document, table density
+  and definition density; seeded, so the same flags give the same corpus
+- Writes legacy cache-format JSON into <output>/cache/ (index_02 migrates it
+  to utils/doc_cache.py), plus a questions.jsonl for benchmarks/load_test.py
+  and a manifest.json beside that directory
+- --measure runs the clause splitter and a BM25 build/query pass over the
+  generated corpus and reports throughput, latency and peak memory
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import resource
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_test import summarize
+
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "synth")
+# Only the per-document JSON goes here, so the directory can be copied into cache/ as is
+CACHE_SUBDIR = "cache"
+
+AGREEMENT_TYPES = [
+    "Power Purchase Agreement", "Implementation Agreement", "Installation Agreement",
+    "O&M Agreement", "Supply Agreement", "Land Lease Agreement",
+]
+PARTIES = ["Seller", "Buyer", "Contractor", "Operator", "Lender", "Grid Operator", "Landowner"]
+CLAUSE_TOPICS = [
+    "COMMENCEMENT AND TERM", "CONDITIONS PRECEDENT", "CONSTRUCTION OF THE FACILITY",
+    "GRID CONNECTION", "METERING", "TARIFF AND PAYMENT", "INVOICING", "TAXES",
+    "INSURANCE", "FORCE MAJEURE", "CHANGE IN LAW", "TERMINATION", "EVENTS OF DEFAULT",
+    "LIABILITY AND INDEMNITY", "DISPUTE RESOLUTION", "ASSIGNMENT", "CONFIDENTIALITY",
+    "OPERATION AND MAINTENANCE", "PERFORMANCE GUARANTEE", "ENVIRONMENTAL OBLIGATIONS",
+    "SECURITY PACKAGE", "REPRESENTATIONS AND WARRANTIES", "NOTICES", "GOVERNING LAW",
+]
+TERM_WORDS = [
+    "Abandonment", "Availability", "Capacity", "Commercial", "Connection", "Contract",
+    "Default", "Delivery", "Energy", "Facility", "Grid", "Interconnection", "Metering",
+    "Operation", "Payment", "Performance", "Price", "Project", "Security", "Site",
+    "Tariff", "Termination", "Warranty", "Curtailment", "Outage", "Insurance",
+]
+TERM_SUFFIXES = ["Date", "Period", "Rate", "Point", "Event", "Notice", "Amount", "Charge", "Limit", "Factor"]
+TABLE_KEYS = [
+    ("Contract Capacity", lambda rng: f"{rng.randint(1, 250)} MW"),
+    ("Tariff", lambda rng: f"{rng.uniform(0.03, 0.2):.4f} USD per kWh"),
+    ("Default Rate", lambda rng: f"{rng.randint(1, 9)}% per annum above LIBOR"),
+    ("Commercial Operation Date", lambda rng: f"{rng.randint(1, 28)} {rng.choice(['March', 'June', 'October'])} {rng.randint(2024, 2030)}"),
+    ("Term", lambda rng: f"{rng.randint(10, 30)} years"),
+    ("Availability Factor", lambda rng: f"{rng.randint(90, 99)}%"),
+    ("Liability Limit", lambda rng: f"USD {rng.randint(1, 50)} million"),
+    ("Payment Period", lambda rng: f"{rng.choice([15, 30, 45, 60])} days"),
+    ("Insurance Required", lambda rng: rng.choice(["Yes", "No"])),
+    ("Performance Security", lambda rng: f"USD {rng.randint(100, 900)},000"),
+    ("Metering Point", lambda rng: f"Substation {rng.randint(1, 40)}"),
+    ("Curtailment Charge", lambda rng: f"{rng.randint(5, 40)}% of the Tariff"),
+]
+VERBS = ["shall", "shall not", "may", "must", "undertakes to", "is entitled to"]
+ACTIONS = [
+    "deliver all Net Energy Output to the {point}",
+    "notify the {party} in writing within {days} days",
+    "maintain the insurances set out in Schedule {schedule}",
+    "procure that the Facility is operated in accordance with Prudent Utility Practice",
+    "pay the {charge} in respect of each Billing Period",
+    "provide the Performance Security on or before the {date}",
+    "comply with the Grid Code and all Applicable Laws",
+    "suspend performance of its obligations during a Force Majeure Event",
+    "refer any Dispute to an Expert in accordance with Clause {clause}",
+    "keep accurate records of all Metered Energy for a period of {years} years",
+]
+
+def make_terms(rng, count):
+    """`count` distinct capitalized defined terms (two or three words)"""
+    terms = []
+    seen = set()
+    while len(terms) < count:
+        words = [rng.choice(TERM_WORDS), rng.choice(TERM_SUFFIXES)]
+        if rng.random() < 0.3:
+            words.insert(0, rng.choice(TERM_WORDS))
+        term = " ".join(words)
+        if term in seen:
+            # Keep generating distinct terms past the vocabulary's combinations
+            term = f"{term} {len(terms) + 1}"
+        seen.add(term)
+        terms.append(term)
+    return terms
+
+def make_sentence(rng, terms, clause_count):
+    party = rng.choice(PARTIES)
+    action = rng.choice(ACTIONS).format(
+        point=rng.choice(terms) if terms else "Delivery Point",
+        party=rng.choice(PARTIES),
+        days=rng.choice([5, 10, 14, 30, 60]),
+        schedule=rng.randint(1, 12),
+        charge=rng.choice(terms) if terms else "Capacity Charge",
+        date=rng.choice(terms) if terms else "Effective Date",
+        clause=rng.randint(1, max(1, clause_count)),
+        years=rng.randint(2, 10),
+    )
+    return f"The {party} {rng.choice(VERBS)} {action}."
+
+def make_paragraph(rng, terms, clause_count, sentences):
+    return " ".join(make_sentence(rng, terms, clause_count) for _ in range(sentences))
+
+def make_table(rng, rows):
+    """Docling-style two-column table with a header row"""
+    lines = ["| Subject | Key Information |", "|---|---|"]
+    for key, value in rng.sample(TABLE_KEYS, min(rows, len(TABLE_KEYS))):
+        lines.append(f"| **{key}** | {value(rng)} |")
+    return lines
+
+def make_definitions(rng, terms, clause_count):
+    """`" Term " means ...` entries, some with multi-line continuations"""
+    lines = []
+    for term in terms:
+        lines.append(f'" {term} " means {make_paragraph(rng, [], clause_count, 1).lower()}')
+        if rng.random() < 0.25:
+            lines.append(f"(a) {make_sentence(rng, [], clause_count)}")
+            lines.append(f"(b) {make_sentence(rng, [], clause_count)}")
+        lines.append("")
+    return lines
+
+def generate_document(rng, doc_index, clauses, table_density, definition_density,
+                      subclauses=(2, 5), sentences=(2, 4)):
+    """
+    One synthetic agreement as Docling-style markdown.
+
+    Args:
+        rng: random.Random driving every choice
+        doc_index: Position in the corpus (used in the title)
+        clauses: Numbered sections, including the definitions clause
+        table_density: Probability that a section contains a table
+        definition_density: Defined terms per section (0.5 with 200 clauses → 100 terms)
+        subclauses: (min, max) numbered paragraphs per section
+        sentences: (min, max) sentences per paragraph
+
+    Returns:
+        (markdown, stats dict, sample facts for generating questions)
+    """
+    agreement = rng.choice(AGREEMENT_TYPES)
+    term_count = int(round(clauses * definition_density))
+    terms = make_terms(rng, term_count)
+    stats = {'clauses': clauses, 'definitions': term_count, 'tables': 0, 'lines': 0}
+    facts = {'terms': terms, 'table_keys': set()}
+
+    lines = [f"# {agreement.upper()} {doc_index + 1}", "",
+             f"This {agreement} is made between the {rng.choice(PARTIES)} and the {rng.choice(PARTIES)}.", ""]
+
+    for number in range(1, clauses + 1):
+        if number == 1:
+            title = "DEFINITIONS AND INTERPRETATION"
+        else:
+            title = CLAUSE_TOPICS[(number - 2) % len(CLAUSE_TOPICS)]
+        lines.extend([f"## {number}. {title}", ""])
+
+        if number == 1:
+            lines.extend(["1.1 In this Agreement the following terms have the following meanings:", ""])
+            lines.extend(make_definitions(rng, terms, clauses))
+
+        for sub in range(1, rng.randint(*subclauses) + 1):
+            paragraph = make_paragraph(rng, terms, clauses, rng.randint(*sentences))
+            lines.extend([f"{number}.{sub} {paragraph}", ""])
+
+        if rng.random() < table_density:
+            table = make_table(rng, rng.randint(3, 8))
+            facts['table_keys'].update(row.split('|')[1].strip().strip('*') for row in table[2:])
+            lines.extend(table + [""])
+            stats['tables'] += 1
+
+    stats['lines'] = len(lines)
+    return "\n".join(lines), stats, facts
+
+def cache_record(text, filename):
+    """Legacy .json cache layout (one {'text', 'metadata'} document)"""
+    file_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return file_hash, [{
+        'text': text,
+        'metadata': {
+            'filename': filename,
+            'source': f"synthetic://{filename}",
+            'file_hash': file_hash,
+            'synthetic': True,
+            'cached_date': datetime.now().isoformat(),
+        },
+    }]
+
+def make_questions(rng, facts, count):
+    """Definition and table questions answerable from the generated corpus"""
+    terms = sorted(facts['terms'])
+    table_keys = sorted(facts['table_keys'])
+    questions = []
+    for _ in range(count):
+        if table_keys and (not terms or rng.random() < 0.4):
+            questions.append(f"What is the {rng.choice(table_keys)}?")
+        elif terms:
+            questions.append(rng.choice([
+                "What is the {}?", "What does {} mean?", "How is the {} defined?"
+            ]).format(rng.choice(terms)))
+    return questions
+
+def generate_corpus(args):
+    """Write every document, questions.jsonl and manifest.json; returns the manifest"""
+    rng = random.Random(args.seed)
+    cache_dir = os.path.join(args.output, CACHE_SUBDIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    totals = {'documents': 0, 'clauses': 0, 'definitions': 0, 'tables': 0, 'lines': 0, 'bytes': 0}
+    all_facts = {'terms': set(), 'table_keys': set()}
+    files = []
+    started = time.perf_counter()
+
+    for doc_index in range(args.documents):
+        text, stats, facts = generate_document(
+            rng, doc_index, args.clauses, args.table_density, args.definition_density
+        )
+        filename = f"SYNTH {doc_index + 1:05d}.pdf"
+        file_hash, record = cache_record(text, filename)
+        path = os.path.join(cache_dir, f"{file_hash}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+
+        files.append(os.path.basename(path))
+        totals['documents'] += 1
+        totals['bytes'] += len(text.encode('utf-8'))
+        for key in ('clauses', 'definitions', 'tables', 'lines'):
+            totals[key] += stats[key]
+        all_facts['terms'].update(facts['terms'])
+        all_facts['table_keys'].update(facts['table_keys'])
+
+    questions = make_questions(rng, all_facts, args.questions)
+    with open(os.path.join(args.output, "questions.jsonl"), 'w', encoding='utf-8') as f:
+        for i, question in enumerate(questions, 1):
+            f.write(json.dumps({'id': f"synth-{i}", 'question': question}) + "\n")
+
+    manifest = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            'documents': args.documents,
+            'clauses': args.clauses,
+            'table_density': args.table_density,
+            'definition_density': args.definition_density,
+            'seed': args.seed,
+        },
+        'totals': totals,
+        'generate_seconds': round(time.perf_counter() - started, 3),
+        'files': files,
+    }
+    with open(os.path.join(args.output, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def iter_cached_texts(directory, files):
+    for name in files:
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            record = json.load(f)[0]
+        yield record['text'], record['metadata']['filename']
+
+def max_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _split_corpus(directory, manifest):
+    """TextNode chunks of every cached document, split the way index_02 does"""
+    from pipeline.index_02 import split_into_enhanced_clauses
+    from llama_index.core.schema import TextNode
+
+    chunks = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for text, filename in iter_cached_texts(os.path.join(directory, CACHE_SUBDIR), manifest['files']):
+            for clause_number, clause_title, clause_text in split_into_enhanced_clauses(text, filename):
+                chunks.append(TextNode(
+                    id_=f"{filename}:{len(chunks)}", text=clause_text,
+                    metadata={'filename': filename, 'clause_number': clause_number,
+                              'clause_title': clause_title}
+                ))
+    return chunks
+
+def measure(directory, manifest, queries=200, seed=0):
+    """
+    Split every document with index_02's clause splitter, then build and
+    query a BM25 index over the chunks. Embedding is left out - index the
+    generated cache with pipeline/index_02.py to measure that end to end.
+
+    Split and build are timed untraced; peak memory comes from a second
+    split + build under tracemalloc, which slows allocation-heavy code.
+
+    Returns:
+        Dict of throughput, latency and peak-memory numbers
+    """
+    from llama_index.core import QueryBundle
+    from llama_index.retrievers.bm25 import BM25Retriever
+
+    results = {}
+
+    started = time.perf_counter()
+    chunks = _split_corpus(directory, manifest)
+    split_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    retriever = BM25Retriever.from_defaults(nodes=chunks, similarity_top_k=10)
+    build_seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    traced_chunks = _split_corpus(directory, manifest)
+    _, split_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    BM25Retriever.from_defaults(nodes=traced_chunks, similarity_top_k=10)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced_chunks
+
+    lines = manifest['totals']['lines']
+    results['split'] = {
+        'seconds': round(split_seconds, 3),
+        'chunks': len(chunks),
+        'lines_per_second': round(lines / split_seconds) if split_seconds else None,
+        'clauses_per_second': round(manifest['totals']['clauses'] / split_seconds) if split_seconds else None,
+        'peak_mb': round(split_peak / 2 ** 20, 1),
+    }
+    results['bm25_build'] = {
+        'seconds': round(build_seconds, 3),
+        'chunks_per_second': round(len(chunks) / build_seconds) if build_seconds else None,
+        'peak_mb': round(build_peak / 2 ** 20, 1),
+    }
+
+    with open(os.path.join(directory, "questions.jsonl"), 'r', encoding='utf-8') as f:
+        questions = [json.loads(line)['question'] for line in f if line.strip()]
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(min(queries, len(questions) * 10) if questions else 0):
+        question = rng.choice(questions)
+        started = time.perf_counter()
+        retriever.retrieve(QueryBundle(query_str=question))
+        latencies.append((time.perf_counter() - started) * 1000)
+    results['bm25_query_ms'] = summarize(latencies)
+    results['max_rss_mb'] = max_rss_mb()
+    return results
+
+def print_measurements(results):
+    split = results['split']
+    build = results['bm25_build']
+    query = results['bm25_query_ms']
+    print("\n" + "=" * 70)
+    print(f"✂️  Split: {split['chunks']} chunks in {split['seconds']:.2f}s "
+          f"({split['lines_per_second']} lines/s, {split['clauses_per_second']} clauses/s, "
+          f"peak {split['peak_mb']} MB)")
+    print(f"📚 BM25 build: {build['seconds']:.2f}s ({build['chunks_per_second']} chunks/s, "
+          f"peak {build['peak_mb']} MB)")
+    if query['count']:
+        print(f"🔍 BM25 query: p50 {query['p50']:.2f} ms | p95 {query['p95']:.2f} ms | "
+              f"p99 {query['p99']:.2f} ms over {query['count']} queries")
+    print(f"🧠 Max RSS: {results['max_rss_mb']} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PPA corpus for scale testing")
+    parser.add_argument("--documents", type=int, default=10, help="Agreements to generate (default: 10)")
+    parser.add_argument("--clauses", type=int, default=100,
+                        help="Numbered sections per agreement (default: 100)")
+    parser.add_argument("--table-density", type=float, default=0.1,
+                        help="Probability a section contains a table (default: 0.1)")
+    parser.add_argument("--definition-density", type=float, default=0.5,
+                        help="Defined terms per section, all in clause 1 (default: 0.5)")
+    parser.add_argument("--questions", type=int, default=200,
+                        help="Questions written to questions.jsonl (default: 200)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="Output directory (default: benchmarks/synth/d<docs>_c<clauses>_s<seed>)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Split + BM25 build/query pass over the corpus, results in manifest.json")
+    args = parser.parse_args()
+
+    if args.clauses < 1 or args.documents < 1:
+        parser.error("--documents and --clauses must be at least 1")
+    if not 0.0 <= args.table_density <= 1.0:
+        parser.error("--table-density is a probability (0-1)")
+    if args.output is None:
+        args.output = os.path.join(
+            DEFAULT_OUTPUT_DIR, f"d{args.documents}_c{args.clauses}_s{args.seed}"
+        )
+
+    print("=" * 70)
+    print("🧪 SYNTHETIC PPA CORPUS")
+    print("=" * 70)
+
+    manifest = generate_corpus(args)
+    totals = manifest['totals']
+    print(f"✅ {totals['documents']} document(s), {totals['clauses']} clauses, "
+          f"{totals['definitions']} definitions, {totals['tables']} tables "
+          f"({totals['bytes'] / 2 ** 20:.1f} MB) in {manifest['generate_seconds']:.1f}s")
+    print(f"📁 {args.output}")
+    print(f"   To index: copy {os.path.join(args.output, CACHE_SUBDIR, '*.json')} into cache/ "
+          f"and run pipeline/index_02.py")
+    print(f"   To load-test: benchmarks/load_test.py --questions {os.path.join(args.output, 'questions.jsonl')}")
+
+    if args.measure:
+        print("\n⏱️  Measuring split + BM25...")
+        manifest['measurements'] = measure(args.output, manifest, queries=args.questions, seed=args.seed)
+        print_measurements(manifest['measurements'])
+        with open(os.path.join(args.output, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
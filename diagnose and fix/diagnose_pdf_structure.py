@@ -5,11 +5,12 @@ This will show us EXACTLY what patterns exist in your PDF
 """
 import os
 import sys
-import json
 import re
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.storage_utils import CACHE_DIR
+from utils.docling_elements import cached_markdown
+from utils.doc_cache import is_cache_file, read_cache
 
 def analyze_markdown_structure(text, filename):
     """
@@ -170,7 +171,7 @@ def main():
         return
     
     # Get cache files
-    cache_files = [f for f in os.listdir(CACHE_DIR) if f.endswith('.json')]
+    cache_files = sorted(f for f in os.listdir(CACHE_DIR) if is_cache_file(f))
     
     if not cache_files:
         print(f"⚠️  No cache files in {CACHE_DIR}")
@@ -187,10 +188,9 @@ def main():
         cache_path = os.path.join(CACHE_DIR, cf)
         
         try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+            cache_data = read_cache(cache_path)
             
-            full_text = cache_data[0]['text']
+            full_text = cached_markdown(cache_data[0])
             filename = cache_data[0].get('metadata', {}).get('filename', 'unknown.pdf')
             
             analyze_markdown_structure(full_text, filename)
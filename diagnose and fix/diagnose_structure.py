@@ -5,11 +5,12 @@ Shows what patterns exist in your specific PDF
 """
 import os
 import sys
-import json
 import re
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.storage_utils import CACHE_DIR
+from utils.docling_elements import cached_markdown
+from utils.doc_cache import is_cache_file, read_cache
 
 def analyze_definitions_section(text):
     """Check how definitions are formatted"""
@@ -190,7 +191,7 @@ def main():
     print("="*80)
     
     # Find cache file
-    cache_files = [f for f in os.listdir(CACHE_DIR) if f.endswith('.json')]
+    cache_files = sorted(f for f in os.listdir(CACHE_DIR) if is_cache_file(f))
     
     if not cache_files:
         print("\n❌ No cache files found!")
@@ -204,8 +205,7 @@ def main():
     print(f"\n📄 Analyzing: {cache_file}")
     
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        cache_data = read_cache(cache_path)
     except Exception as e:
         print(f"❌ Failed to read cache: {e}")
         return
@@ -215,7 +215,7 @@ def main():
         return
     
     full_doc = cache_data[0]
-    full_text = full_doc.get('text', '')
+    full_text = cached_markdown(full_doc)
     metadata = full_doc.get('metadata', {})
     
     print(f"\n📊 Document Stats:")
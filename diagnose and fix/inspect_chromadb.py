@@ -11,6 +11,7 @@ import re
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.storage_utils import CHROMA_DB_PATH
+from utils.index_versions import active_collection_name
 
 def main():
     print("🔬 CHROMADB CONTENT INSPECTOR")
@@ -20,9 +21,10 @@ def main():
     db = chromadb.PersistentClient(path=CHROMA_DB_PATH)
     
     try:
-        collection = db.get_collection("solar_ppa_collection")
+        collection_name = active_collection_name()
+        collection = db.get_collection(collection_name)
         count = collection.count()
-        print(f"✅ Collection: solar_ppa_collection ({count} vectors)")
+        print(f"✅ Collection: {collection_name} ({count} vectors)")
     except Exception as e:
         print(f"❌ Failed to open collection: {e}")
         return
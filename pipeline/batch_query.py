@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+BULK BATCH-QUERY MODE
+Runs hundreds of due-diligence questions against the indexed deal:
+- Streams questions from a JSONL file ({"id": ..., "question": ...})
+- Batch-embeds each chunk of questions in one forward pass
+- Retrieves + builds prompts, then calls the LLM with bounded concurrency
+- Streams answers, sources and per-stage timings to an output JSONL file
+- Resumable: ids already answered in the output file are skipped
+- Failed ids are retried on the next run and appended again; when an id has
+  several lines in the output file, the last line wins
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline.chat_03 import ChatEngine, create_llm_backend, finish_query, lookup_fact_nodes, _quiet
+from pipeline.embed_batcher import encode_queries
+from pipeline.llm_scheduler import BATCH
+from utils.tracing import start_trace
+from utils.metrics import write_job_metrics
+
+# Statuses that count as finished when resuming (LLM/retrieval/prompt errors are retried)
+FINAL_STATUSES = {'ok', 'no_context'}
+
+def iter_questions(path):
+    """Yield (id, question) from a JSONL file, ids default to the line number"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"   ⚠️  Skipping malformed line {line_number}")
+                continue
+            question = str(record.get('question', '')).strip()
+            if not question:
+                continue
+            yield str(record.get('id', f"line-{line_number}")), question
+
+def load_completed_ids(path):
+    """Ids already answered in a previous (possibly interrupted) run"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partially written last line from an interrupted run
+                continue
+            if record.get('status') in FINAL_STATUSES:
+                completed.add(record.get('id'))
+    return completed
+
+def output_ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def ms_since(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def prepare_chunk(engine, chunk):
+    """
+    Batch-embed and retrieve a chunk of questions.
+
+    Returns:
+        List of (record, trace, messages); messages is None when the record is final
+    """
+    records = []
+
+    # Facts hits never need an embedding; the lookup is handed on to retrieve()
+    facts_by_id = {}
+    for qid, question in chunk:
+        facts_start = time.perf_counter()
+        fact_nodes = lookup_fact_nodes(question, engine.snapshot.collection_name)
+        facts_by_id[qid] = (fact_nodes, ms_since(facts_start))
+    to_embed = [(qid, question) for qid, question in chunk if not facts_by_id[qid][0]]
+
+    embed_start = time.perf_counter()
+    embeddings = encode_queries(engine.embed_model, [q for _, q in to_embed]) if to_embed else []
+    # Each question is charged its share of the batched forward pass
+    embed_ms = ms_since(embed_start) / max(len(to_embed), 1)
+    embedding_by_id = {qid: [float(x) for x in emb] for (qid, _), emb in zip(to_embed, embeddings)}
+
+    for qid, question in chunk:
+        record = {
+            'id': qid,
+            'question': question,
+            'answer': None,
+            'sources': [],
+            'retrieval': None,
+            'status': None,
+            'error': None,
+        }
+        trace = start_trace('batch_query', transport='batch', id=qid, question=question)
+        fact_nodes, facts_ms = facts_by_id[qid]
+        trace.add_span('facts', facts_ms, hit=bool(fact_nodes))
+        if qid in embedding_by_id:
+            trace.add_span('embed', embed_ms, batched=True, batch_size=len(to_embed))
+
+        try:
+            retrieval = engine.retrieve(question, query_embedding=embedding_by_id.get(qid), trace=trace,
+                                        fact_nodes=fact_nodes)
+        except Exception as e:
+            record.update(status='retrieval_error', error=str(e))
+            records.append((record, trace, None))
+            continue
+        record['retrieval'] = retrieval['source']
+
+        if retrieval['error']:
+            record.update(status='no_context', error=retrieval['error'])
+            records.append((record, trace, None))
+            continue
+
+        try:
+            messages, clause_info, context_stats = engine.build_prompt(question, retrieval, trace)
+        except Exception as e:
+            record.update(status='prompt_error', error=str(e))
+            records.append((record, trace, None))
+            continue
+        record['sources'] = clause_info
+        record['context_tokens'] = context_stats['context_tokens']
+        records.append((record, trace, messages))
+
+    return records
+
+def generate(engine, record, trace, messages):
+    """LLM call for one prepared record (runs on the worker pool)"""
+    try:
+        # Batch priority: interactive users sharing the limits go first
+        answer = engine.generate(messages, priority=BATCH, trace=trace)
+        record.update(answer=answer, status='ok' if answer else 'llm_error',
+                      error=None if answer else "Empty response from LLM")
+    except Exception as e:
+        record.update(status='llm_error', error=f"LLM API error: {e}")
+    llm_span = next((span for span in trace.spans if span.name == 'llm'), None)
+    if llm_span is not None:
+        record['llm_retries'] = llm_span.attrs.get('retries', 0)
+        record['usage'] = {key: llm_span.attrs[key] for key in ('prompt_tokens', 'completion_tokens')
+                           if llm_span.attrs.get(key) is not None}
+    return record, trace
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in bulk")
+    parser.add_argument("input", help="JSONL file with {\"id\", \"question\"} records")
+    parser.add_argument("output", help="JSONL file answers are appended to")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Concurrent LLM calls (default: 4)")
+    parser.add_argument("--chunk-size", type=int, default=32,
+                        help="Questions embedded and retrieved per batch (default: 32)")
+    args = parser.parse_args()
+
+    started_at = time.time()
+    load_dotenv()
+
+    print("=" * 70)
+    print("📦 SOLAR PPA BATCH QUERY")
+    print("=" * 70)
+
+    completed = load_completed_ids(args.output)
+    if completed:
+        print(f"⏩ Resuming: {len(completed)} question(s) already answered")
+
+    engine = ChatEngine.load()
+    if engine is None:
+        return
+    engine.llm = create_llm_backend()
+    if engine.llm is None:
+        return
+    engine.log = _quiet
+
+    pending_questions = (
+        (qid, question) for qid, question in iter_questions(args.input)
+        if qid not in completed
+    )
+
+    counts = {'ok': 0, 'no_context': 0, 'llm_error': 0, 'retrieval_error': 0, 'prompt_error': 0}
+    run_start = time.perf_counter()
+    in_flight = set()
+
+    def drain(out, block_until):
+        """Write finished records until at most `block_until` are in flight"""
+        nonlocal in_flight
+        while len(in_flight) > block_until:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                write_record(out, *future.result())
+
+    def write_record(out, record, trace):
+        record['timings'] = trace.stage_ms()
+        record['timings']['total_ms'] = trace.busy_ms()
+        record['trace_id'] = trace.trace_id
+        finish_query(trace, record['status'])
+        out.write(json.dumps(record, ensure_ascii=False, default=float) + "\n")
+        out.flush()
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+        done_count = sum(counts.values())
+        marker = "✅" if record['status'] == 'ok' else "⚠️ "
+        print(f"   {marker} [{done_count}] {record['id']}: {record['status']}")
+
+    with open(args.output, 'a', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="llm") as pool:
+        # Terminate a line cut short by an interrupted run before appending
+        if out.tell() > 0 and not output_ends_with_newline(args.output):
+            out.write("\n")
+        try:
+            for chunk in chunked(pending_questions, args.chunk_size):
+                print(f"\n🔍 Embedding + retrieving {len(chunk)} question(s)...")
+                for record, trace, messages in prepare_chunk(engine, chunk):
+                    if messages is None:
+                        write_record(out, record, trace)
+                        continue
+                    in_flight.add(pool.submit(generate, engine, record, trace, messages))
+                    # Keep retrieval at most a couple of batches ahead of the LLM
+                    drain(out, block_until=2 * args.concurrency)
+            drain(out, block_until=0)
+        except KeyboardInterrupt:
+            print("\n⏸️  Interrupted - rerun the same command to resume")
+            for future in in_flight:
+                future.cancel()
+            return
+
+    elapsed = time.perf_counter() - run_start
+    total = sum(counts.values())
+    print("\n" + "=" * 70)
+    print(f"🏁 {total} question(s) in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.2f} q/s)")
+    print(f"   ✅ {counts['ok']} answered | ⚠️  {counts['no_context']} without context | "
+          f"❌ {counts['llm_error'] + counts['retrieval_error'] + counts['prompt_error']} errors (retried on next run)")
+    print(f"📄 {args.output}")
+    write_job_metrics("batch_query", started_at)
+
+if __name__ == "__main__":
+    main()
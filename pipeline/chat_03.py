@@ -3,16 +3,22 @@
 HYBRID RETRIEVAL: BM25 + Dense Vector Search
 Catches exact-term matches that pure semantic search misses
 Example: "Effective Date" now retrieves the definition, not just usage
+Serves the promoted collection version and hot-swaps to a newer one
+(utils/index_versions.py) without reloading the models
 """
 import hashlib
 import pickle
+import shutil
+import gc
+import re
+import time
+import argparse
+import threading
 from pathlib import Path
 import os
 import sys
-import chromadb
 from dotenv import load_dotenv
-from groq import Groq
-from llama_index.core.schema import TextNode
+from llama_index.core.schema import TextNode, NodeWithScore
 
 from llama_index.core import VectorStoreIndex
 from llama_index.vector_stores.chroma import ChromaVectorStore
@@ -24,60 +30,173 @@ from llama_index.core import QueryBundle
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 CHROMA_DB_PATH = os.path.join(PROJECT_ROOT, "chroma_db")
 
-def hybrid_retrieve(vector_retriever, bm25_retriever, query_str, top_k=5):
-    query_bundle = QueryBundle(query_str=query_str)
-    vector_nodes = vector_retriever.retrieve(query_bundle)
+sys.path.append(PROJECT_ROOT)
+from utils.facts_store import lookup_fact
+from utils.index_versions import (
+    INDEX_RELOAD_SECONDS, chroma_client, reset_chroma_clients, active_collection_name,
+    active_generation, bm25_snapshot_dir, pointer_signature, read_pointer
+)
+from pipeline.query_router import RoutedRetrievers, describe_route, ROUTE_MIN_SCORE
+from pipeline.context_builder import TokenCounter, build_context, DEFAULT_TOKEN_BUDGET
+from pipeline.context_compression import compress_nodes, COMPRESSION_ENABLED
+from pipeline.llm_scheduler import LLMScheduler, INTERACTIVE, estimate_tokens
+from pipeline.llm_backends import create_backend
+from utils.tracing import NULL_TRACE, start_trace
+from utils.metrics import counter, histogram, write_job_metrics
+from utils.profiling import Profiler, add_profile_argument
+
+# "What is the Effective Date?", "What does Abandonment mean?", "Define Default Rate"
+FACT_QUESTION_PATTERNS = [
+    re.compile(r'^\s*what\s+does\s+(?:the\s+)?(?:term\s+)?(.+?)\s+mean\s*\??\s*$', re.IGNORECASE),
+    re.compile(r'^\s*what\s+(?:is|are)\s+(?:meant\s+by\s+)?(.+?)\s*\??\s*$', re.IGNORECASE),
+    re.compile(r'^\s*(?:define|definition\s+of|meaning\s+of)\s+(.+?)\s*\??\s*$', re.IGNORECASE),
+]
+
+QUERIES = counter("legal_rag_queries_total", "Queries served", ["transport", "status"])
+QUERY_SECONDS = histogram("legal_rag_query_seconds", "End-to-end query latency", ["transport"])
+QUERY_STAGE_SECONDS = histogram("legal_rag_query_stage_seconds", "Time per query stage", ["stage"])
+CACHE_LOOKUPS = counter("legal_rag_cache_lookups_total", "Cache lookups by outcome", ["cache", "result"])
+LLM_REQUESTS = counter("legal_rag_llm_requests_total", "LLM calls by outcome", ["backend", "status"])
+LLM_RETRIES = counter("legal_rag_llm_retries_total", "LLM calls retried by the scheduler", ["backend"])
+LLM_TOKENS = counter("legal_rag_llm_tokens_total", "Tokens reported by the LLM", ["backend", "type"])
+INDEX_RELOADS = counter("legal_rag_index_reloads_total", "Promoted index versions picked up", ["status"])
+INDEX_FRESHNESS_SECONDS = histogram(
+    "legal_rag_index_freshness_seconds", "First Dataset change to served by this process",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+)
+
+# Score fusion for hybrid_retrieve: 'weighted' (min-max BM25 + cosine, 60/40)
+# or 'rrf' (reciprocal rank fusion, rescaled so rank 1 in both lists = 1.0)
+FUSION_MODES = ('weighted', 'rrf')
+RRF_K = 60
+
+def reciprocal_rank_fusion(vector_nodes, bm25_nodes, k=RRF_K):
+    """Nodes scored by sum(1 / (k + rank)) over both lists, rescaled to 0-1"""
+    fused = {}
+    for nodes in (vector_nodes, bm25_nodes):
+        for rank, node in enumerate(nodes, 1):
+            entry = fused.setdefault(node.node_id, [node, 0.0])
+            entry[1] += 1.0 / (k + rank)
+    
+    best_possible = 2.0 / (k + 1)
+    combined_nodes = []
+    for node, score in fused.values():
+        node.score = score / best_possible
+        combined_nodes.append(node)
+    return combined_nodes
+
+def hybrid_retrieve(vector_retriever, bm25_retriever, query_str, top_k=5, query_embedding=None,
+                    trace=NULL_TRACE, fusion='weighted'):
+    if fusion not in FUSION_MODES:
+        raise ValueError(f"Unknown fusion mode '{fusion}' (use one of {FUSION_MODES})")
+    # Passing a precomputed embedding lets callers reuse it (compression, routing)
+    query_bundle = QueryBundle(query_str=query_str, embedding=query_embedding)
+    with trace.span('vector') as span:
+        vector_nodes = vector_retriever.retrieve(query_bundle)
+        span.set(candidates=len(vector_nodes))
     
     # If BM25 is not available, just use vector results
     if bm25_retriever is None:
         return vector_nodes[:top_k]
     
-    bm25_nodes = bm25_retriever.retrieve(query_bundle)
+    with trace.span('bm25') as span:
+        bm25_nodes = bm25_retriever.retrieve(query_bundle)
+        span.set(candidates=len(bm25_nodes))
     
-    # 🔧 Initialize the score dictionary
-    node_scores = {}
+    if fusion == 'rrf':
+        with trace.span('fusion', mode=fusion) as span:
+            combined_nodes = reciprocal_rank_fusion(vector_nodes, bm25_nodes)
+            combined_nodes.sort(key=lambda x: x.score, reverse=True)
+            span.set(candidates=len(combined_nodes), returned=min(top_k, len(combined_nodes)))
+        return combined_nodes[:top_k]
     
-    # Normalize vector scores (already 0-1 from cosine similarity)
-    for node in vector_nodes:
-        node_id = node.node_id
-        node_scores[node_id] = {
-            'node': node,
-            'vector_score': node.score,
-            'bm25_score': 0.0
-        }
+    with trace.span('fusion', mode=fusion) as span:
+        # 🔧 Initialize the score dictionary
+        node_scores = {}
     
-    # Normalize BM25 scores (need to scale to 0-1)
-    if bm25_nodes:
-        max_bm25 = max(node.score for node in bm25_nodes)
-        min_bm25 = min(node.score for node in bm25_nodes)
-        bm25_range = max_bm25 - min_bm25 if max_bm25 > min_bm25 else 1.0
-        
-        for node in bm25_nodes:
+        # Normalize vector scores (already 0-1 from cosine similarity)
+        for node in vector_nodes:
             node_id = node.node_id
-            normalized_bm25 = (node.score - min_bm25) / bm25_range
+            node_scores[node_id] = {
+                'node': node,
+                'vector_score': node.score,
+                'bm25_score': 0.0
+            }
+    
+        # Normalize BM25 scores (need to scale to 0-1)
+        if bm25_nodes:
+            max_bm25 = max(node.score for node in bm25_nodes)
+            min_bm25 = min(node.score for node in bm25_nodes)
+            bm25_range = max_bm25 - min_bm25 if max_bm25 > min_bm25 else 1.0
+        
+            for node in bm25_nodes:
+                node_id = node.node_id
+                normalized_bm25 = (node.score - min_bm25) / bm25_range
             
-            if node_id in node_scores:
-                node_scores[node_id]['bm25_score'] = normalized_bm25
-            else:
-                node_scores[node_id] = {
-                    'node': node,
-                    'vector_score': 0.0,
-                    'bm25_score': normalized_bm25
-                }
-    
-    # Combine scores (weighted average: 60% vector, 40% BM25)
-    # Vector is better for semantic, BM25 is better for exact terms
-    combined_nodes = []
-    for node_id, scores in node_scores.items():
-        combined_score = (0.6 * scores['vector_score']) + (0.4 * scores['bm25_score'])
-        node = scores['node']
-        node.score = combined_score  # Update score
-        combined_nodes.append(node)
+                if node_id in node_scores:
+                    node_scores[node_id]['bm25_score'] = normalized_bm25
+                else:
+                    node_scores[node_id] = {
+                        'node': node,
+                        'vector_score': 0.0,
+                        'bm25_score': normalized_bm25
+                    }
+    
+        # Combine scores (weighted average: 60% vector, 40% BM25)
+        # Vector is better for semantic, BM25 is better for exact terms
+        combined_nodes = []
+        for node_id, scores in node_scores.items():
+            combined_score = (0.6 * scores['vector_score']) + (0.4 * scores['bm25_score'])
+            node = scores['node']
+            node.score = combined_score  # Update score
+            combined_nodes.append(node)
     
-    # Sort by combined score and return top_k
-    combined_nodes.sort(key=lambda x: x.score, reverse=True)
+        # Sort by combined score and return top_k
+        combined_nodes.sort(key=lambda x: x.score, reverse=True)
+        span.set(candidates=len(combined_nodes), returned=min(top_k, len(combined_nodes)))
     return combined_nodes[:top_k]
 
+def parse_fact_question(query):
+    """Return the term asked about in a "what is / what does X mean" question"""
+    for pattern in FACT_QUESTION_PATTERNS:
+        match = pattern.match(query)
+        if match:
+            term = match.group(1).strip().strip('"\'“”‘’').strip()
+            return term or None
+    return None
+
+def lookup_fact_nodes(query, collection_name):
+    """
+    Answer definition / key-value questions from the facts store, using the
+    facts of the collection version being served.
+    Returns nodes shaped like retrieval results, or [] on a miss.
+    """
+    term = parse_fact_question(query)
+    if not term:
+        return []
+    
+    nodes = []
+    for fact in lookup_fact(term, collection_name):
+        if fact['kind'] == 'definition':
+            text = f"Definition of {fact['term']}: {fact['value']}"
+            title = f"Definition: {fact['term']}"
+        else:
+            text = f"{fact['term']}: {fact['value']}"
+            title = fact['clause_title'] or fact['term']
+        
+        node = TextNode(
+            text=text,
+            metadata={
+                'clause_number': fact['clause_number'] or 'Unknown',
+                'clause_title': title,
+                'filename': fact['filename'],
+                'is_definition': fact['kind'] == 'definition',
+                'has_table': fact['kind'] == 'table'
+            }
+        )
+        nodes.append(NodeWithScore(node=node, score=1.0))
+    return nodes
+
 def format_clauses_for_context(nodes, max_clauses=5):
     """Format retrieved nodes into clean context"""
     context_parts = []
@@ -142,6 +261,9 @@ RULES:
 
 Answer concisely and clearly."""
 
+# Load cached BM25 arrays with mmap instead of reading them into each process
+BM25_MMAP = os.getenv("BM25_MMAP", "1") != "0"
+
 def compute_documents_hash(doc_texts):
     """Return SHA256 hash of concatenated document texts."""
     if not doc_texts:
@@ -149,34 +271,66 @@ def compute_documents_hash(doc_texts):
     combined = "".join(doc_texts).encode("utf-8")
     return hashlib.sha256(combined).hexdigest()
 
+def bm25_index_dir(cache_dir, doc_hash):
+    """
+    Directory of the BM25 arrays for one document hash. Serving processes
+    mmap these files, so a snapshot is never rewritten in place: new content
+    gets a new directory and bm25_hash.txt is switched over to it.
+    """
+    return Path(cache_dir) / f"bm25_index-{doc_hash[:16]}"
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
 def save_bm25_cache(bm25_retriever, doc_texts, cache_dir):
     """Save BM25 index and document hash to cache."""
     cache_dir = Path(cache_dir)
     cache_dir.mkdir(parents=True, exist_ok=True)
+    hash_file = cache_dir / "bm25_hash.txt"
+    previous_hash = hash_file.read_text().strip() if hash_file.exists() else None
     
-    # Save the BM25 index using bm25s internal save
-    bm25_retriever.bm25.save(str(cache_dir / "bm25_index"))
-    
-    # Save the hash
+    # Save the BM25 index using bm25s internal save, into a fresh directory
     doc_hash = compute_documents_hash(doc_texts)
-    with open(cache_dir / "bm25_hash.txt", "w") as f:
-        f.write(doc_hash)
+    index_dir = bm25_index_dir(cache_dir, doc_hash)
+    if not index_dir.exists():
+        tmp_dir = cache_dir / f".{index_dir.name}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        bm25_retriever.bm25.save(str(tmp_dir))
+        try:
+            os.rename(tmp_dir, index_dir)
+        except OSError:
+            # Another process published the same snapshot first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
     
     # Also pickle the retriever settings (optional, but helpful)
-    with open(cache_dir / "bm25_retriever.pkl", "wb") as f:
-        # We can't pickle the whole retriever because of the BM25 object,
-        # but we can save parameters like similarity_top_k
-        pickle.dump({"similarity_top_k": bm25_retriever.similarity_top_k}, f)
+    # We can't pickle the whole retriever because of the BM25 object,
+    # but we can save parameters like similarity_top_k
+    _write_atomic(cache_dir / "bm25_retriever.pkl",
+                  pickle.dumps({"similarity_top_k": bm25_retriever.similarity_top_k}))
     
-    print(f"💾 BM25 cache saved to {cache_dir}")
+    # Switch readers over to the new snapshot
+    _write_atomic(hash_file, doc_hash.encode("utf-8"))
+    
+    # Older snapshots can go: unlinking keeps live mappings valid. The previous
+    # one stays for processes that read the old hash a moment ago.
+    keep = {index_dir.name}
+    if previous_hash:
+        keep.add(bm25_index_dir(cache_dir, previous_hash).name)
+    for entry in cache_dir.iterdir():
+        if entry.is_dir() and entry.name.startswith("bm25_index") and entry.name not in keep:
+            shutil.rmtree(entry, ignore_errors=True)
+    
+    print(f"💾 BM25 cache saved to {index_dir}")
 
 def load_bm25_cache(cache_dir, doc_texts, ids, metadatas, similarity_top_k=10):
     """Load BM25 index from cache if hash matches, else return None."""
     cache_dir = Path(cache_dir)
     hash_file = cache_dir / "bm25_hash.txt"
-    index_dir = cache_dir / "bm25_index"
     
-    if not hash_file.exists() or not index_dir.exists():
+    if not hash_file.exists():
         return None
     
     # Check hash (based on texts only – you could include ids if desired)
@@ -188,11 +342,20 @@ def load_bm25_cache(cache_dir, doc_texts, ids, metadatas, similarity_top_k=10):
         print("🔄 Document hash changed – rebuilding BM25...")
         return None
     
+    index_dir = bm25_index_dir(cache_dir, saved_hash)
+    if not index_dir.exists():
+        return None
+    
     # Load BM25 index
     try:
         import bm25s
         
-        bm25 = bm25s.BM25.load(str(index_dir))
+        try:
+            # Memory-mapped: processes loading the same snapshot share its pages
+            bm25 = bm25s.BM25.load(str(index_dir), mmap=BM25_MMAP)
+        except TypeError:
+            # bm25s releases before mmap support
+            bm25 = bm25s.BM25.load(str(index_dir))
         
         # Recreate the retriever using TextNode objects with preserved IDs
         from llama_index.core.retrievers import BM25Retriever
@@ -214,118 +377,620 @@ def load_bm25_cache(cache_dir, doc_texts, ids, metadatas, similarity_top_k=10):
         print(f"⚠️  Failed to load BM25 cache: {e}")
         return None
 
-def main():
-    load_dotenv()
+LLM_MODEL = "llama-3.1-8b-instant"
+LLM_MAX_TOKENS = 800
+SIMILARITY_TOP_K = 10
+RELEVANCE_THRESHOLD = 0.5
+MAX_CONTEXT_CLAUSES = 5
+
+def _quiet(*args, **kwargs):
+    pass
+
+def build_bm25_retriever(ids, doc_texts, metadatas, similarity_top_k=SIMILARITY_TOP_K, log=print,
+                         collection_name=None):
+    """Load the collection version's cached BM25 index, or build and cache a fresh one"""
+    if not doc_texts:
+        log("⚠️  No documents found for BM25 – using vector only")
+        return None
     
-    print("=" * 70)
-    print("☀️  SOLAR PPA LEGAL ASSISTANT - HYBRID RETRIEVAL")
-    print("=" * 70)
-    print("🔬 Mode: BM25 + Dense Vector Search")
-    print("=" * 70)
+    cache_dir = bm25_snapshot_dir(collection_name or active_collection_name())
+    
+    # Try to load from cache
+    bm25_retriever = load_bm25_cache(cache_dir, doc_texts, ids, metadatas, similarity_top_k)
+    CACHE_LOOKUPS.inc(cache='bm25_index', result='hit' if bm25_retriever is not None else 'miss')
+    
+    # If cache miss or hash mismatch, rebuild
+    if bm25_retriever is None:
+        log("🔄 Building fresh BM25 index...")
+        nodes = [
+            TextNode(id_=node_id, text=text, metadata=meta or {})
+            for node_id, text, meta in zip(ids, doc_texts, metadatas)
+        ]
+        
+        bm25_retriever = BM25Retriever.from_defaults(
+            nodes=nodes,
+            similarity_top_k=similarity_top_k,
+            verbose=True
+        )
+        # Save to cache
+        save_bm25_cache(bm25_retriever, doc_texts, cache_dir)
+        log(f"✅ BM25 index built and cached ({len(nodes)} nodes)")
+    
+    return bm25_retriever
+
+def refresh_bm25_cache(chroma_collection, log=print):
+    """Rebuild the cached BM25 index after the collection changed (e.g. by the watcher)"""
+    all_docs = chroma_collection.get(include=["documents", "metadatas"])
+    return build_bm25_retriever(all_docs["ids"], all_docs["documents"], all_docs["metadatas"], log=log,
+                                collection_name=chroma_collection.name)
+
+def create_llm_backend(log=print):
+    """Create the configured LLM backend and check it answers. Returns None on failure."""
+    try:
+        backend = create_backend(LLM_MODEL)
+    except ValueError as e:
+        log(f"❌ {e}")
+        return None
     
-    # 1. Load embedding model
-    print("\n🔄 Loading BGE-M3 (1024-dim)...")
     try:
-        embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
-        print("✅ Embedding model ready")
+        test = backend.complete([{"role": "user", "content": "Say OK"}], max_tokens=10)
+        log(f"✅ LLM backend ({backend.name}): {test.text.strip()}")
+        return backend
     except Exception as e:
-        print(f"❌ Failed to load embeddings: {e}")
-        return
+        log(f"❌ LLM backend ({backend.name}) failed: {e}")
+        backend.close()
+        return None
+
+class IndexSnapshot:
+    """
+    Retrievers over one collection version. ChatEngine swaps the whole
+    snapshot when a new version is promoted, so a query never mixes versions.
+    """
     
-    # 2. Connect to ChromaDB
-    print(f"📁 Chroma DB: {CHROMA_DB_PATH}")
-    db = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    def __init__(self, collection_name, index, chroma_collection, vector_retriever,
+                 bm25_retriever, router, generation=0):
+        self.collection_name = collection_name
+        # Bumped by the watcher when it edits the collection in place
+        self.generation = generation
+        self.index = index
+        self.chroma_collection = chroma_collection
+        self.vector_retriever = vector_retriever
+        self.bm25_retriever = bm25_retriever
+        self.router = router
     
-    try:
-        chroma_collection = db.get_collection("solar_ppa_collection")
-        count = chroma_collection.count()
-        print(f"✅ Collection loaded: {count} vectors")
+    @staticmethod
+    def _open_vector_side(embed_model, collection_name, log):
+        """(chroma_collection, index, vector_retriever), or None if the collection is missing/empty"""
+        # Connect to ChromaDB
+        log(f"📁 Chroma DB: {CHROMA_DB_PATH}")
+        db = chroma_client()
         
-        if count == 0:
-            print("⚠️  Collection is empty!")
-            return
+        try:
+            chroma_collection = db.get_collection(collection_name)
+            count = chroma_collection.count()
+            log(f"✅ Collection loaded: {collection_name} ({count} vectors)")
             
-    except Exception as e:
-        print(f"❌ Collection not found: {e}")
-        return
+            if count == 0:
+                log("⚠️  Collection is empty!")
+                return None
+                
+        except Exception as e:
+            log(f"❌ Collection not found: {e}")
+            return None
+        
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+        
+        # Build index
+        log("🔄 Building index...")
+        index = VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
+        
+        # Dense vector retriever
+        vector_retriever = VectorIndexRetriever(
+            index=index,
+            similarity_top_k=SIMILARITY_TOP_K,
+            embed_model=embed_model
+        )
+        return chroma_collection, index, vector_retriever
     
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    @classmethod
+    def load(cls, embed_model, collection_name=None, log=print, generation=None):
+        """Open a collection version and build its retrievers. Returns None if unusable."""
+        if collection_name is None:
+            collection_name, generation = active_generation()
+        
+        vector_side = cls._open_vector_side(embed_model, collection_name, log)
+        if vector_side is None:
+            return None
+        chroma_collection, index, vector_retriever = vector_side
+        
+        # Create BOTH retrievers
+        log("🔄 Creating hybrid retriever (BM25 + Vector)...")
+        
+        # --- BM25 keyword retriever with caching (one snapshot per version) ---
+        log("🔄 Building BM25 index from stored documents...")
+        
+        # Fetch all documents from ChromaDB
+        all_docs = chroma_collection.get(include=["documents", "metadatas"])
+        ids = all_docs["ids"]
+        doc_texts = all_docs["documents"]
+        metadatas = all_docs["metadatas"]
+        
+        bm25_retriever = build_bm25_retriever(ids, doc_texts, metadatas, log=log,
+                                              collection_name=collection_name)
+        
+        # Metadata-filtered retrievers (definitions / tables / one agreement)
+        router = RoutedRetrievers(
+            index, embed_model, ids, doc_texts, metadatas,
+            similarity_top_k=SIMILARITY_TOP_K
+        )
+        return cls(collection_name, index, chroma_collection, vector_retriever, bm25_retriever, router,
+                   generation or 0)
     
-    # 3. Build index
-    print("🔄 Building index...")
-    index = VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
+    def reopen(self, embed_model):
+        """
+        Own Chroma client and vector retrievers for a forked server worker.
+        BM25 indexes, clause texts and routed subsets stay shared with the parent.
+        """
+        reset_chroma_clients()
+        vector_side = self._open_vector_side(embed_model, self.collection_name, _quiet)
+        if vector_side is None:
+            raise RuntimeError(f"{self.collection_name} is no longer available")
+        self.chroma_collection, self.index, self.vector_retriever = vector_side
+        self.router.rebind(self.index)
+
+class ChatEngine:
+    """
+    Warm retrieval stack (BGE-M3, Chroma, BM25, router, tokenizer) plus the
+    LLM backend. Loaded once and shared by the interactive loop, the HTTP
+    service and batch runs. Query methods are safe to call from threads.
     
-    # 4. Create BOTH retrievers
-    print("🔄 Creating hybrid retriever (BM25 + Vector)...")
+    The retrievers live in an IndexSnapshot; reload_if_promoted() replaces it
+    when index_02 --rebuild promotes a new collection version or the watcher
+    publishes a new generation of the live one, keeping the models loaded.
+    """
     
-    # Dense vector retriever
-    vector_retriever = VectorIndexRetriever(
-        index=index,
-        similarity_top_k=10,
-        embed_model=embed_model
-    )
+    def __init__(self, embed_model, snapshot, token_counter, llm=None, log=print):
+        self.embed_model = embed_model
+        self.snapshot = snapshot
+        self.token_counter = token_counter
+        # LLMBackend (pipeline/llm_backends.py), set by the caller
+        self.llm = llm
+        self.log = log
+        # Optional QueryEmbeddingBatcher shared by concurrent callers
+        self.batcher = None
+        # Rate limits, priorities and retries for every LLM call
+        self.scheduler = LLMScheduler.from_env()
+        # Pointer file state the snapshot was loaded for
+        self._pointer_signature = None
+        self._reload_lock = threading.Lock()
+        self._stop_watch = threading.Event()
     
-        # --- BM25 keyword retriever with caching ---
-    print("🔄 Building BM25 index from stored documents...")
+    # Retrievers of the current snapshot
+    index = property(lambda self: self.snapshot.index)
+    chroma_collection = property(lambda self: self.snapshot.chroma_collection)
+    vector_retriever = property(lambda self: self.snapshot.vector_retriever)
+    bm25_retriever = property(lambda self: self.snapshot.bm25_retriever)
+    router = property(lambda self: self.snapshot.router)
     
-    # Fetch all documents from ChromaDB
-    all_docs = chroma_collection.get(include=["documents", "metadatas"])
-    ids = all_docs["ids"]
-    doc_texts = all_docs["documents"]
-    metadatas = all_docs["metadatas"]
+    @classmethod
+    def load(cls, log=print):
+        """Load models and retrievers. Returns None if the index is unusable."""
+        # 1. Load embedding model
+        log("\n🔄 Loading BGE-M3 (1024-dim)...")
+        try:
+            embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+            log("✅ Embedding model ready")
+        except Exception as e:
+            log(f"❌ Failed to load embeddings: {e}")
+            return None
+        
+        # 2-4. Live collection version, vector + BM25 retrievers, router
+        # (signature first, so a promotion during the load is noticed later)
+        signature = pointer_signature()
+        snapshot = IndexSnapshot.load(embed_model, log=log)
+        if snapshot is None:
+            return None
+        
+        # Tokenizer for the context budget
+        token_counter = TokenCounter.from_pretrained()
+        
+        log("✅ Hybrid retriever ready")
+        log("   → Vector search: semantic similarity")
+        log("   → BM25 search: exact term matching")
+        
+        engine = cls(embed_model, snapshot, token_counter, log=log)
+        engine._pointer_signature = signature
+        return engine
     
-    if not doc_texts:
-        print("⚠️  No documents found for BM25 – using vector only")
-        bm25_retriever = None
-    else:
-        cache_dir = os.path.join(PROJECT_ROOT, "cache", "bm25_cache")
-        similarity_top_k = 10
+    def index_promoted(self):
+        """Whether the version pointer changed since the snapshot was loaded (one stat call)"""
+        return pointer_signature() != self._pointer_signature
+    
+    def reload_if_promoted(self, log=None):
+        """
+        Swap to a newly promoted collection version, or to a new generation of
+        the live one after the watcher changed it (utils/index_versions.py).
+        
+        The new snapshot is built while the current one keeps serving;
+        queries already running finish on the snapshot they started with.
         
-        # Try to load from cache
-        bm25_retriever = load_bm25_cache(cache_dir, doc_texts, ids, metadatas, similarity_top_k)
+        Returns:
+            True if a new snapshot was loaded
+        """
+        log = log or self.log
+        if not self.index_promoted():
+            return False
         
-        # If cache miss or hash mismatch, rebuild
-        if bm25_retriever is None:
-            print("🔄 Building fresh BM25 index...")
-            from llama_index.core.schema import TextNode
+        with self._reload_lock:
+            signature = pointer_signature()
+            if signature == self._pointer_signature:
+                return False
+            self._pointer_signature = signature
+            pointer = read_pointer() or {}
+            collection_name, generation = active_generation(pointer)
+            current = self.snapshot
+            if (collection_name, generation) == (current.collection_name, current.generation):
+                return False
             
-            nodes = [
-                TextNode(id_=node_id, text=text, metadata=meta or {})
-                for node_id, text, meta in zip(ids, doc_texts, metadatas)
-            ]
+            if collection_name == current.collection_name:
+                log(f"\n🔁 {collection_name} changed (generation {generation})")
+                # A fresh Chroma client, so the watcher's writes are read from disk
+                # (the old snapshot keeps its own client for queries still running)
+                reset_chroma_clients()
+            else:
+                log(f"\n🔁 New index version: {current.collection_name} → {collection_name}")
+            started = time.perf_counter()
+            try:
+                snapshot = IndexSnapshot.load(self.embed_model, collection_name, log=_quiet,
+                                              generation=generation)
+            except Exception as e:
+                log(f"⚠️  {e}")
+                snapshot = None
+            if snapshot is None:
+                log(f"⚠️  Could not load {collection_name} - still serving "
+                    f"{self.snapshot.collection_name}")
+                INDEX_RELOADS.inc(status='error')
+                return False
             
-            bm25_retriever = BM25Retriever.from_defaults(
-                nodes=nodes,
-                similarity_top_k=similarity_top_k,
-                verbose=True
-            )
-            # Save to cache
-            save_bm25_cache(bm25_retriever, doc_texts, cache_dir)
-            print(f"✅ BM25 index built and cached ({len(nodes)} nodes)")
+            self.snapshot = snapshot
+            INDEX_RELOADS.inc(status='ok')
+            log(f"✅ Serving {collection_name} ({snapshot.chroma_collection.count()} vectors, "
+                f"swapped in {time.perf_counter() - started:.1f}s)")
+            # End-to-end freshness: the watcher records when its first file event arrived
+            changed_at = pointer.get('changed_at')
+            if changed_at:
+                freshness = max(0.0, time.time() - changed_at)
+                INDEX_FRESHNESS_SECONDS.observe(freshness)
+                log(f"   ⏱️  Serving Dataset changes {freshness:.1f}s after the first file event")
+            return True
+    
+    def watch_index(self, interval=INDEX_RELOAD_SECONDS, log=print):
+        """Check for promoted versions every `interval` seconds from a daemon thread"""
+        def run():
+            while not self._stop_watch.wait(interval):
+                try:
+                    self.reload_if_promoted(log=log)
+                except Exception as e:
+                    log(f"⚠️  Index reload check failed: {e}")
+        
+        threading.Thread(target=run, name="index-reload", daemon=True).start()
+    
+    def stop_watch(self):
+        self._stop_watch.set()
+    
+    def prepare_fork(self):
+        """
+        Build everything workers can share before os.fork() (routed subset
+        retrievers), then freeze the heap so the cyclic GC never touches -
+        and so copies - the pages workers inherit.
+        
+        Returns:
+            Number of prewarmed routes
+        """
+        routes = self.snapshot.router.prewarm()
+        gc.collect()
+        gc.freeze()
+        return routes
+    
+    def after_fork(self, workers):
+        """Per-worker state in a forked child: Chroma connection and LLM rate-limit share"""
+        self.snapshot.reopen(self.embed_model)
+        self.scheduler = LLMScheduler.from_env(workers=workers)
+    
+    def embed_query(self, query):
+        """Query embedding, micro-batched across threads when a batcher is attached"""
+        if self.batcher is not None:
+            return self.batcher.embed(query)
+        return self.embed_model.get_query_embedding(query)
+    
+    def retrieve(self, query, query_embedding=None, trace=NULL_TRACE, fact_nodes=None):
+        """
+        Facts lookup, then hybrid retrieval over the routed subset, falling
+        back to the whole collection when the subset has no strong match.
+        Pass `query_embedding` and `fact_nodes` (lookup_fact_nodes result, []
+        on a miss) when they were already computed (batch runs) and a Trace
+        (utils/tracing.py) to record facts/embed/vector/bm25/fusion spans.
+        
+        Returns:
+            Dict with 'nodes' (relevant nodes, best first), 'query_embedding',
+            'source' ('facts' | 'routed' | 'hybrid' | 'vector') and 'error'
+        """
+        log = self.log
+        # One snapshot for the whole query, even if a reload swaps it meanwhile
+        snapshot = self.snapshot
+        result = {'nodes': [], 'query_embedding': None, 'source': None, 'error': None}
+        
+        # EXACT-MATCH FACTS (skips embedding + search on a hit)
+        if fact_nodes is None:
+            with trace.span('facts') as span:
+                fact_nodes = lookup_fact_nodes(query, snapshot.collection_name)
+                span.set(hit=bool(fact_nodes))
+        CACHE_LOOKUPS.inc(cache='facts', result='hit' if fact_nodes else 'miss')
+        if fact_nodes:
+            log(f"\n⚡ Facts index hit: {len(fact_nodes)} exact match(es)")
+            result.update(nodes=fact_nodes, source='facts')
+            return result
+        
+        # Embed once - reused by every search and by compression
+        if query_embedding is None:
+            with trace.span('embed', batched=self.batcher is not None):
+                query_embedding = self.embed_query(query)
+        result['query_embedding'] = query_embedding
+        
+        # ROUTE (subset searched first, whole collection only as a fallback)
+        route = snapshot.router.route(query)
+        if route:
+            with trace.span('route', route=describe_route(route)) as span:
+                cache_hit = snapshot.router.is_cached(route)
+                span.set(cache_hit=cache_hit)
+                routed = snapshot.router.get(route)
+            CACHE_LOOKUPS.inc(cache='routed_retrievers', result='hit' if cache_hit else 'miss')
         else:
-            # Ensure the retriever has the correct metadata mapping (optional)
-            pass
+            routed = None
+        
+        nodes = None
+        if routed:
+            try:
+                routed_nodes = hybrid_retrieve(
+                    routed[0], routed[1], query,
+                    top_k=SIMILARITY_TOP_K, query_embedding=query_embedding, trace=trace
+                )
+                if routed_nodes and routed_nodes[0].score >= ROUTE_MIN_SCORE:
+                    log(f"\n🧭 Searched {describe_route(route)} only")
+                    nodes = routed_nodes
+                    result['source'] = 'routed'
+                else:
+                    log(f"\n🧭 No strong match in {describe_route(route)} - searching all clauses")
+            except Exception as e:
+                log(f"⚠️  Routed retrieval error: {e}")
+        
+        # HYBRID RETRIEVAL
+        if nodes is None:
+            log(f"\n🔍 Hybrid search (BM25 + Vector)...")
+            try:
+                nodes = hybrid_retrieve(
+                    snapshot.vector_retriever, 
+                    snapshot.bm25_retriever, 
+                    query, 
+                    top_k=SIMILARITY_TOP_K,
+                    query_embedding=query_embedding,
+                    trace=trace
+                )
+                result['source'] = 'hybrid'
+            except Exception as e:
+                log(f"⚠️  Hybrid retrieval error: {e}")
+                log("Falling back to vector-only...")
+                with trace.span('vector', fallback=True) as span:
+                    nodes = snapshot.vector_retriever.retrieve(
+                        QueryBundle(query_str=query, embedding=query_embedding)
+                    )
+                    span.set(candidates=len(nodes))
+                result['source'] = 'vector'
+        
+        if len(nodes) == 0:
+            result['error'] = "No relevant clauses found."
+            return result
+        
+        # Filter by threshold
+        relevant_nodes = [n for n in nodes if n.score > RELEVANCE_THRESHOLD]
+        if not relevant_nodes:
+            result['error'] = f"No clauses meet relevance threshold (>{RELEVANCE_THRESHOLD})"
+            return result
+        
+        log(f"✅ Found {len(relevant_nodes)} relevant clause(s)")
+        trace.set(source=result['source'], relevant=len(relevant_nodes), index=snapshot.collection_name)
+        result['nodes'] = relevant_nodes
+        return result
     
-    print("✅ Hybrid retriever ready")
-    print("   → Vector search: semantic similarity")
-    print("   → BM25 search: exact term matching")
+    def build_prompt(self, query, retrieval, trace=NULL_TRACE):
+        """
+        Compress and pack the retrieved clauses into chat messages.
+        
+        Returns:
+            (messages, clause_info, context_stats)
+        """
+        with trace.span('prompt') as span:
+            messages, clause_info, context_stats = self._build_prompt(query, retrieval, trace)
+            span.set(context_tokens=context_stats['context_tokens'],
+                     saved_tokens=context_stats['saved_tokens'],
+                     clauses=len(clause_info))
+        return messages, clause_info, context_stats
     
-    # 5. Direct Groq client
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if not groq_api_key:
-        print("❌ GROQ_API_KEY not found")
-        return
+    def _build_prompt(self, query, retrieval, trace):
+        log = self.log
+        relevant_nodes = retrieval['nodes']
+        query_embedding = retrieval['query_embedding']
+        
+        def compress(selected):
+            # Extractive compression (top sentences per clause) of the clauses
+            # that survived overlap removal
+            if not COMPRESSION_ENABLED or query_embedding is None:
+                return selected
+            try:
+                with trace.span('compress') as span:
+                    compressed, compression_stats = compress_nodes(
+                        selected, query_embedding, self.embed_model,
+                        max_clauses=len(selected)
+                    )
+                    span.set(sentences_in=compression_stats['sentences_in'],
+                             sentences_kept=compression_stats['sentences_kept'])
+            except Exception as e:
+                log(f"⚠️  Compression skipped: {e}")
+                return selected
+            log(f"🗜️  Compressed {compression_stats['chars_before']} → "
+                f"{compression_stats['chars_after']} chars "
+                f"({compression_stats['sentences_kept']}/"
+                f"{compression_stats['sentences_in']} sentences)")
+            return compressed
+        
+        # Format context (overlap elimination, compression, token budget)
+        context, clause_info, context_stats = build_context(
+            relevant_nodes,
+            query,
+            self.token_counter,
+            token_budget=DEFAULT_TOKEN_BUDGET,
+            max_clauses=MAX_CONTEXT_CLAUSES,
+            compress=compress
+        )
+        log(f"✂️  Context: {context_stats['context_tokens']} tokens "
+            f"(saved {context_stats['saved_tokens']}, "
+            f"{context_stats['dropped_overlaps']} overlap(s) dropped, "
+            f"{context_stats['truncated_clauses']} clause(s) truncated, "
+            f"{context_stats['skipped_clauses']} skipped)")
+        
+        # Detect language and build the Groq prompt
+        language = detect_language(query)
+        system_prompt = get_system_prompt(language)
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user", 
+                "content": f"PROVIDED CLAUSES:\n\n{context}\n\n---\n\nUSER QUESTION: {query}"
+            }
+        ]
+        return messages, clause_info, context_stats
     
-    try:
-        client = Groq(api_key=groq_api_key)
-        test = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": "Say OK"}],
-            max_tokens=10
+    def _record_llm(self, trace, timings, status, duration_ms=None):
+        """Scheduler timings → 'llm_queue' and 'llm' spans plus LLM metrics"""
+        backend = self.llm.name
+        LLM_REQUESTS.inc(backend=backend, status=status)
+        LLM_RETRIES.inc(timings.get('retries', 0), backend=backend)
+        for kind in ('prompt', 'completion'):
+            LLM_TOKENS.inc(timings.get(f'{kind}_tokens') or 0, backend=backend, type=kind)
+        
+        trace.add_span('llm_queue', timings.get('queue_wait_ms', 0.0))
+        trace.add_span(
+            'llm',
+            timings.get('generation_ms', 0.0) if duration_ms is None else duration_ms,
+            retries=timings.get('retries', 0),
+            prompt_tokens=timings.get('prompt_tokens'),
+            completion_tokens=timings.get('completion_tokens')
         )
-        print(f"✅ Groq API: {test.choices[0].message.content.strip()}")
-    except Exception as e:
-        print(f"❌ Groq failed: {e}")
+    
+    def _refund_tokens(self, cost, timings):
+        """max_tokens is charged up front; return what the reply did not use"""
+        used = (timings.get('prompt_tokens') or 0) + (timings.get('completion_tokens') or 0)
+        self.scheduler.refund(cost, used)
+
+    def generate(self, messages, priority=INTERACTIVE, trace=NULL_TRACE):
+        """
+        Blocking completion through the rate-limit scheduler. Queue wait and
+        generation are recorded as separate spans on `trace`.
+        """
+        timings = {}
+        status = 'error'
+        cost = estimate_tokens(messages, LLM_MAX_TOKENS, self.token_counter)
+        try:
+            result = self.scheduler.run(
+                lambda: self.llm.complete(messages, max_tokens=LLM_MAX_TOKENS, temperature=0.1),
+                cost=cost,
+                priority=priority,
+                timings=timings
+            )
+            timings['prompt_tokens'] = result.prompt_tokens
+            timings['completion_tokens'] = result.completion_tokens
+            self._refund_tokens(cost, timings)
+            status = 'ok'
+        finally:
+            self._record_llm(trace, timings, status)
+        return result.text.strip()
+    
+    def stream(self, messages, priority=INTERACTIVE, trace=NULL_TRACE):
+        """Yield answer text deltas as the LLM produces them (retries before the first token)"""
+        timings = {}
+        status = 'error'
+        start = time.perf_counter()
+        cost = estimate_tokens(messages, LLM_MAX_TOKENS, self.token_counter)
+        try:
+            deltas = self.scheduler.run(
+                lambda: self.llm.stream(messages, max_tokens=LLM_MAX_TOKENS, temperature=0.1,
+                                        usage=timings),
+                cost=cost,
+                priority=priority,
+                timings=timings
+            )
+            yield from deltas
+            status = 'ok'
+        finally:
+            # Usage arrives with the last chunk; an aborted stream has none and keeps its charge
+            self._refund_tokens(cost, timings)
+            total_ms = (time.perf_counter() - start) * 1000
+            self._record_llm(trace, timings, status,
+                             max(0.0, total_ms - timings.get('queue_wait_ms', 0.0)))
+
+def finish_query(trace, status, **attrs):
+    """Write the query's trace and fold it into the query metrics"""
+    record = trace.finish(status, **attrs)
+    transport = trace.attrs.get('transport', trace.name)
+    QUERIES.inc(transport=transport, status=status)
+    QUERY_SECONDS.observe(record['duration_ms'] / 1000, transport=transport)
+    for span in trace.spans:
+        QUERY_STAGE_SECONDS.observe(span.duration_ms / 1000, stage=span.name)
+    return record
+
+STAGE_LABELS = [
+    ('embed_ms', 'embed'), ('vector_ms', 'vector'), ('bm25_ms', 'BM25'), ('fusion_ms', 'fusion'),
+    ('prompt_ms', 'prompt'), ('llm_queue_ms', 'LLM queue'), ('llm_ms', 'LLM'),
+]
+
+def format_stage_timings(trace):
+    """One status line with the per-stage milliseconds of a trace"""
+    stages = trace.stage_ms()
+    parts = [f"{label} {stages[key]:.0f} ms" for key, label in STAGE_LABELS if key in stages]
+    return "⏱️  " + " | ".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Interactive Solar PPA legal assistant")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = Profiler("chat_03", args.profile)
+    
+    started_at = time.time()
+    try:
+        chat_loop(profiler)
+    finally:
+        write_job_metrics("chat", started_at)
+        profiler.write_reports()
+
+def chat_loop(profiler):
+    load_dotenv()
+    
+    print("=" * 70)
+    print("☀️  SOLAR PPA LEGAL ASSISTANT - HYBRID RETRIEVAL")
+    print("=" * 70)
+    print("🔬 Mode: BM25 + Dense Vector Search")
+    print("=" * 70)
+    
+    with profiler.stage("load"):
+        engine = ChatEngine.load()
+    if engine is None:
+        return
+    
+    # 5. LLM backend (Groq by default, LLM_BASE_URL for a local stand-in)
+    with profiler.stage("llm_connect"):
+        engine.llm = create_llm_backend()
+    if engine.llm is None:
         return
     
     # 6. Chat loop
@@ -345,35 +1010,19 @@ def main():
                 print("\n👋 Goodbye!")
                 break
             
-            # HYBRID RETRIEVAL
-            print(f"\n🔍 Hybrid search (BM25 + Vector)...")
+            # Pick up a version promoted by index_02 --rebuild meanwhile
+            engine.reload_if_promoted(log=print)
             
-            try:
-                nodes = hybrid_retrieve(
-                    vector_retriever, 
-                    bm25_retriever, 
-                    query, 
-                    top_k=10
-                )
-            except Exception as e:
-                print(f"⚠️  Hybrid retrieval error: {e}")
-                print("Falling back to vector-only...")
-                nodes = vector_retriever.retrieve(QueryBundle(query_str=query))
-            
-            if len(nodes) == 0:
-                print("❌ No relevant clauses found.")
+            trace = start_trace('query', transport='cli', question=query)
+            with profiler.stage("retrieve"):
+                retrieval = engine.retrieve(query, trace=trace)
+            if retrieval['error']:
+                print(f"⚠️  {retrieval['error']}")
+                finish_query(trace, 'no_context')
                 continue
             
-            # Filter by threshold
-            relevant_nodes = [n for n in nodes if n.score > 0.5]
-            if not relevant_nodes:
-                print("⚠️  No clauses meet relevance threshold (>0.5)")
-                continue
-            
-            print(f"✅ Found {len(relevant_nodes)} relevant clause(s)")
-            
-            # Format context
-            context, clause_info = format_clauses_for_context(relevant_nodes, max_clauses=5)
+            with profiler.stage("prompt"):
+                messages, clause_info, context_stats = engine.build_prompt(query, retrieval, trace)
             
             top_clause = clause_info[0]
             print(f"\n📋 Top clause:")
@@ -381,32 +1030,16 @@ def main():
             print(f"   Combined score: {top_clause['score']:.3f}")
             print(f"   Preview: {top_clause['text_preview']}")
             
-            # Detect language and call Groq
-            language = detect_language(query)
-            system_prompt = get_system_prompt(language)
-            
             print(f"\n🤖 Generating answer...")
             
             try:
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user", 
-                        "content": f"PROVIDED CLAUSES:\n\n{context}\n\n---\n\nUSER QUESTION: {query}"
-                    }
-                ]
-                
-                completion = client.chat.completions.create(
-                    model="llama-3.1-8b-instant",
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=800
-                )
-                
-                answer = completion.choices[0].message.content.strip()
+                with profiler.stage("generate"):
+                    answer = engine.generate(messages, trace=trace)
+                print(format_stage_timings(trace))
                 
                 if not answer:
                     print("⚠️  Empty response from LLM")
+                    finish_query(trace, 'empty')
                     continue
                 
                 print("\n" + "=" * 70)
@@ -421,9 +1054,11 @@ def main():
                     print(f"     Score: {info['score']:.3f}")
                 
                 print("")
+                finish_query(trace, 'ok')
                 
             except Exception as e:
-                print(f"❌ Groq API error: {e}")
+                print(f"❌ LLM API error: {e}")
+                finish_query(trace, 'llm_error', error=str(e))
             
         except KeyboardInterrupt:
             print("\n\n👋 Interrupted!")
@@ -434,4 +1069,4 @@ def main():
             traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+ASYNC HTTP SERVICE FOR THE CHAT PIPELINE
+- Loads BGE-M3, Chroma, BM25 and the LLM backend ONCE (ChatEngine)
+- POST /query         → JSON answer + sources
+- POST /query/stream  → Server-Sent Events: sources, token deltas, done
+- GET  /health
+- GET  /stats (query-embedding micro-batcher queue metrics)
+- GET  /metrics (Prometheus text exposition, series labelled worker=<slot>
+  with --workers > 1)
+- Blocking retrieval/model calls run in a bounded thread pool,
+  LLM calls in a second pool, so one process serves many users
+- Concurrent query embeddings are micro-batched into one forward pass
+- Newly promoted index versions and watcher updates are swapped in while serving
+- --workers N: prefork mode - models, BM25 indexes and routed subsets are
+  loaded once and shared copy-on-write by N worker processes on one port;
+  per-worker unique memory (USS) is reported to size N (utils/prefork.py)
+"""
+import gc
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline.chat_03 import ChatEngine, LLM_MODEL, create_llm_backend, finish_query, _quiet
+from pipeline.llm_backends import create_backend
+from pipeline.embed_batcher import QueryEmbeddingBatcher
+from pipeline.llm_scheduler import INTERACTIVE
+from utils.tracing import start_trace
+from utils.index_versions import INDEX_RELOAD_SECONDS
+from utils.metrics import REGISTRY, CONTENT_TYPE, gauge
+from utils.prefork import PreforkSupervisor, listen_socket
+from utils.proc_memory import memory_usage
+from utils.async_http import (
+    HTTPError, read_request, encode_json, write_response,
+    start_chunked, write_chunk, end_chunked
+)
+
+PENDING_QUERIES = gauge("legal_rag_pending_queries", "Queries admitted and not yet answered")
+EMBED_QUEUE_DEPTH = gauge("legal_rag_embed_queue_depth", "Queries waiting for the embedding batcher")
+LLM_WAITING = gauge("legal_rag_llm_waiting", "LLM calls blocked on the rate-limit scheduler")
+PROCESS_MEMORY = gauge("legal_rag_process_memory_bytes", "Memory of this server process", ["kind"])
+
+# Seconds a stopping prefork worker waits for in-flight queries
+WORKER_DRAIN_SECONDS = float(os.getenv("WORKER_DRAIN_SECONDS", "20"))
+
+def configure_torch_threads(num_threads):
+    """Avoid oversubscription when several encodes run in parallel"""
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        print(f"🧵 Torch intra-op threads per encode: {num_threads}")
+    except ImportError:
+        pass
+
+def thread_sizing(workers=1, retrieval_workers=None, torch_threads=None):
+    """
+    Split the CPUs between server processes, retrieval threads and torch.
+
+    Returns:
+        (retrieval_workers, torch_threads), explicit values win
+    """
+    cpu_count = os.cpu_count() or 1
+    retrieval_workers = retrieval_workers or max(1, cpu_count // workers)
+    torch_threads = torch_threads or max(1, cpu_count // (workers * retrieval_workers))
+    return retrieval_workers, torch_threads
+
+class ChatService:
+    """Async front-end over a shared, warm ChatEngine"""
+
+    def __init__(self, engine, retrieval_workers, llm_workers, max_pending, worker=None):
+        self.engine = engine
+        # Prefork slot: every series this process exposes is labelled with it
+        self.worker = worker
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=retrieval_workers, thread_name_prefix="retrieval"
+        )
+        self.llm_executor = ThreadPoolExecutor(
+            max_workers=llm_workers, thread_name_prefix="llm"
+        )
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def shutdown(self):
+        self.engine.stop_watch()
+        if self.engine.batcher is not None:
+            self.engine.batcher.close()
+        self.retrieval_executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        if self.engine.llm is not None:
+            self.engine.llm.close()
+
+    def metrics(self):
+        """Prometheus exposition, with point-in-time gauges refreshed at scrape time"""
+        PENDING_QUERIES.set(self.pending)
+        if self.engine.batcher is not None:
+            EMBED_QUEUE_DEPTH.set(self.engine.batcher.stats()['queue_depth'])
+        LLM_WAITING.set(self.engine.scheduler.stats()['waiting'])
+        memory = memory_usage()
+        if memory is not None:
+            for kind in ('rss', 'pss', 'uss', 'shared'):
+                PROCESS_MEMORY.set(memory[kind], kind=kind)
+        # With --workers > 1 a scrape reaches whichever worker accepted it; the
+        # worker label keeps each process's counters a separate series
+        const_labels = (('worker', str(self.worker)),) if self.worker is not None else ()
+        return REGISTRY.render(const_labels).encode('utf-8')
+
+    def _admit(self):
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Too many pending queries, retry later")
+        self.pending += 1
+
+    @staticmethod
+    def _question(body):
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        question = str(payload.get('question', '')).strip()
+        if not question:
+            raise HTTPError(400, "Missing 'question'")
+        return question
+
+    async def _prepare(self, question, trace):
+        """Retrieval + prompt construction on the retrieval pool (spans recorded on `trace`)"""
+        loop = asyncio.get_running_loop()
+        retrieval = await loop.run_in_executor(
+            self.retrieval_executor, self.engine.retrieve, question, None, trace
+        )
+        if retrieval['error']:
+            return retrieval, None, [], {}
+        messages, clause_info, context_stats = await loop.run_in_executor(
+            self.retrieval_executor, self.engine.build_prompt, question, retrieval, trace
+        )
+        return retrieval, messages, clause_info, context_stats
+
+    async def query(self, body):
+        question = self._question(body)
+        self._admit()
+        trace = start_trace('query', transport='http', question=question)
+        status = 'error'
+        try:
+            retrieval, messages, clause_info, context_stats = await self._prepare(question, trace)
+            response = {
+                'question': question,
+                'answer': None,
+                'sources': clause_info,
+                'retrieval': retrieval['source'],
+                'context_tokens': context_stats.get('context_tokens'),
+                'saved_tokens': context_stats.get('saved_tokens'),
+                'error': retrieval['error'],
+                'trace_id': trace.trace_id,
+            }
+            if messages is None:
+                status = 'no_context'
+                response['timings'] = trace.stage_ms()
+                return response
+
+            loop = asyncio.get_running_loop()
+            try:
+                response['answer'] = await loop.run_in_executor(
+                    self.llm_executor, self.engine.generate, messages, INTERACTIVE, trace
+                )
+                status = 'ok'
+            except Exception as e:
+                status = 'llm_error'
+                response['error'] = f"LLM API error: {e}"
+            response['timings'] = trace.stage_ms()
+            return response
+        finally:
+            finish_query(trace, status)
+            self.pending -= 1
+
+    async def query_stream(self, body, writer, keep_alive=True):
+        question = self._question(body)
+        self._admit()
+        trace = start_trace('query', transport='http-stream', question=question)
+        status = 'error'
+        try:
+            # Retrieve before the headers go out so a failure here still gets a plain 500
+            retrieval, messages, clause_info, _ = await self._prepare(question, trace)
+            start_chunked(writer, keep_alive=keep_alive)
+
+            async def send(event, data):
+                await write_chunk(
+                    writer, f"event: {event}\ndata: ".encode('utf-8') + encode_json(data) + b"\n\n"
+                )
+
+            await send('sources', {'retrieval': retrieval['source'], 'sources': clause_info,
+                                   'trace_id': trace.trace_id})
+
+            if messages is None:
+                status = 'no_context'
+                await send('error', {'error': retrieval['error']})
+            else:
+                try:
+                    async for delta in self._stream_llm(messages, trace):
+                        await send('token', {'text': delta})
+                    status = 'ok'
+                except Exception as e:
+                    status = 'llm_error'
+                    await send('error', {'error': f"LLM API error: {e}"})
+
+            await send('done', {'timings': trace.stage_ms()})
+            await end_chunked(writer)
+        finally:
+            finish_query(trace, status)
+            self.pending -= 1
+
+    async def _stream_llm(self, messages, trace):
+        """Pump the blocking LLM stream on the LLM pool into an asyncio queue"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        cancelled = False
+
+        def pump():
+            try:
+                for delta in self.engine.stream(messages, INTERACTIVE, trace):
+                    if cancelled:
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, delta)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        self.llm_executor.submit(pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled = True
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, _, body, keep_alive = request
+                try:
+                    if path == '/health':
+                        await write_response(writer, 200, {
+                            'status': 'ok', 'pending': self.pending, 'pid': os.getpid(),
+                            'index': self.engine.snapshot.collection_name
+                        }, keep_alive)
+                    elif path == '/stats':
+                        batcher = self.engine.batcher
+                        await write_response(writer, 200, {
+                            'pending': self.pending,
+                            'embedding_batcher': batcher.stats() if batcher else None,
+                            'llm_scheduler': self.engine.scheduler.stats()
+                        }, keep_alive)
+                    elif path == '/metrics':
+                        await write_response(writer, 200, self.metrics(), keep_alive,
+                                             content_type=CONTENT_TYPE)
+                    elif path in ('/query', '/query/stream'):
+                        if method != 'POST':
+                            raise HTTPError(405, "Use POST")
+                        if path == '/query':
+                            await write_response(writer, 200, await self.query(body), keep_alive)
+                        else:
+                            await self.query_stream(body, writer, keep_alive)
+                    else:
+                        raise HTTPError(404, f"Unknown path {path}")
+                except HTTPError as e:
+                    await write_response(writer, e.status, {'error': e.message}, keep_alive)
+                except Exception as e:
+                    await write_response(writer, 500, {'error': str(e)}, keep_alive=False)
+                    break
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"🌐 Serving on http://{host}:{port}  (POST /query, POST /query/stream)")
+    async with server:
+        await server.serve_forever()
+
+async def serve_worker(service, sock, drain_seconds=WORKER_DRAIN_SECONDS):
+    """Prefork worker: accept on the shared socket until SIGTERM/SIGINT, then drain"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    server = await asyncio.start_server(service.handle_connection, sock=sock)
+    await stop.wait()
+    # Stop accepting (the other workers keep the socket open), finish what is running
+    server.close()
+    deadline = loop.time() + drain_seconds
+    while service.pending and loop.time() < deadline:
+        await asyncio.sleep(0.1)
+
+def attach_batcher(engine, args):
+    if args.embed_batch_size > 1:
+        engine.batcher = QueryEmbeddingBatcher(
+            engine.embed_model,
+            max_batch_size=args.embed_batch_size,
+            max_wait_ms=args.embed_max_wait_ms
+        )
+        return True
+    return False
+
+def run_prefork(engine, args, retrieval_workers, torch_threads):
+    """
+    Fork args.workers workers from the warm engine. The parent watches for
+    promoted index versions, loads the new one and replaces the workers with
+    fresh forks, so the new index is shared as well.
+    """
+    # LLM clients hold sockets and a pool - every worker opens its own
+    engine.llm.close()
+    engine.llm = None
+    routes = engine.prepare_fork()
+    print(f"🧊 Prewarmed {routes} routed retrievers and froze the heap (gc.freeze) before forking")
+    listener = listen_socket(args.host, args.port)
+    
+    def run_worker(slot):
+        configure_torch_threads(torch_threads)
+        engine.after_fork(args.workers)
+        engine.llm = create_backend(LLM_MODEL)
+        attach_batcher(engine, args)
+        service = ChatService(engine, retrieval_workers, args.llm_workers, args.max_pending,
+                              worker=slot)
+        print(f"   👷 Worker {slot} serving (pid {os.getpid()})")
+        try:
+            asyncio.run(serve_worker(service, listener))
+        finally:
+            service.shutdown()
+    
+    supervisor = PreforkSupervisor(args.workers, run_worker,
+                                   memory_report_seconds=args.memory_report_seconds)
+    
+    def check_index():
+        if not engine.index_promoted():
+            return
+        # Let the GC reclaim the old snapshot once nothing references it
+        gc.unfreeze()
+        reloaded = engine.reload_if_promoted(log=print)
+        engine.prepare_fork()
+        if reloaded:
+            supervisor.rolling_restart()
+    
+    print(f"🌐 Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"(master pid {os.getpid()})")
+    supervisor.run(tick=check_index, tick_seconds=args.index_reload_seconds)
+    print("\n👋 Shut down")
+
+def main():
+    parser = argparse.ArgumentParser(description="Async HTTP service for the Solar PPA assistant")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Server processes sharing the loaded models and indexes (default: 1)")
+    parser.add_argument("--retrieval-workers", type=int, default=None,
+                        help="Threads for embedding/retrieval per process (default: CPU count / workers)")
+    parser.add_argument("--llm-workers", type=int, default=32,
+                        help="Concurrent LLM calls (default: 32)")
+    parser.add_argument("--max-pending", type=int, default=256,
+                        help="Queries admitted before returning 503 (default: 256)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Intra-op threads per encode (default: CPU count / retrieval workers)")
+    parser.add_argument("--embed-batch-size", type=int, default=16,
+                        help="Max queries per embedding batch, 1 disables batching (default: 16)")
+    parser.add_argument("--embed-max-wait-ms", type=float, default=5.0,
+                        help="How long a batch waits for more queries (default: 5 ms)")
+    parser.add_argument("--index-reload-seconds", type=float, default=INDEX_RELOAD_SECONDS,
+                        help=f"How often to check for a promoted index version (default: {INDEX_RELOAD_SECONDS:g})")
+    parser.add_argument("--memory-report-seconds", type=float, default=60.0,
+                        help="Per-worker memory report interval with --workers, 0 disables (default: 60)")
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+    retrieval_workers, torch_threads = thread_sizing(args.workers, args.retrieval_workers,
+                                                     args.torch_threads)
+
+    load_dotenv()
+
+    print("=" * 70)
+    print("☀️  SOLAR PPA LEGAL ASSISTANT - HTTP SERVICE")
+    print("=" * 70)
+
+    if args.workers > 1:
+        # Tokenizer thread pools do not survive fork()
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    else:
+        configure_torch_threads(torch_threads)
+
+    engine = ChatEngine.load()
+    if engine is None:
+        return
+    engine.llm = create_llm_backend()
+    if engine.llm is None:
+        return
+    engine.log = _quiet
+    
+    if args.embed_batch_size > 1:
+        print(f"📦 Query embedding micro-batching: up to {args.embed_batch_size} "
+              f"queries / {args.embed_max_wait_ms:g} ms")
+    print(f"🔁 Watching for promoted / updated index versions every {args.index_reload_seconds:g}s")
+    
+    if args.workers > 1:
+        # Nothing may start threads in the parent before forking
+        run_prefork(engine, args, retrieval_workers, torch_threads)
+        return
+    
+    attach_batcher(engine, args)
+    engine.watch_index(args.index_reload_seconds)
+
+    service = ChatService(engine, retrieval_workers, args.llm_workers, args.max_pending)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+TOKEN-BUDGETED CONTEXT PACKING
+- Counts tokens with the LLM's tokenizer (falls back to a conservative
+  3.5 chars/token, i.e. it over-counts Llama 3's ~4 chars/token on English)
+- Drops nodes whose text is contained in another selected node
+  (per-term definition nodes vs. the full "Definitions" clause)
+- Truncates long clauses around the spans that best match the query;
+  separators and [...] markers are charged against the budget too
+- Reports prompt tokens saved vs. format_clauses_for_context
+"""
+import os
+import re
+import math
+
+# The budget applies to the LLM prompt (llama-3.1-8b-instant), so count with
+# its tokenizer. The meta-llama repo is gated: without an accepted licence
+# and HF_TOKEN the char estimate below is used instead.
+DEFAULT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "meta-llama/Llama-3.1-8B-Instruct")
+CHARS_PER_TOKEN = 3.5
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# A clause left with less than this is skipped rather than cut to a stub
+MIN_CLAUSE_TOKENS = 32
+CLAUSE_SEPARATOR = "\n\n---\n\n"
+GAP_MARKER = "[...]"
+
+STOPWORDS = {
+    'the', 'and', 'for', 'are', 'what', 'who', 'when', 'where', 'which', 'does',
+    'how', 'this', 'that', 'with', 'from', 'under', 'into', 'is', 'of', 'to',
+    'in', 'on', 'by', 'an', 'a', 'be', 'do', 'it', 'as', 'or', 'if', 'any', 'mean',
+    'agreement', 'clause',
+}
+
+_DEFINITION_PREFIX = re.compile(r'^Definition of [^:]+:\s*')
+_SENTENCE_END = re.compile(r'(?<=[.;:])\s+(?=[A-Z(\"“])')
+
+class TokenCounter:
+    """Token counting with a HuggingFace tokenizer, or a char estimate without one"""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    @classmethod
+    def from_pretrained(cls, model_name=DEFAULT_TOKENIZER):
+        try:
+            from transformers import AutoTokenizer
+            return cls(AutoTokenizer.from_pretrained(model_name))
+        except Exception as e:
+            print(f"⚠️  Tokenizer unavailable ({e}) - estimating {CHARS_PER_TOKEN:g} chars/token")
+            return cls()
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+def _core_text(node):
+    """Whitespace-normalized body used for containment checks"""
+    text = _DEFINITION_PREFIX.sub('', node.text)
+    return ' '.join(text.split())
+
+def drop_contained_nodes(nodes):
+    """
+    Remove nodes whose text is fully contained in another node's text.
+    The container inherits the higher score so ranking is preserved.
+
+    Returns:
+        (kept_nodes, dropped_count)
+    """
+    cores = [_core_text(n) for n in nodes]
+    dropped = set()
+
+    for i, core in enumerate(cores):
+        for j, other in enumerate(cores):
+            if i == j or j in dropped or not core:
+                continue
+            # Identical texts: keep the earlier (higher ranked) copy
+            if core == other and j > i:
+                continue
+            if core in other:
+                dropped.add(i)
+                if (nodes[i].score or 0) > (nodes[j].score or 0):
+                    nodes[j].score = nodes[i].score
+                break
+
+    kept = [n for idx, n in enumerate(nodes) if idx not in dropped]
+    kept.sort(key=lambda n: n.score or 0, reverse=True)
+    return kept, len(dropped)
+
+def query_terms(query):
+    words = re.findall(r"[a-z0-9%]+", query.lower())
+    return {w for w in words if len(w) > 2 and w not in STOPWORDS}
+
+def _segments(text):
+    """Split a clause into lines, and over-long lines into sentences"""
+    segments = []
+    for line in text.split('\n'):
+        if len(line) > 400:
+            segments.extend(s for s in _SENTENCE_END.split(line) if s.strip())
+        elif line.strip():
+            segments.append(line)
+    return segments
+
+def _render(segments, chosen):
+    """Chosen segments in original order, removed stretches marked with [...]"""
+    parts = []
+    previous = -1
+    for idx in sorted(chosen):
+        if idx != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(segments[idx])
+        previous = idx
+    if previous != len(segments) - 1:
+        parts.append(GAP_MARKER)
+    return parts
+
+def _cut_to_tokens(text, budget, counter):
+    """Prefix of `text` plus [...] that fits in `budget` tokens ('' if none does)"""
+    chars = int((budget - counter.count(f" {GAP_MARKER}")) * CHARS_PER_TOKEN)
+    while chars > 0:
+        cut = f"{text[:chars]} {GAP_MARKER}"
+        if counter.count(cut) <= budget:
+            return cut
+        chars = int(chars * 0.8)
+    return ""
+
+def truncate_to_budget(text, query, budget, counter):
+    """
+    Keep the segments that best match the query, in original order,
+    marking removed stretches with [...]. Line breaks and markers count
+    against `budget`.
+
+    Returns:
+        Truncated text, or '' if the budget is below MIN_CLAUSE_TOKENS
+    """
+    if budget < MIN_CLAUSE_TOKENS:
+        return ""
+    segments = _segments(text)
+    if not segments:
+        return text
+
+    terms = query_terms(query)
+    sizes = [counter.count(s) for s in segments]
+    newline_cost = counter.count('\n')
+    marker_cost = counter.count(GAP_MARKER)
+
+    def cost(chosen):
+        parts = _render(segments, chosen)
+        markers = len(parts) - len(chosen)
+        return (sum(sizes[idx] for idx in chosen) + markers * marker_cost
+                + newline_cost * (len(parts) - 1))
+
+    scores = [sum(1 for t in terms if t in s.lower()) for s in segments]
+    matched = [idx for idx, sc in enumerate(scores) if sc > 0]
+
+    def distance(idx):
+        # Clause header first, then the lines surrounding the matches
+        if idx == 0 or not matched:
+            return 0 if idx == 0 else idx
+        return min(abs(idx - m) for m in matched)
+
+    # Best-matching segments first, then their neighbours, earlier wins ties
+    order = sorted(range(len(segments)), key=lambda idx: (-scores[idx], distance(idx), idx))
+
+    chosen = set()
+    for idx in order:
+        # Lower bound first, so hopeless segments skip the full cost
+        if sum(sizes[i] for i in chosen) + sizes[idx] > budget:
+            continue
+        if cost(chosen | {idx}) <= budget:
+            chosen.add(idx)
+
+    if not chosen:
+        # Even the best segment is too long - cut it by characters
+        return _cut_to_tokens(segments[order[0]], budget, counter)
+
+    return '\n'.join(_render(segments, chosen))
+
+def _allocate(sizes, budget):
+    """Water-filling: small clauses take what they need, the rest share evenly"""
+    allocation = [0] * len(sizes)
+    remaining = budget
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+
+    while pending:
+        share = remaining // len(pending)
+        idx = pending.pop(0)
+        allocation[idx] = min(sizes[idx], max(share, 0))
+        remaining -= allocation[idx]
+
+    return allocation
+
+def build_context(nodes, query, counter, token_budget=DEFAULT_TOKEN_BUDGET, max_clauses=5,
+                  compress=None):
+    """
+    Pack retrieved nodes into a prompt context under a token budget.
+
+    Overlapping nodes are dropped from the full ranked list first, so the
+    next candidates backfill them. `compress`, if given, maps the selected
+    nodes to shortened copies (context_compression.compress_nodes) before
+    the budget is split. Savings are measured against the first
+    `max_clauses` retrieved nodes as they are.
+
+    Returns:
+        (context_str, clause_info, stats) where clause_info matches
+        format_clauses_for_context and stats reports the tokens saved
+    """
+    naive_parts = [
+        f"[CLAUSE {n.metadata.get('clause_number', 'Unknown')}: "
+        f"{n.metadata.get('clause_title', 'Unknown Section')}]\n{n.text}"
+        for n in nodes[:max_clauses]
+    ]
+    naive_tokens = counter.count(CLAUSE_SEPARATOR.join(naive_parts))
+
+    kept, dropped = drop_contained_nodes(list(nodes))
+    selected = kept[:max_clauses]
+    if compress is not None:
+        selected = list(compress(selected))
+
+    headers = [
+        f"[CLAUSE {n.metadata.get('clause_number', 'Unknown')}: "
+        f"{n.metadata.get('clause_title', 'Unknown Section')}]"
+        for n in selected
+    ]
+    header_sizes = [counter.count(h) + counter.count('\n') for h in headers]
+    sizes = [counter.count(n.text) for n in selected]
+    separator_size = counter.count(CLAUSE_SEPARATOR)
+
+    # Fewer clauses rather than stubs: drop the lowest ranked while any
+    # clause would have to be cut below MIN_CLAUSE_TOKENS
+    while True:
+        # Headers, the line break after each and the separators between clauses
+        overhead = sum(header_sizes) + separator_size * max(len(selected) - 1, 0)
+        allocation = _allocate(sizes, max(token_budget - overhead, 0))
+        starved = any(size > allowed and allowed < MIN_CLAUSE_TOKENS
+                      for size, allowed in zip(sizes, allocation))
+        if not starved or len(selected) <= 1:
+            break
+        for items in (selected, headers, header_sizes, sizes):
+            items.pop()
+
+    context_parts = []
+    clause_info = []
+    truncated = 0
+    skipped = 0
+
+    for node, header, size, allowed in zip(selected, headers, sizes, allocation):
+        clause_text = node.text
+        if size > allowed:
+            clause_text = truncate_to_budget(clause_text, query, allowed, counter)
+            if not clause_text:
+                skipped += 1
+                continue
+            truncated += 1
+
+        context_parts.append(f"{header}\n{clause_text}")
+        clause_info.append({
+            'number': node.metadata.get('clause_number', 'Unknown'),
+            'title': node.metadata.get('clause_title', 'Unknown Section'),
+            'filename': node.metadata.get('filename', 'Unknown Document'),
+            'score': node.score,
+            'text_preview': clause_text[:150] + "..." if len(clause_text) > 150 else clause_text
+        })
+
+    context_str = CLAUSE_SEPARATOR.join(context_parts)
+    context_tokens = counter.count(context_str)
+    # Tokens can merge differently across part boundaries - never exceed the budget
+    while context_tokens > token_budget and len(context_parts) > 1:
+        context_parts.pop()
+        clause_info.pop()
+        skipped += 1
+        context_str = CLAUSE_SEPARATOR.join(context_parts)
+        context_tokens = counter.count(context_str)
+
+    stats = {
+        'naive_tokens': naive_tokens,
+        'context_tokens': context_tokens,
+        'saved_tokens': max(naive_tokens - context_tokens, 0),
+        'dropped_overlaps': dropped,
+        'truncated_clauses': truncated,
+        'skipped_clauses': skipped,
+    }
+    return context_str, clause_info, stats
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+EXTRACTIVE CONTEXT COMPRESSION
+Runs on the clauses build_context selected (after overlap removal), before
+the token budget is split:
+- Splits candidate clauses into sentences
+- Scores every sentence against the query embedding already computed for
+  retrieval, using ONE batched encode for all sentences
+- Keeps the top sentences (in original order) under each clause header,
+  so clause-number citations still work
+"""
+import os
+import re
+
+import numpy as np
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from pipeline.context_builder import GAP_MARKER
+
+COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION", "1") != "0"
+
+# Clauses shorter than this go to the prompt untouched
+MIN_CHARS_TO_COMPRESS = 600
+
+_SECTION_HEADER = re.compile(r'^##\s+\d+')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.;:!?])\s+(?=[A-Z(\"“\[])')
+
+def split_sentences(text):
+    """
+    Split a clause into (header_line, sentences).
+    Markdown table rows are kept as single sentences.
+    """
+    header = None
+    sentences = []
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if header is None and not sentences and _SECTION_HEADER.match(stripped):
+            header = stripped
+            continue
+        if stripped.startswith('|'):
+            sentences.append(stripped)
+            continue
+        sentences.extend(s.strip() for s in _SENTENCE_SPLIT.split(stripped) if s.strip())
+
+    return header, sentences
+
+def _cosine(matrix, vector):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    vector = np.asarray(vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * max(np.linalg.norm(vector), 1e-12)
+    return (matrix @ vector) / np.maximum(norms, 1e-12)
+
+def compress_nodes(nodes, query_embedding, embed_model, max_clauses=5,
+                   max_sentences=15, max_per_clause=5):
+    """
+    Keep only the sentences most similar to the query.
+
+    Args:
+        nodes: Selected NodeWithScore objects (best first)
+        query_embedding: Embedding already used for vector search
+        embed_model: Model used for the single batched sentence encode
+        max_clauses: Clauses considered (the rest would not reach the prompt)
+        max_sentences: Sentences kept across all compressed clauses
+        max_per_clause: Sentences kept per clause
+
+    Returns:
+        (compressed_nodes, stats)
+    """
+    candidates = nodes[:max_clauses]
+    split = []
+    flat = []
+
+    for node_idx, node in enumerate(candidates):
+        if len(node.text) < MIN_CHARS_TO_COMPRESS:
+            split.append(None)
+            continue
+        header, sentences = split_sentences(node.text)
+        split.append((header, sentences))
+        flat.extend((node_idx, sent_idx, s) for sent_idx, s in enumerate(sentences))
+
+    stats = {
+        'sentences_in': len(flat),
+        'sentences_kept': 0,
+        'chars_before': sum(len(n.text) for n in candidates),
+        'chars_after': 0,
+    }
+
+    if not flat:
+        stats['chars_after'] = stats['chars_before']
+        return list(candidates), stats
+
+    # One batched forward pass for every candidate sentence
+    embeddings = embed_model.get_text_embedding_batch([s for _, _, s in flat])
+    similarities = _cosine(embeddings, query_embedding)
+
+    ranked = sorted(range(len(flat)), key=lambda i: similarities[i], reverse=True)
+    keep = {}
+    total = 0
+
+    # Every compressed clause keeps its best sentence so it can still be cited
+    for i in ranked:
+        node_idx = flat[i][0]
+        if node_idx not in keep:
+            keep[node_idx] = {flat[i][1]}
+            total += 1
+
+    for i in ranked:
+        if total >= max_sentences:
+            break
+        node_idx, sent_idx, _ = flat[i]
+        if sent_idx in keep[node_idx] or len(keep[node_idx]) >= max_per_clause:
+            continue
+        keep[node_idx].add(sent_idx)
+        total += 1
+
+    compressed = []
+    for node_idx, node in enumerate(candidates):
+        if split[node_idx] is None:
+            compressed.append(node)
+            continue
+
+        header, sentences = split[node_idx]
+        parts = [header] if header else []
+        previous = -1
+        for sent_idx in sorted(keep.get(node_idx, ())):
+            if sent_idx != previous + 1:
+                parts.append(GAP_MARKER)
+            parts.append(sentences[sent_idx])
+            previous = sent_idx
+        if previous != len(sentences) - 1:
+            parts.append(GAP_MARKER)
+
+        text = '\n'.join(parts)
+        compressed.append(NodeWithScore(
+            node=TextNode(id_=node.node_id, text=text, metadata=dict(node.metadata)),
+            score=node.score
+        ))
+
+    stats['sentences_kept'] = total
+    stats['chars_after'] = sum(len(n.text) for n in compressed)
+    return compressed, stats
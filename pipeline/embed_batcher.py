@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+CROSS-REQUEST MICRO-BATCHING OF QUERY EMBEDDINGS
+Concurrent queries each want one BGE-M3 forward pass. The batcher collects
+them for up to `max_wait_ms` (or until `max_batch_size` are waiting), encodes
+them in ONE batch and resolves each caller's future.
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# Longest a caller waits for its embedding (a stuck encode must not hang requests)
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "30"))
+
+def encode_queries(embed_model, queries):
+    """
+    Batched query encode through the public get_text_embedding_batch.
+
+    Query and text embeddings only differ when the model prepends a query
+    instruction (BGE-M3 has none); such models are encoded one query at a
+    time with get_query_embedding so the instruction is applied.
+    """
+    if getattr(embed_model, "query_instruction", None):
+        return [embed_model.get_query_embedding(q) for q in queries]
+    queries = list(queries)
+    # get_text_embedding_batch splits its input into embed_batch_size chunks
+    # (10 by default for HuggingFaceEmbedding); keep a batch one forward pass
+    if getattr(embed_model, "embed_batch_size", len(queries)) < len(queries):
+        embed_model.embed_batch_size = len(queries)
+    return embed_model.get_text_embedding_batch(queries)
+
+class QueryEmbeddingBatcher:
+    """Thread-safe micro-batching front-end for query embeddings"""
+
+    def __init__(self, embed_model, max_batch_size=16, max_wait_ms=5.0):
+        self.embed_model = embed_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'max_queue_depth': 0,
+            'encode_seconds': 0.0,
+            'wait_seconds': 0.0,
+            'batch_sizes': {},
+        }
+        self._closed = False
+        # Orders submit() against close(): nothing is queued after the sentinel
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query):
+        """Queue a query, return a Future resolving to its embedding"""
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            self._queue.put((query, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+        return future
+
+    def embed(self, query, timeout=EMBED_TIMEOUT_SECONDS):
+        """
+        Blocking helper used in place of embed_model.get_query_embedding.
+        Raises concurrent.futures.TimeoutError after `timeout` seconds.
+        """
+        return self.submit(query).result(timeout=timeout)
+
+    def close(self):
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    def stats(self):
+        """Queue depth and batching metrics (safe to call from any thread)"""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+            snapshot['batch_sizes'] = dict(self._stats['batch_sizes'])
+        items = snapshot['items']
+        batches = snapshot['batches']
+        snapshot.update({
+            'queue_depth': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'avg_batch_size': round(items / batches, 3) if batches else 0.0,
+            'avg_wait_ms': round(snapshot['wait_seconds'] * 1000 / items, 3) if items else 0.0,
+            'avg_encode_ms': round(snapshot['encode_seconds'] * 1000 / batches, 3) if batches else 0.0,
+        })
+        return snapshot
+
+    def _collect(self, first):
+        """Gather more requests until the batch is full or the window closes"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _fail_pending(self):
+        """Resolve whatever is still queued at shutdown so no caller waits forever"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError("Batcher is closed"))
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._fail_pending()
+                return
+            batch = self._collect(first)
+
+            started = time.perf_counter()
+            queries = [q for q, _, _ in batch]
+            try:
+                embeddings = encode_queries(self.embed_model, queries)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._stats['errors'] += 1
+                continue
+            finished = time.perf_counter()
+
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result([float(x) for x in embedding])
+
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['items'] += len(batch)
+                self._stats['encode_seconds'] += finished - started
+                self._stats['wait_seconds'] += sum(started - enqueued for _, _, enqueued in batch)
+                sizes = self._stats['batch_sizes']
+                sizes[len(batch)] = sizes.get(len(batch), 0) + 1
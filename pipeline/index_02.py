@@ -5,6 +5,14 @@ CUSTOM INDEXER FOR SOLAR PPA FORMAT
 - No (a) (b) (c) prefixes required
 - Table-aware chunking with synthetic sentences
 - Definition prefix injection
+- Caches with typed Docling elements (ingest_01 default) are split from the
+  elements directly - no markdown re-parsing
+- Compressed caches (utils/doc_cache.py) are split while they stream in;
+  legacy .json caches are migrated first
+- --worker pulls documents from the tracker's work queue (utils/work_queue.py)
+- --rebuild writes every PDF in Dataset/ to a new collection version while
+  the live one keeps serving, then promotes it (utils/index_versions.py)
+- Indexed caches are archived to cache/indexed/ so rebuilds skip Docling
 """
 import sys
 if 'utils.storage_utils' in sys.modules:
@@ -17,8 +25,10 @@ import logging
 logging.basicConfig(level=logging.WARNING)
 
 import re
-import json
-import chromadb
+import time
+import fcntl
+import argparse
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 from llama_index.core import Settings
@@ -30,10 +40,58 @@ from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core.node_parser import SentenceSplitter
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.storage_utils import CACHE_DIR, CHROMA_DB_PATH
+from utils.storage_utils import (
+    CACHE_DIR, CHROMA_DB_PATH, DATA_DIR, load_hnsw_config, calculate_file_hash,
+    get_cached_path, get_archived_path, archive_cache_file, ensure_environment
+)
+from utils.index_versions import (
+    CHROMA_HOST, CHROMA_PORT, INDEX_KEEP_VERSIONS, chroma_client, active_collection_name,
+    versioned_name, next_version, promote, prune_versions
+)
+from utils.docling_elements import ELEMENTS_FORMAT, element_to_markdown, elements_to_markdown
+from utils.doc_cache import (
+    LEGACY_EXTENSION, CacheReader, cache_hash, find_cache_file, is_cache_file, migrate_legacy
+)
+from utils.work_queue import WorkQueue
+from utils.facts_store import replace_facts_for_file, delete_facts_for_collection
+from utils.metrics import counter, gauge, histogram, write_job_metrics
+from utils.profiling import Profiler, add_profile_argument
 
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+CACHE_FILES_PROCESSED = counter(
+    "legal_rag_index_documents_total", "Cache files handled by index_02", ["status"]
+)
+CHUNKS_GENERATED = counter(
+    "legal_rag_index_chunks_total", "Chunks produced by the clause splitter", ["kind"]
+)
+CHUNKS_EMBEDDED = counter(
+    "legal_rag_index_chunks_embedded_total", "Chunks sent through the embedding model"
+)
+VECTORS_WRITTEN = counter(
+    "legal_rag_index_vectors_written_total", "Vectors added to the Chroma collection"
+)
+FACTS_WRITTEN = counter(
+    "legal_rag_index_facts_written_total", "Rows written to the exact-match facts store"
+)
+STAGE_SECONDS = histogram(
+    "legal_rag_index_stage_seconds", "Time per indexing stage", ["stage"]
+)
+COLLECTION_VECTORS = gauge(
+    "legal_rag_collection_vectors", "Vectors in the Chroma collection after indexing"
+)
+
+# Precompiled patterns shared by the splitters below
+SECTION_PATTERN = re.compile(r'^##\s+\d+\.?\s+[^\n]+')
+SECTION_TITLE_PATTERN = re.compile(r'##\s+\d+\.?\s+(.+)')
+DIGITS_PATTERN = re.compile(r'\d+')
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\|[\s\-:|]+\|$')
+BOLD_PATTERN = re.compile(r'\*\*')
+# Docling heading text of a top-level clause: "4. GRID CONNECTION"
+NUMBERED_HEADING_PATTERN = re.compile(r'^(\d+)\.?\s+(.+)')
+# " TERM " means (with spaces inside quotes)
+DEFINITION_PATTERN = re.compile(r'["\"][\s]*([A-Z][^"\"]*?)[\s]*["\"][\s]*means', re.IGNORECASE)
+
 def detect_markdown_table(lines, start_idx):
     """Detect markdown table with separator line"""
     if start_idx >= len(lines):
@@ -43,7 +101,7 @@ def detect_markdown_table(lines, start_idx):
     potential_separator_idx = start_idx + 1
     if potential_separator_idx < len(lines):
         line = lines[potential_separator_idx].strip()
-        if re.match(r'^\|[\s\-:|]+\|$', line):
+        if TABLE_SEPARATOR_PATTERN.match(line):
             # Found separator, find end of table
             end_idx = potential_separator_idx + 1
             while end_idx < len(lines) and '|' in lines[end_idx]:
@@ -54,18 +112,24 @@ def detect_markdown_table(lines, start_idx):
 
 def extract_table_data(lines, start_idx, end_idx):
     """Extract key-value pairs from markdown table"""
+    # Rows are split lazily so only one row's cells are alive at a time
+    rows = (
+        line.split('|')
+        for line in (lines[i].strip() for i in range(start_idx, end_idx + 1))
+        if line and not TABLE_SEPARATOR_PATTERN.match(line)
+    )
+    return table_data_from_rows(rows)
+
+def table_data_from_rows(rows):
+    """Key-value pairs from table rows (iterable of cell lists): first two non-empty cells"""
     data = {}
     
-    for i in range(start_idx, end_idx + 1):
-        line = lines[i].strip()
-        if not line or re.match(r'^\|[\s\-:|]+\|$', line):
-            continue
-        
-        cells = [cell.strip() for cell in line.split('|') if cell.strip()]
+    for row in rows:
+        cells = [cell.strip() for cell in row if cell.strip()]
         
         if len(cells) >= 2:
-            key = re.sub(r'\*\*', '', cells[0].strip())
-            value = re.sub(r'\*\*', '', cells[1].strip())
+            key = BOLD_PATTERN.sub('', cells[0])
+            value = BOLD_PATTERN.sub('', cells[1])
             
             # Skip placeholder values
             if key and value and value not in ['[ ● ]', '[●]', '[ ● ]']:
@@ -79,7 +143,7 @@ def create_synthetic_sentences_from_table(table_data, table_title=""):
     
     for key, value in table_data.items():
         # Skip header rows
-        if key.lower() in ['subject', 'clause', 'key information', 'item', 'description']:
+        if key.lower() in TABLE_HEADER_KEYS:
             continue
         
         # Create natural sentence
@@ -124,7 +188,7 @@ def extract_definitions_from_text(text):
         # Pattern: " TERM " means (with spaces inside quotes)
         # [\s]* allows any amount of whitespace inside the quotes
         # [A-Z][^"\"]* captures term starting with capital, up to closing quote
-        match = re.search(r'["\"][\s]*([A-Z][^"\"]*?)[\s]*["\"][\s]*means', line_stripped, re.IGNORECASE)
+        match = DEFINITION_PATTERN.search(line_stripped)
         
         if match:
             # Save previous definition
@@ -149,15 +213,22 @@ def extract_definitions_from_text(text):
     
     return definitions
 
-def split_into_enhanced_clauses(full_text, filename="document"):
-    """Enhanced splitting with custom patterns"""
+TABLE_HEADER_KEYS = ['subject', 'clause', 'key information', 'item', 'description']
+
+def split_into_enhanced_clauses(full_text, filename="document", facts=None):
+    """
+    Enhanced splitting with custom patterns
+    
+    If a `facts` list is given, extracted definitions and table key-value
+    pairs are appended to it for the exact-match facts store.
+    """
     lines = full_text.split('\n')
     clauses = []
     
     # Find all numbered sections (## 1. TITLE or ## 1 TITLE)
     section_indices = []
     for i, line in enumerate(lines):
-        if re.match(r'^##\s+\d+\.?\s+[^\n]+', line.strip()):
+        if SECTION_PATTERN.match(line.strip()):
             section_indices.append((i, line.strip()))
     
     if not section_indices:
@@ -175,10 +246,10 @@ def split_into_enhanced_clauses(full_text, filename="document"):
             end_line_num = len(lines)
         
         # Extract clause number and title
-        number_match = re.search(r'\d+', header)
+        number_match = DIGITS_PATTERN.search(header)
         clause_number = number_match.group(0) if number_match else str(idx + 1)
         
-        title_match = re.search(r'##\s+\d+\.?\s+(.+)', header)
+        title_match = SECTION_TITLE_PATTERN.search(header)
         clause_title = title_match.group(1).strip() if title_match else header
         
         # Get full clause text
@@ -199,6 +270,13 @@ def split_into_enhanced_clauses(full_text, filename="document"):
                 if table_data:
                     synthetic_text = create_synthetic_sentences_from_table(table_data, clause_title)
                     clause_text = f"[TABLE SUMMARY] {synthetic_text}\n\n{clause_text}"
+                    if facts is not None:
+                        facts.extend(
+                            {'term': key, 'value': value, 'kind': 'table',
+                             'clause_number': clause_number, 'clause_title': clause_title}
+                            for key, value in table_data.items()
+                            if key.lower() not in TABLE_HEADER_KEYS
+                        )
                 i = table_end + 1
             else:
                 i += 1
@@ -210,6 +288,13 @@ def split_into_enhanced_clauses(full_text, filename="document"):
             if definitions:
                 print(f"   📖 Found {len(definitions)} definitions in Clause {clause_number}")
                 
+                if facts is not None:
+                    facts.extend(
+                        {'term': term, 'value': definition, 'kind': 'definition',
+                         'clause_number': clause_number, 'clause_title': clause_title}
+                        for term, definition in definitions
+                    )
+                
                 # Create separate node for each definition
                 for term, definition in definitions:
                     enhanced_text = f"Definition of {term}: {definition}"
@@ -230,6 +315,242 @@ def split_into_enhanced_clauses(full_text, filename="document"):
     
     return clauses
 
+# Strings are split in blocks this size, so lines come out at C speed
+# without materialising one list of every line in the document
+LINE_BLOCK_CHARS = 1 << 16
+
+def iter_lines(source):
+    """Lines of a string (same boundaries as str.split('\\n')) or of a text stream"""
+    if not isinstance(source, str):
+        for line in source:
+            yield line[:-1] if line.endswith('\n') else line
+        return
+    
+    # Pieces of a line that spans blocks
+    partial = []
+    for start in range(0, len(source), LINE_BLOCK_CHARS):
+        lines = source[start:start + LINE_BLOCK_CHARS].split('\n')
+        if len(lines) == 1:
+            partial.append(lines[0])
+            continue
+        if partial:
+            partial.append(lines[0])
+            lines[0] = ''.join(partial)
+        partial = [lines.pop()]
+        yield from lines
+    yield ''.join(partial)
+
+class _ClauseState:
+    """Lines, tables and definitions of the clause being streamed"""
+    
+    def __init__(self, header, number, title, from_markdown=True):
+        self.number = number
+        self.title = title
+        # Markdown clauses may need a definition rescan (see finish)
+        self.from_markdown = from_markdown
+        self.lines = [header]
+        self.tables = []
+        self.is_definition_clause = 'definition' in title.lower()
+        # Definition scan (same state machine as extract_definitions_from_text)
+        self.term = None
+        self.term_lines = []
+        self.definitions = []
+        if self.is_definition_clause:
+            self.scan_definition(header.strip())
+    
+    def add_table(self, rows):
+        self.tables.append(extract_table_data(rows, 0, len(rows) - 1))
+    
+    def scan_definition(self, line_stripped):
+        match = DEFINITION_PATTERN.search(line_stripped)
+        if match:
+            self._flush_definition()
+            self.term = match.group(1).strip()
+            self.term_lines = [line_stripped]
+        elif self.term and line_stripped:
+            self.term_lines.append(line_stripped)
+    
+    def end_definition(self):
+        """A structural break (sub-heading, table) closes the open definition"""
+        self._flush_definition()
+        self.term = None
+        self.term_lines = []
+    
+    def _flush_definition(self):
+        if self.term and self.term_lines:
+            definition_text = '\n'.join(self.term_lines).strip()
+            if definition_text:
+                self.definitions.append((self.term.strip(), definition_text))
+    
+    def finish(self, facts=None):
+        """Chunks for the completed clause (same as split_into_enhanced_clauses)"""
+        clause_text = '\n'.join(self.lines).strip()
+        if len(clause_text) < 50:
+            return []
+        
+        summaries = []
+        for table_data in self.tables:
+            if not table_data:
+                continue
+            summaries.append(create_synthetic_sentences_from_table(table_data, self.title))
+            if facts is not None:
+                facts.extend(
+                    {'term': key, 'value': value, 'kind': 'table',
+                     'clause_number': self.number, 'clause_title': self.title}
+                    for key, value in table_data.items()
+                    if key.lower() not in TABLE_HEADER_KEYS
+                )
+        if summaries:
+            # Each table's summary goes in front of the previous ones
+            clause_text = "".join(
+                f"[TABLE SUMMARY] {summary}\n\n" for summary in reversed(summaries)
+            ) + clause_text
+        
+        if not self.is_definition_clause:
+            return [(self.number, self.title, clause_text)]
+        
+        self._flush_definition()
+        definitions = self.definitions
+        if self.from_markdown and any(DEFINITION_PATTERN.search(summary) for summary in summaries):
+            # A table cell reads like a definition - rescan the prefixed text
+            definitions = extract_definitions_from_text(clause_text)
+        if not definitions:
+            return [(self.number, self.title, clause_text)]
+        
+        print(f"   📖 Found {len(definitions)} definitions in Clause {self.number}")
+        if facts is not None:
+            facts.extend(
+                {'term': term, 'value': definition, 'kind': 'definition',
+                 'clause_number': self.number, 'clause_title': self.title}
+                for term, definition in definitions
+            )
+        chunks = [(self.number, f"Definition: {term}", f"Definition of {term}: {definition}")
+                  for term, definition in definitions]
+        chunks.append((self.number, self.title, clause_text))
+        return chunks
+
+def iter_enhanced_clauses(source, filename="document", facts=None):
+    """
+    Single-pass streaming version of split_into_enhanced_clauses.
+    
+    Reads `source` (a markdown string or a text stream) line by line;
+    sections, tables and definitions are detected in one pass and each
+    clause's chunks are yielded as soon as the next section starts.
+    Output (chunks and `facts`) is identical to split_into_enhanced_clauses.
+    
+    Yields:
+        (clause_number, clause_title, clause_text) tuples
+    """
+    preamble = []
+    current = None
+    clause_lines = None
+    table_rows = None
+    scan_definition = None
+    sections = 0
+    
+    for line in iter_lines(source):
+        stripped = line.strip()
+        if stripped.startswith('##') and SECTION_PATTERN.match(stripped):
+            if current is not None:
+                if table_rows is not None:
+                    current.add_table(table_rows)
+                yield from current.finish(facts)
+            else:
+                # Text before the first section is only needed for the fallback
+                preamble = None
+            sections += 1
+            number_match = DIGITS_PATTERN.search(stripped)
+            clause_number = number_match.group(0) if number_match else str(sections)
+            title_match = SECTION_TITLE_PATTERN.search(stripped)
+            clause_title = title_match.group(1).strip() if title_match else stripped
+            
+            current = _ClauseState(line, clause_number, clause_title)
+            clause_lines = current.lines
+            table_rows = None
+            scan_definition = current.scan_definition if current.is_definition_clause else None
+        elif current is not None:
+            # A separator line makes the previous line the table's header row;
+            # the table runs until the first line without a '|'
+            if table_rows is not None:
+                if '|' in line:
+                    table_rows.append(line)
+                else:
+                    current.add_table(table_rows)
+                    table_rows = None
+            elif stripped.startswith('|') and TABLE_SEPARATOR_PATTERN.match(stripped):
+                table_rows = [clause_lines[-1], line]
+            clause_lines.append(line)
+            if scan_definition is not None:
+                scan_definition(stripped)
+        else:
+            preamble.append(line)
+    
+    if current is None:
+        print(f"   ⚠️  No numbered sections - using semantic chunking")
+        text = source if isinstance(source, str) else '\n'.join(preamble)
+        yield from semantic_fallback(text)
+        return
+    
+    if table_rows is not None:
+        current.add_table(table_rows)
+    yield from current.finish(facts)
+    print(f"   ✅ Detected pattern: ## N. TITLE ({sections} sections)")
+
+def iter_element_clauses(elements, filename="document", facts=None):
+    """
+    Clauses from compact Docling elements (utils/docling_elements.py).
+    
+    Same chunks as the markdown splitters, but structure comes from the
+    element types: numbered headings start clauses, table cells give the
+    key-value pairs directly and definitions are read from paragraph and
+    list-item elements only (a sub-heading or table ends a definition).
+    
+    Yields:
+        (clause_number, clause_title, clause_text) tuples
+    """
+    current = None
+    sections = 0
+    # Elements before the first numbered heading (kept for the semantic
+    # fallback, `elements` may be a one-shot stream)
+    preamble = []
+    
+    for element in elements:
+        kind = element.get('type')
+        text = (element.get('text') or '').strip()
+        
+        match = NUMBERED_HEADING_PATTERN.match(text) if kind == 'heading' else None
+        if match:
+            if current is not None:
+                yield from current.finish(facts)
+            sections += 1
+            current = _ClauseState(f"## {text}", match.group(1), match.group(2).strip(),
+                                   from_markdown=False)
+            preamble = None
+            continue
+        if current is None:
+            # Cover page / preamble before clause 1 (skipped like the markdown path)
+            preamble.append(element)
+            continue
+        
+        current.lines.extend(['', element_to_markdown(element)])
+        if kind == 'table':
+            current.tables.append(table_data_from_rows(element.get('rows', [])))
+        if not current.is_definition_clause:
+            continue
+        if kind in ('heading', 'table'):
+            current.end_definition()
+        else:
+            for line in text.split('\n'):
+                current.scan_definition(line.strip())
+    
+    if current is None:
+        print("   ⚠️  No numbered headings - using semantic chunking")
+        yield from semantic_fallback(elements_to_markdown(preamble))
+        return
+    
+    yield from current.finish(facts)
+    print(f"   ✅ Structured elements: {sections} numbered sections")
+
 def semantic_fallback(text, chunk_size=1500, chunk_overlap=200):
     """Fallback to semantic chunking if no structure detected"""
     splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
@@ -245,43 +566,233 @@ def semantic_fallback(text, chunk_size=1500, chunk_overlap=200):
     return clauses
 
 def main():
-    load_dotenv()
-    
-    print("="*80)
-    print("🔧 CUSTOM INDEXER: Solar PPA Format")
-    print("="*80)
-    print(f"📁 Cache: {CACHE_DIR}")
-    print(f"📁 ChromaDB: {CHROMA_DB_PATH}")
+    parser = argparse.ArgumentParser(description="Split cached documents into clauses and index them")
+    parser.add_argument("--worker", action="store_true",
+                        help="Pull documents from the shared work queue (run several in parallel)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-index all of Dataset/ into a new collection version and promote it")
+    parser.add_argument("--keep-versions", type=int, default=INDEX_KEEP_VERSIONS,
+                        help=f"Versions kept after --rebuild, live one included (default: {INDEX_KEEP_VERSIONS})")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = Profiler("index_02", args.profile)
     
-    # 1. Load embeddings
+    started_at = time.time()
+    ensure_environment()
+    try:
+        if args.worker:
+            run_worker(profiler)
+        elif args.rebuild:
+            run_rebuild(profiler, max(1, args.keep_versions))
+        else:
+            run_indexing(profiler)
+    finally:
+        write_job_metrics("index", started_at)
+        profiler.write_reports()
+
+def load_embed_model(profiler):
     print("\n🔄 Loading BGE-M3...")
     try:
-        embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+        with profiler.stage('load_model'), STAGE_SECONDS.time(stage='load_model'):
+            embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
         print("✅ Embedding model loaded")
     except Exception as e:
         print(f"❌ Failed: {e}")
         raise
+    return embed_model
 
-    # 2. Connect to ChromaDB
+def open_collection(collection_name=None, create=False):
+    """
+    The live Chroma collection version, created with the tuned HNSW
+    parameters if missing.
+    
+    CHROMA_HOST selects a Chroma server (required for concurrent index
+    workers), otherwise the local persistent store is used.
+    
+    Args:
+        collection_name: Collection to open instead of the live version
+        create: The collection must not exist yet (a --rebuild version)
+    """
     print("\n🔄 Connecting to ChromaDB...")
-    db = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection_name = "solar_ppa_collection"
+    db = chroma_client()
+    if CHROMA_HOST:
+        print(f"   🌐 Chroma server {CHROMA_HOST}:{CHROMA_PORT}")
+    collection_name = collection_name or active_collection_name()
+    
+    # Tuned HNSW parameters (see pipeline/tune_hnsw.py) only apply at creation
+    hnsw_config = load_hnsw_config()
+    collection_metadata = {"hnsw:space": "cosine", **hnsw_config}
+    
+    if create:
+        chroma_collection = db.create_collection(name=collection_name, metadata=collection_metadata)
+        print(f"✅ Created {collection_name}")
+        if hnsw_config:
+            print(f"   ⚙️  HNSW config: {hnsw_config}")
+        return chroma_collection
     
     try:
         chroma_collection = db.get_collection(collection_name)
-        print(f"📚 Using existing collection ({chroma_collection.count()} vectors)")
+        print(f"📚 Using existing collection {collection_name} ({chroma_collection.count()} vectors)")
+        existing_metadata = chroma_collection.metadata or {}
+        if any(existing_metadata.get(k) != v for k, v in hnsw_config.items()):
+            print("   ⚠️  Collection was built with different HNSW parameters - "
+                  "run index_02.py --rebuild to apply hnsw_config.json")
     except:
-        chroma_collection = db.create_collection(
+        chroma_collection = db.get_or_create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=collection_metadata
         )
-        print(f"✅ Created new collection")
+        print(f"✅ Created new collection {collection_name}")
+        if hnsw_config:
+            print(f"   ⚙️  HNSW config: {hnsw_config}")
+    return chroma_collection
+
+def split_cache_file(cf, profiler, cache_dir=None):
+    """
+    Split one cache file into clause Documents.
+    
+    Args:
+        cf: Cache file name inside cache_dir (legacy .json caches are migrated)
+        profiler: Profiler for the split stage
+        cache_dir: Directory holding cf (default CACHE_DIR; CACHE_ARCHIVE_DIR
+            for already indexed files)
+    
+    Returns:
+        (cache file name after migration, (filename, documents, facts) or
+        None if the cache is unreadable or too short)
+    """
+    cache_path = os.path.join(cache_dir or CACHE_DIR, cf)
+    print(f"\n📄 {cf}")
+    
+    try:
+        if cf.endswith(LEGACY_EXTENSION):
+            cache_path = migrate_legacy(cache_path)
+            cf = os.path.basename(cache_path)
+            print(f"   🗜️  Migrated to {cf}")
+        reader = CacheReader(cache_path)
+    except Exception as e:
+        print(f"   ❌ Failed to read: {e}")
+        CACHE_FILES_PROCESSED.inc(status='error')
+        return cf, None
+    
+    # CUSTOM SPLITTING (typed Docling elements when cached, else markdown),
+    # streamed while the cache is decompressed
+    with reader:
+        if not reader.document:
+            CACHE_FILES_PROCESSED.inc(status='skipped')
+            return cf, None
+        
+        base_metadata = reader.metadata
+        filename = base_metadata.get('filename', 'unknown.pdf')
+        is_elements = reader.format == ELEMENTS_FORMAT
+        if is_elements and not reader.document.get('records'):
+            CACHE_FILES_PROCESSED.inc(status='skipped')
+            return cf, None
+        if not is_elements and reader.document.get('chars', 0) < 100:
+            CACHE_FILES_PROCESSED.inc(status='skipped')
+            return cf, None
+        
+        # Facts are kept only if the whole stream decodes
+        facts = []
+        try:
+            with profiler.stage('split'), STAGE_SECONDS.time(stage='split'):
+                if is_elements:
+                    clauses = list(iter_element_clauses(reader.iter_elements(), filename, facts=facts))
+                else:
+                    clauses = list(iter_enhanced_clauses(reader.iter_lines(), filename, facts=facts))
+        except Exception as e:
+            print(f"   ❌ Failed to read: {e}")
+            CACHE_FILES_PROCESSED.inc(status='error')
+            return cf, None
+    CACHE_FILES_PROCESSED.inc(status='split')
     
+    print(f"   📊 Generated {len(clauses)} total chunks")
+    
+    # Track enhancements
+    table_chunks = sum(1 for _, _, text in clauses if '[TABLE SUMMARY]' in text)
+    definition_chunks = sum(1 for _, title, _ in clauses if 'Definition:' in title)
+    
+    if table_chunks > 0:
+        print(f"   📊 {table_chunks} table-enhanced chunks")
+    if definition_chunks > 0:
+        print(f"   📖 {definition_chunks} definition chunks with prefix")
+    CHUNKS_GENERATED.inc(table_chunks, kind='table')
+    CHUNKS_GENERATED.inc(definition_chunks, kind='definition')
+    CHUNKS_GENERATED.inc(len(clauses) - table_chunks - definition_chunks, kind='clause')
+    
+    # Create Documents
+    documents = []
+    for clause_number, clause_title, clause_text in clauses:
+        clause_metadata = base_metadata.copy()
+        clause_metadata.update({
+            'clause_number': clause_number,
+            'clause_title': clause_title,
+            'source_cache': cf,
+            'filename': filename,
+            'chunk_type': 'enhanced_clause',
+            'has_table': '[TABLE SUMMARY]' in clause_text,
+            'is_definition': 'Definition:' in clause_title
+        })
+        
+        documents.append(Document(text=clause_text, metadata=clause_metadata))
+    return cf, (filename, documents, facts)
+
+def embed_documents(documents, chroma_collection, embed_model, profiler, show_progress=True):
+    """Embed clause Documents and write them to the collection"""
     vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    try:
+        with profiler.stage('embed_and_write'), STAGE_SECONDS.time(stage='embed_and_write'):
+            VectorStoreIndex.from_documents(
+                documents,
+                storage_context=storage_context,
+                embed_model=embed_model,
+                show_progress=show_progress,
+                insert_batch_size=20
+            )
+        CHUNKS_EMBEDDED.inc(len(documents))
+    except Exception as e:
+        print(f"\n❌ Indexing failed: {e}")
+        raise
+
+def write_facts(filename, facts, profiler, collection_name):
+    """Facts of one document, stored for the collection version its clauses went into"""
+    with profiler.stage('facts'), STAGE_SECONDS.time(stage='facts'):
+        written = replace_facts_for_file(filename, facts, collection_name)
+    FACTS_WRITTEN.inc(written)
+    print(f"   ✓ {filename}: {written} facts")
+
+def print_banner():
+    print("="*80)
+    print("🔧 CUSTOM INDEXER: Solar PPA Format")
+    print("="*80)
+    print(f"📁 Cache: {CACHE_DIR}")
+    print(f"📁 ChromaDB: {CHROMA_HOST or CHROMA_DB_PATH}")
+
+def print_summary(chroma_collection, vectors_before):
+    final_count = chroma_collection.count()
+    VECTORS_WRITTEN.inc(max(0, final_count - vectors_before))
+    COLLECTION_VECTORS.set(final_count)
+    print("\n" + "="*80)
+    print(f"✅ COMPLETE - {final_count} total vectors")
+    print("   Enhancements:")
+    print(f"   • Custom definition extraction (' Term ' format)")
+    print(f"   • Table-aware chunking with synthetic sentences")
+    print(f"   • Definition prefix: 'Definition of X:'")
+    print("="*80)
+
+def run_indexing(profiler):
+    load_dotenv()
+    print_banner()
+    
+    # 1. Load embeddings
+    embed_model = load_embed_model(profiler)
+
+    # 2. Connect to ChromaDB
+    chroma_collection = open_collection()
 
     # 3. Process cache files
-    cache_files = [f for f in os.listdir(CACHE_DIR) if f.endswith('.json')]
+    cache_files = sorted(f for f in os.listdir(CACHE_DIR) if is_cache_file(f))
     
     if not cache_files:
         print("\n⏭️  No new cache files")
@@ -291,58 +802,15 @@ def main():
     print("="*80)
 
     all_documents = []
+    facts_by_file = {}
 
-    for cf in cache_files:
-        cache_path = os.path.join(CACHE_DIR, cf)
-        print(f"\n📄 {cf}")
-        
-        try:
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-        except Exception as e:
-            print(f"   ❌ Failed to read: {e}")
-            continue
-        
-        if not cache_data or not isinstance(cache_data, list):
-            continue
-            
-        full_doc = cache_data[0]
-        full_text = full_doc.get('text', '')
-        base_metadata = full_doc.get('metadata', {})
-        filename = base_metadata.get('filename', 'unknown.pdf')
-        
-        if len(full_text) < 100:
+    for i, cf in enumerate(cache_files):
+        cache_files[i], split = split_cache_file(cf, profiler)
+        if split is None:
             continue
-        
-        # CUSTOM SPLITTING
-        clauses = split_into_enhanced_clauses(full_text, filename)
-        
-        print(f"   📊 Generated {len(clauses)} total chunks")
-        
-        # Track enhancements
-        table_chunks = sum(1 for _, _, text in clauses if '[TABLE SUMMARY]' in text)
-        definition_chunks = sum(1 for _, title, _ in clauses if 'Definition:' in title)
-        
-        if table_chunks > 0:
-            print(f"   📊 {table_chunks} table-enhanced chunks")
-        if definition_chunks > 0:
-            print(f"   📖 {definition_chunks} definition chunks with prefix")
-        
-        # Create Documents
-        for clause_number, clause_title, clause_text in clauses:
-            clause_metadata = base_metadata.copy()
-            clause_metadata.update({
-                'clause_number': clause_number,
-                'clause_title': clause_title,
-                'source_cache': cf,
-                'filename': filename,
-                'chunk_type': 'enhanced_clause',
-                'has_table': '[TABLE SUMMARY]' in clause_text,
-                'is_definition': 'Definition:' in clause_title
-            })
-            
-            doc = Document(text=clause_text, metadata=clause_metadata)
-            all_documents.append(doc)
+        filename, documents, facts = split
+        facts_by_file.setdefault(filename, []).extend(facts)
+        all_documents.extend(documents)
 
     if not all_documents:
         print("\n⚠️  No documents to index")
@@ -353,37 +821,211 @@ def main():
     print(f"🚀 Indexing {len(all_documents)} enhanced chunks")
     print("="*80)
     
-    try:
-        index = VectorStoreIndex.from_documents(
-            all_documents,
-            storage_context=storage_context,
-            embed_model=embed_model,
-            show_progress=True,
-            insert_batch_size=20
-        )
-        print("\n✅ Indexing complete")
-    except Exception as e:
-        print(f"\n❌ Indexing failed: {e}")
-        raise
+    vectors_before = chroma_collection.count()
+    embed_documents(all_documents, chroma_collection, embed_model, profiler)
+    print("\n✅ Indexing complete")
+    
+    # 4b. Structured facts (exact-match lookups in chat_03)
+    print("\n📇 Writing facts store...")
+    for filename, facts in facts_by_file.items():
+        write_facts(filename, facts, profiler, chroma_collection.name)
     
-    # 5. Clean up
-    print("\n🗑️  Cleaning up...")
+    # 5. Archive (kept for --rebuild)
+    print("\n📦 Archiving indexed caches...")
     for cf in cache_files:
         try:
-            os.remove(os.path.join(CACHE_DIR, cf))
+            archive_cache_file(os.path.join(CACHE_DIR, cf))
             print(f"   ✓ {cf}")
         except Exception as e:
             print(f"   ⚠️  {e}")
     
     # 6. Stats
-    final_count = chroma_collection.count()
-    print("\n" + "="*80)
-    print(f"✅ COMPLETE - {final_count} total vectors")
-    print("   Enhancements:")
-    print(f"   • Custom definition extraction (' Term ' format)")
-    print(f"   • Table-aware chunking with synthetic sentences")
-    print(f"   • Definition prefix: 'Definition of X:'")
-    print("="*80)
+    print_summary(chroma_collection, vectors_before)
+
+def index_queued_document(file_hash, chroma_collection, embed_model, profiler):
+    """
+    Index one queued cache file; safe to repeat after a worker died mid-way.
+    
+    Returns:
+        Number of chunks written (0 if the cache is gone or had nothing to index)
+    """
+    cache_path = find_cache_file(CACHE_DIR, file_hash)
+    if cache_path is None:
+        # Indexed and archived by an earlier lease holder
+        print(f"\n⏭️  {file_hash[:12]}: no cache file (already indexed)")
+        return 0
+    
+    cf, split = split_cache_file(os.path.basename(cache_path), profiler)
+    if split is None:
+        raise ValueError(f"{cf} could not be split")
+    filename, documents, facts = split
+    
+    # Vectors of an interrupted earlier attempt would otherwise be duplicated
+    chroma_collection.delete(where={'file_hash': file_hash})
+    if documents:
+        embed_documents(documents, chroma_collection, embed_model, profiler, show_progress=False)
+    write_facts(filename, facts, profiler, chroma_collection.name)
+    archive_cache_file(os.path.join(CACHE_DIR, cf))
+    return len(documents)
+
+def run_worker(profiler):
+    """
+    Pull cache files from the 'index' work queue until it is drained.
+    
+    ingest_01 --worker queues every document it converts; cache files already
+    in cache/ are queued here too. Concurrent index workers need a Chroma
+    server (CHROMA_HOST) - with the local persistent store a file lock lets
+    one worker write at a time.
+    """
+    load_dotenv()
+    print_banner()
+    
+    index_queue = WorkQueue("index")
+    queued = sum(
+        index_queue.enqueue(cache_hash(f), requeue=True)
+        for f in sorted(os.listdir(CACHE_DIR)) if is_cache_file(f)
+    )
+    print(f"📬 Queued {queued} cache file(s) - worker {index_queue.worker}")
+    
+    with chroma_write_lock():
+        embed_model = load_embed_model(profiler)
+        chroma_collection = open_collection()
+        vectors_before = chroma_collection.count()
+        
+        for lease in index_queue.items():
+            try:
+                with index_queue.keep_alive(lease):
+                    written = index_queued_document(lease.item, chroma_collection, embed_model, profiler)
+                if index_queue.complete(lease):
+                    print(f"   ✅ {lease.item[:12]}: {written} chunks indexed")
+                else:
+                    print(f"   ⚠️  Lease lost on {lease.item[:12]} - another worker re-indexes it")
+            except Exception as e:
+                print(f"   ❌ {lease.item[:12]}: {e}")
+                index_queue.fail(lease, e)
+        
+        print(f"\n📊 Index queue: {index_queue.stats()}")
+        print_summary(chroma_collection, vectors_before)
+
+def rebuild_cache_path(pdf_file, profiler, converter_holder):
+    """
+    Cache file of one Dataset/ PDF for a rebuild: pending, archived, or
+    converted now when neither exists (documents indexed before caches were
+    archived).
+    
+    Returns:
+        (cache path, True if the cache is pending in CACHE_DIR)
+    """
+    file_hash = calculate_file_hash(os.path.join(DATA_DIR, pdf_file))
+    cache_path = get_cached_path(file_hash)
+    if cache_path:
+        return cache_path, True
+    cache_path = get_archived_path(file_hash)
+    if cache_path:
+        return cache_path, False
+    
+    from pipeline.ingest_01 import convert_pdf
+    if not converter_holder:
+        from docling.document_converter import DocumentConverter
+        print("   🔄 Loading Docling converter...")
+        converter_holder.append(DocumentConverter())
+    print(f"   🔄 No cache for {pdf_file} - converting")
+    return convert_pdf(converter_holder[0], pdf_file, file_hash, "elements", profiler), True
+
+def run_rebuild(profiler, keep_versions=INDEX_KEEP_VERSIONS):
+    """
+    Blue/green rebuild: index every PDF in Dataset/ into a new collection
+    version, build its BM25 snapshot, then atomically promote it. Chat keeps
+    serving the previous version until the pointer flips; a failed rebuild
+    drops its half-written collection and leaves the live one untouched.
+    """
+    from pipeline.chat_03 import refresh_bm25_cache
+    
+    load_dotenv()
+    print_banner()
+    
+    pdf_files = sorted(f for f in os.listdir(DATA_DIR) if f.lower().endswith('.pdf'))
+    if not pdf_files:
+        print(f"\n⏭️  No PDFs in {DATA_DIR}")
+        return
+    
+    with chroma_write_lock():
+        embed_model = load_embed_model(profiler)
+        db = chroma_client()
+        live_name = active_collection_name()
+        collection_name = versioned_name(next_version(db))
+        print(f"\n🟢 Building {collection_name} - {live_name} keeps serving")
+        chroma_collection = open_collection(collection_name, create=True)
+        
+        converter_holder = []
+        pending_caches = []
+        facts_by_file = {}
+        try:
+            print(f"\n📦 Rebuilding from {len(pdf_files)} document(s)")
+            print("="*80)
+            for pdf_file in pdf_files:
+                cache_path, pending = rebuild_cache_path(pdf_file, profiler, converter_holder)
+                cache_dir = os.path.dirname(cache_path)
+                cf, split = split_cache_file(os.path.basename(cache_path), profiler, cache_dir)
+                if pending:
+                    pending_caches.append(os.path.join(cache_dir, cf))
+                if split is None:
+                    continue
+                filename, documents, facts = split
+                # One document at a time keeps memory flat on large datasets
+                embed_documents(documents, chroma_collection, embed_model, profiler, show_progress=False)
+                facts_by_file[filename] = facts
+            
+            vectors = chroma_collection.count()
+            if vectors == 0:
+                raise ValueError("new version has no vectors")
+            
+            # BM25 snapshot before the flip, so chat processes swap in warm
+            print("\n🔤 Building BM25 snapshot...")
+            with profiler.stage('bm25'), STAGE_SECONDS.time(stage='bm25'):
+                refresh_bm25_cache(chroma_collection)
+            
+            # Facts of the new version only; the live version keeps its own
+            print("\n📇 Writing facts store...")
+            for filename, facts in facts_by_file.items():
+                write_facts(filename, facts, profiler, collection_name)
+        except BaseException as e:
+            print(f"\n❌ Rebuild failed ({e or type(e).__name__}) - dropping {collection_name}, "
+                  f"{live_name} stays live")
+            db.delete_collection(collection_name)
+            delete_facts_for_collection(collection_name)
+            raise
+        
+        # Atomic pointer flip
+        pointer = promote(collection_name, vectors=vectors, documents=len(facts_by_file),
+                          previous=live_name)
+        print(f"\n🔀 Promoted {collection_name} ({vectors} vectors) at {pointer['promoted_at']}")
+        
+        for cache_path in pending_caches:
+            archive_cache_file(cache_path)
+        
+        for name in prune_versions(db, keep_versions):
+            print(f"   🗑️  Dropped old version {name}")
+        print_summary(chroma_collection, 0)
+
+@contextmanager
+def chroma_write_lock():
+    """Exclusive lock on the local Chroma store (no-op with a Chroma server)"""
+    if CHROMA_HOST:
+        yield
+        return
+    os.makedirs(CHROMA_DB_PATH, exist_ok=True)
+    with open(os.path.join(CHROMA_DB_PATH, ".index_worker.lock"), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("⏳ Another index worker holds the local Chroma store - waiting "
+                  "(set CHROMA_HOST to index in parallel)")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
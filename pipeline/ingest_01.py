@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 import os
+import time
+import argparse
 from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
 
@@ -11,12 +13,137 @@ from utils.storage_utils import (
     calculate_file_hash,
     is_file_processed,
     save_to_cache,
+    save_elements_to_cache,
     register_in_db,
     ensure_environment,
-    init_tracker_db
+    init_tracker_db,
+    get_tracker,
+    get_cached_path
 )
+from utils.docling_elements import ELEMENTS_FORMAT, compact_elements
+from utils.work_queue import WorkQueue
+from utils.metrics import counter, histogram, write_job_metrics
+from utils.profiling import Profiler, add_profile_argument
+
+DOCUMENTS_PROCESSED = counter(
+    "legal_rag_ingest_documents_total", "PDFs seen by ingest_01", ["status"]
+)
+CONVERT_SECONDS = histogram(
+    "legal_rag_ingest_convert_seconds", "Docling PDF conversion time (to elements or markdown)"
+)
+INGESTED_BYTES = counter(
+    "legal_rag_ingest_bytes_total", "Bytes of PDF converted"
+)
+
+# Cache formats; the name is recorded in the tracker's parsing_parameters
+PARSING_PARAMETERS = {'elements': ELEMENTS_FORMAT, 'markdown': 'markdown'}
+
+def convert_pdf(converter, pdf_file, file_hash, cache_format, profiler):
+    """
+    Convert one PDF, cache it and register it in the tracker.
+    
+    Args:
+        converter: Docling DocumentConverter
+        pdf_file: File name inside DATA_DIR
+        file_hash: SHA-256 hash of the file
+        cache_format: Key of PARSING_PARAMETERS
+        profiler: Profiler for the convert / cache_write stages
+    
+    Returns:
+        Path to the cache file
+    """
+    pdf_path = os.path.join(DATA_DIR, pdf_file)
+    metadata = {
+        'filename': pdf_file,
+        'source': pdf_path,
+        'file_hash': file_hash
+    }
+    file_size = os.path.getsize(pdf_path)
+    
+    with profiler.stage("convert"), CONVERT_SECONDS.time():
+        result = converter.convert(pdf_path)
+        if cache_format == "elements":
+            # Typed items (headings, paragraphs, list items, table cells)
+            elements = compact_elements(result.document)
+        else:
+            markdown_text = result.document.export_to_markdown()
+    
+    with profiler.stage("cache_write"):
+        # Save to cache
+        if cache_format == "elements":
+            cache_path = save_elements_to_cache(file_hash, elements, metadata)
+        else:
+            # Create a LlamaIndex Document
+            from llama_index.core import Document
+            doc = Document(text=markdown_text, metadata=metadata)
+            cache_path = save_to_cache(file_hash, [doc])
+        
+        # Register in tracker
+        register_in_db(file_hash, pdf_file, cache_path,
+                       parsing_parameters=PARSING_PARAMETERS[cache_format],
+                       file_size=file_size)
+    
+    DOCUMENTS_PROCESSED.inc(status='converted')
+    INGESTED_BYTES.inc(file_size)
+    return cache_path
+
+def enqueue_new_pdfs(pdf_files, ingest_queue):
+    """Queue every PDF not yet in the tracker (already queued/leased ones are left alone)"""
+    queued = 0
+    for pdf_file in pdf_files:
+        file_hash = calculate_file_hash(os.path.join(DATA_DIR, pdf_file))
+        if not is_file_processed(file_hash):
+            queued += ingest_queue.enqueue(file_hash, {'filename': pdf_file}, requeue=True)
+    return queued
+
+def run_worker(converter, pdf_files, cache_format, profiler):
+    """
+    Pull PDFs from the 'ingest' work queue until it is drained.
+    
+    Any number of workers can run this against the same tracker database;
+    each converted document is queued for index_02 --worker.
+    """
+    ingest_queue = WorkQueue("ingest")
+    index_queue = WorkQueue("index")
+    queued = enqueue_new_pdfs(pdf_files, ingest_queue)
+    print(f"📬 Queued {queued} new file(s) - worker {ingest_queue.worker}")
+    
+    for lease in ingest_queue.items():
+        pdf_file = lease.payload['filename']
+        print(f"📂 Parsing: {pdf_file} (attempt {lease.attempts})...")
+        try:
+            with ingest_queue.keep_alive(lease):
+                if is_file_processed(lease.item):
+                    print(f"⏭️  Skipping {pdf_file} (Already in Database).")
+                    DOCUMENTS_PROCESSED.inc(status='skipped')
+                    # A previous attempt may have cached it but died before queueing
+                    cache_path = get_cached_path(lease.item)
+                else:
+                    cache_path = convert_pdf(converter, pdf_file, lease.item, cache_format, profiler)
+            if cache_path:
+                index_queue.enqueue(lease.item, {'filename': pdf_file}, requeue=True)
+            if ingest_queue.complete(lease):
+                print(f"   ✅ Processed & Cached.")
+            else:
+                print(f"   ⚠️  Lease lost - another worker owns {pdf_file} now")
+        except Exception as e:
+            print(f"   ❌ Error processing {pdf_file}: {e}")
+            DOCUMENTS_PROCESSED.inc(status='error')
+            ingest_queue.fail(lease, e)
+    
+    print(f"📊 Ingest queue: {ingest_queue.stats()}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert new PDFs in Dataset/ to cached documents")
+    parser.add_argument("--format", choices=sorted(PARSING_PARAMETERS), default="elements",
+                        help="Cache typed Docling elements (default) or the markdown export")
+    parser.add_argument("--worker", action="store_true",
+                        help="Pull files from the shared work queue (run several in parallel)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = Profiler("ingest_01", args.profile)
+    
+    started_at = time.time()
     load_dotenv()
     ensure_environment()
     init_tracker_db()
@@ -27,48 +154,34 @@ def main():
     pdf_files = [f for f in os.listdir(DATA_DIR) if f.lower().endswith('.pdf')]
     print(f"🔍 Found {len(pdf_files)} files. Synchronizing...")
     
-    converter = DocumentConverter()
+    with profiler.stage("converter_init"):
+        converter = DocumentConverter()
     
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(DATA_DIR, pdf_file)
-        
-        # Check if already processed
-        file_hash = calculate_file_hash(pdf_path)
-        if is_file_processed(file_hash):
-            print(f"⏭️  Skipping {pdf_file} (Already in Database).")
-            continue
-        
-        print(f"📂 Parsing: {pdf_file}...")
-        
-        try:
-            # Convert PDF to markdown
-            result = converter.convert(pdf_path)
-            markdown_text = result.document.export_to_markdown()
-            
-            # Create a LlamaIndex Document
-            from llama_index.core import Document
-            doc = Document(
-                text=markdown_text,
-                metadata={
-                    'filename': pdf_file,
-                    'source': pdf_path,
-                    'file_hash': file_hash
-                }
-            )
-            
-            # Save to cache
-            cache_path = save_to_cache(file_hash, [doc])
-            
-            # Register in tracker
-            file_size = os.path.getsize(pdf_path)
-            register_in_db(file_hash, pdf_file, cache_path, file_size=file_size)
-            
-            print(f"   ✅ Processed & Cached.")
-            
-        except Exception as e:
-            print(f"   ❌ Error processing {pdf_file}: {e}")
+    if args.worker:
+        run_worker(converter, pdf_files, args.format, profiler)
+    else:
+        # Tracker rows are buffered and committed in one transaction for the run
+        with get_tracker().batch():
+            for pdf_file in pdf_files:
+                # Check if already processed
+                file_hash = calculate_file_hash(os.path.join(DATA_DIR, pdf_file))
+                if is_file_processed(file_hash):
+                    print(f"⏭️  Skipping {pdf_file} (Already in Database).")
+                    DOCUMENTS_PROCESSED.inc(status='skipped')
+                    continue
+                
+                print(f"📂 Parsing: {pdf_file}...")
+                
+                try:
+                    convert_pdf(converter, pdf_file, file_hash, args.format, profiler)
+                    print(f"   ✅ Processed & Cached.")
+                except Exception as e:
+                    print(f"   ❌ Error processing {pdf_file}: {e}")
+                    DOCUMENTS_PROCESSED.inc(status='error')
     
+    write_job_metrics("ingest", started_at)
+    profiler.write_reports()
     print("\n🏁 Pipeline complete.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
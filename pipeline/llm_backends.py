@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+PLUGGABLE LLM BACKENDS
+One interface in front of every chat-completions provider:
+- GroqBackend: the Groq SDK on a pooled keep-alive httpx client
+- HTTPBackend: any OpenAI-compatible endpoint (local stand-in, vLLM,
+  llama.cpp server, ...) over a pooled httpx client
+Select with LLM_BACKEND=groq|http and LLM_BASE_URL; the connection pool
+is sized by LLM_POOL_SIZE so concurrent workers reuse warm connections.
+"""
+import os
+import abc
+import json
+
+import httpx
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 60.0
+
+class LLMBackendError(Exception):
+    """Provider returned an error status (read by the LLM scheduler)"""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class LLMConnectionError(LLMBackendError):
+    """Connection reset, refused or timed out - always retryable"""
+
+class LLMResult:
+    def __init__(self, text, prompt_tokens=0, completion_tokens=0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+def _pooled_http_client(pool_size, timeout, **kwargs):
+    """httpx client that keeps up to `pool_size` connections alive"""
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        **kwargs
+    )
+
+def _record_usage(usage_out, usage):
+    if usage_out is None or not usage:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    usage_out['prompt_tokens'] = get('prompt_tokens') or 0
+    usage_out['completion_tokens'] = get('completion_tokens') or 0
+
+class LLMBackend(abc.ABC):
+    """
+    Interface every backend implements. Methods are thread-safe; `stream()`
+    raises provider errors BEFORE returning, so the scheduler can retry it.
+    """
+    name = "base"
+
+    def __init__(self, model):
+        self.model = model
+
+    @abc.abstractmethod
+    def complete(self, messages, max_tokens, temperature=0.1):
+        """Returns an LLMResult"""
+
+    @abc.abstractmethod
+    def stream(self, messages, max_tokens, temperature=0.1, usage=None):
+        """
+        Open a streaming completion.
+
+        Returns:
+            Iterator of text deltas; `usage` (optional dict) receives
+            prompt_tokens / completion_tokens once the stream ends
+        """
+
+    def close(self):
+        pass
+
+class GroqBackend(LLMBackend):
+    """Groq SDK sharing one pooled keep-alive connection pool across threads"""
+    name = "groq"
+
+    def __init__(self, model, api_key, base_url=None, pool_size=DEFAULT_POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT):
+        super().__init__(model)
+        from groq import Groq
+
+        self._http = _pooled_http_client(pool_size, timeout)
+        # The SDK retries on its own; the LLM scheduler owns retries instead
+        self.client = Groq(api_key=api_key, base_url=base_url, http_client=self._http,
+                           max_retries=0)
+
+    def complete(self, messages, max_tokens, temperature=0.1):
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        usage = {}
+        _record_usage(usage, completion.usage)
+        return LLMResult(completion.choices[0].message.content or "", **usage)
+
+    def stream(self, messages, max_tokens, temperature=0.1, usage=None):
+        chunks = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        return self._deltas(chunks, usage)
+
+    @staticmethod
+    def _deltas(chunks, usage):
+        try:
+            for chunk in chunks:
+                x_groq = getattr(chunk, 'x_groq', None)
+                if x_groq is not None and getattr(x_groq, 'usage', None):
+                    _record_usage(usage, x_groq.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def close(self):
+        self._http.close()
+
+class HTTPBackend(LLMBackend):
+    """Plain OpenAI-compatible /chat/completions over a pooled httpx client"""
+    name = "http"
+
+    def __init__(self, model, base_url, api_key=None, pool_size=DEFAULT_POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT):
+        super().__init__(model)
+        headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+        self.client = _pooled_http_client(
+            pool_size, timeout, base_url=base_url.rstrip('/'), headers=headers
+        )
+
+    def _payload(self, messages, max_tokens, temperature, stream):
+        return {
+            'model': self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': stream,
+        }
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code < 400:
+            return
+        try:
+            message = response.json().get('error', {}).get('message', response.text)
+        except ValueError:
+            message = response.text
+        try:
+            retry_after = float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+        raise LLMBackendError(f"HTTP {response.status_code}: {message}",
+                              status_code=response.status_code, retry_after=retry_after)
+
+    def complete(self, messages, max_tokens, temperature=0.1):
+        try:
+            response = self.client.post(
+                '/chat/completions', json=self._payload(messages, max_tokens, temperature, False)
+            )
+        except httpx.TransportError as e:
+            raise LLMConnectionError(f"{type(e).__name__}: {e}") from e
+        self._raise_for_status(response)
+
+        body = response.json()
+        usage = {}
+        _record_usage(usage, body.get('usage'))
+        return LLMResult(body['choices'][0]['message'].get('content') or "", **usage)
+
+    def stream(self, messages, max_tokens, temperature=0.1, usage=None):
+        request = self.client.build_request(
+            'POST', '/chat/completions', json=self._payload(messages, max_tokens, temperature, True)
+        )
+        try:
+            response = self.client.send(request, stream=True)
+        except httpx.TransportError as e:
+            raise LLMConnectionError(f"{type(e).__name__}: {e}") from e
+        if response.status_code >= 400:
+            response.read()
+            response.close()
+            self._raise_for_status(response)
+        return self._deltas(response, usage)
+
+    @staticmethod
+    def _deltas(response, usage):
+        """Parse `data: {...}` server-sent events until `data: [DONE]`"""
+        try:
+            for line in response.iter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                chunk = json.loads(data)
+                _record_usage(usage, chunk.get('usage') or chunk.get('x_groq', {}).get('usage'))
+                for choice in chunk.get('choices', []):
+                    delta = choice.get('delta', {}).get('content')
+                    if delta:
+                        yield delta
+        except httpx.TransportError as e:
+            raise LLMConnectionError(f"{type(e).__name__}: {e}") from e
+        finally:
+            response.close()
+
+    def close(self):
+        self.client.close()
+
+def create_backend(model):
+    """
+    Backend from the environment:
+        LLM_BACKEND   groq (default) or http (default when LLM_BASE_URL is set)
+        LLM_BASE_URL  e.g. http://127.0.0.1:8100/v1 for the local stand-in
+        LLM_API_KEY   falls back to GROQ_API_KEY
+        LLM_POOL_SIZE keep-alive connections (default: 32)
+
+    Raises:
+        ValueError: Missing API key for Groq or unknown backend name
+    """
+    base_url = os.getenv("LLM_BASE_URL")
+    backend = os.getenv("LLM_BACKEND", "http" if base_url else "groq").lower()
+    api_key = os.getenv("LLM_API_KEY") or os.getenv("GROQ_API_KEY")
+    pool_size = int(os.getenv("LLM_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
+    timeout = float(os.getenv("LLM_TIMEOUT", str(DEFAULT_TIMEOUT)))
+
+    if backend == "groq":
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found")
+        return GroqBackend(model, api_key, base_url=base_url or os.getenv("GROQ_BASE_URL"),
+                           pool_size=pool_size, timeout=timeout)
+    if backend == "http":
+        if not base_url:
+            raise ValueError("LLM_BASE_URL is required for LLM_BACKEND=http")
+        return HTTPBackend(model, base_url, api_key=api_key, pool_size=pool_size, timeout=timeout)
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}' (use groq or http)")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+RATE-LIMIT-AWARE LLM REQUEST SCHEDULER
+Sits in front of every LLM backend call:
+- Request + token buckets (tokens estimated from prompt length + max_tokens,
+  the unused part refunded once the provider reports real usage)
+- Priority classes: interactive queries jump ahead of batch work
+- Jittered exponential backoff on 429 / 5xx / connection errors,
+  honouring Retry-After
+- Reports queue wait separately from generation time
+"""
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+RETRYABLE_ERROR_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'ConnectionError', 'TimeoutError', 'LLMConnectionError'
+}
+
+class TokenBucket:
+    """Classic token bucket; capacity is one minute of budget"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 if it is now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        """Provider said we're over the limit - assume the bucket is empty"""
+        self.tokens = min(self.tokens, 0.0)
+
+def estimate_tokens(messages, max_tokens, counter=None):
+    """Prompt tokens (tokenizer if available, else ~4 chars/token) + completion budget"""
+    text = "\n".join(m.get('content', '') for m in messages)
+    prompt_tokens = counter.count(text) if counter is not None else len(text) // 4
+    return prompt_tokens + max_tokens
+
+def error_status(error):
+    """HTTP status of a provider error, if any"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+def retry_after_seconds(error):
+    if getattr(error, 'retry_after', None) is not None:
+        return float(error.retry_after)
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def token_limit_hit(error):
+    """
+    Whether a 429 is about tokens per minute rather than requests per minute
+    (x-ratelimit-remaining-tokens header, or the provider's message)
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    if str(headers.get('x-ratelimit-remaining-tokens', '')).strip() == '0':
+        return True
+    message = str(error).lower()
+    return 'tokens per minute' in message or '(tpm)' in message
+
+def is_retryable(error):
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or 500 <= status < 600
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+class LLMScheduler:
+    """
+    Thread-safe admission control for LLM calls. Callers block in `run()`
+    until both buckets allow the request and no higher-priority (or older)
+    request is waiting.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, max_retries=4,
+                 base_backoff=1.0, max_backoff=30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._stats = {
+            name: {'requests': 0, 'retries': 0, 'failures': 0,
+                   'queue_wait_seconds': 0.0, 'generation_seconds': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    @classmethod
+    def from_env(cls, workers=1):
+        """
+        Limits from LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE (Groq free tier defaults).
+        Provider limits are per account, so `workers` processes each get an equal share.
+        """
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30")) / workers,
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "6000")) / workers,
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+        )
+
+    def acquire(self, cost, priority=INTERACTIVE):
+        """Block until the request may be sent. Returns seconds spent waiting."""
+        start = time.monotonic()
+        entry = (priority, next(self._sequence))
+
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    if self._waiters[0] == entry:
+                        now = time.monotonic()
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(cost)
+                            break
+                        self._condition.wait(timeout=wait)
+                    else:
+                        self._condition.wait()
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+        return time.monotonic() - start
+
+    def refund(self, cost, used):
+        """
+        Give back the part of a charged estimate the call did not use.
+
+        Args:
+            cost: Tokens charged by acquire() (see estimate_tokens)
+            used: Prompt + completion tokens reported by the provider
+        """
+        unused = min(cost, self.tokens.capacity) - used
+        if used <= 0 or unused <= 0:
+            return
+        with self._condition:
+            self.tokens.refund(unused)
+            self._condition.notify_all()
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            delay = max(delay, hinted)
+        return delay
+
+    def run(self, call, cost, priority=INTERACTIVE, timings=None):
+        """
+        Execute `call()` under the rate limits with retries.
+
+        The token estimate is charged once per logical call (see refund());
+        retries only wait for another request slot.
+
+        Args:
+            call: Zero-argument function performing the provider request
+            cost: Estimated tokens (see estimate_tokens)
+            priority: INTERACTIVE or BATCH
+            timings: Optional dict filled with queue_wait_ms, generation_ms, retries
+        """
+        stats = self._stats[PRIORITY_NAMES.get(priority, 'batch')]
+        queue_wait = 0.0
+        generation = 0.0
+        attempt = 0
+        failed = False
+
+        try:
+            while True:
+                queue_wait += self.acquire(cost if attempt == 0 else 0, priority)
+                started = time.monotonic()
+                try:
+                    result = call()
+                except Exception as e:
+                    generation += time.monotonic() - started
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        failed = True
+                        raise
+                    if error_status(e) == 429:
+                        # Stall everyone on the limit the provider says we hit
+                        with self._condition:
+                            if token_limit_hit(e):
+                                self.tokens.drain()
+                            else:
+                                self.requests.drain()
+                    # Backoff counts as waiting, not generating
+                    delay = self._backoff(attempt, e)
+                    attempt += 1
+                    time.sleep(delay)
+                    queue_wait += delay
+                    continue
+                generation += time.monotonic() - started
+                return result
+        finally:
+            with self._condition:
+                stats['requests'] += 1
+                stats['retries'] += attempt
+                stats['failures'] += int(failed)
+                stats['queue_wait_seconds'] += queue_wait
+                stats['generation_seconds'] += generation
+            if timings is not None:
+                timings['queue_wait_ms'] = round(queue_wait * 1000, 2)
+                timings['generation_ms'] = round(generation * 1000, 2)
+                timings['retries'] = attempt
+
+    def stats(self):
+        with self._condition:
+            waiting = len(self._waiters)
+            snapshot = {name: dict(values) for name, values in self._stats.items()}
+        snapshot['waiting'] = waiting
+        return snapshot
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+LOCAL OPENAI/GROQ-COMPATIBLE LLM STAND-IN
+Lets the whole pipeline run offline with realistic provider behaviour:
+- POST /openai/v1/chat/completions (Groq SDK path) and /v1/chat/completions
+- Streaming (SSE) and non-streaming responses with usage counts
+- Configurable time-to-first-token, jitter and tokens/sec
+- Error injection: random 500s, random 429s and a requests-per-minute limit,
+  both 429 flavours carrying Retry-After
+- Answers are deterministic and cite the first clause in the prompt
+
+Point the pipeline at it with:
+    LLM_BASE_URL=http://127.0.0.1:8100/v1            (HTTP backend)
+    LLM_BACKEND=groq GROQ_BASE_URL=http://127.0.0.1:8100  (Groq SDK)
+"""
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import deque
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.async_http import (
+    HTTPError, read_request, encode_json, write_response,
+    start_chunked, write_chunk, end_chunked
+)
+
+COMPLETION_PATHS = ('/openai/v1/chat/completions', '/v1/chat/completions', '/chat/completions')
+MODEL_PATHS = ('/openai/v1/models', '/v1/models', '/models')
+
+CLAUSE_REF = re.compile(r'\[CLAUSE\s+([^\]:]+):\s*([^\]]*)\]')
+FILLER = ("The provided clauses set out the obligations of the parties, the applicable "
+          "rates and the conditions under which they apply.").split()
+
+def build_answer(messages, num_tokens):
+    """Deterministic answer of `num_tokens` words citing the first clause"""
+    prompt = "\n".join(m.get('content', '') for m in messages)
+    if prompt.strip() == "Say OK":
+        return ["OK"]
+    match = CLAUSE_REF.search(prompt)
+    if match:
+        opening = f"According to Clause {match.group(1).strip()} ({match.group(2).strip()}),".split()
+    else:
+        opening = "Based on the provided clauses,".split()
+    words = opening + list(itertools.islice(itertools.cycle(FILLER), max(0, num_tokens - len(opening))))
+    return words[:max(1, num_tokens)]
+
+class StandinLLM:
+    """Simulated provider: latency model, error injection and counters"""
+
+    def __init__(self, latency_ms, latency_jitter_ms, tokens_per_sec, completion_tokens,
+                 error_rate, rate_limit_rate, rpm, retry_after, seed):
+        self.latency = latency_ms / 1000.0
+        self.jitter = latency_jitter_ms / 1000.0
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.recent = deque()
+        self.in_flight = 0
+        self.counters = {
+            'requests': 0, 'completed': 0, 'streamed': 0,
+            'injected_500': 0, 'injected_429': 0, 'rpm_429': 0,
+            'max_in_flight': 0,
+        }
+
+    def _rejection(self):
+        """(status, message, retry_after) a real provider would return, or None"""
+        now = time.monotonic()
+        if self.rpm:
+            while self.recent and now - self.recent[0] >= 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.rpm:
+                self.counters['rpm_429'] += 1
+                return 429, f"Rate limit reached: {self.rpm} requests per minute", 60 - (now - self.recent[0])
+            self.recent.append(now)
+
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.counters['injected_429'] += 1
+            return 429, "Rate limit reached (injected)", self.retry_after
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counters['injected_500'] += 1
+            return 500, "Internal server error (injected)", None
+        return None
+
+    def _first_token_delay(self):
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    async def handle_completion(self, body, writer, keep_alive):
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(request, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        messages = request.get('messages')
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list")
+
+        self.counters['requests'] += 1
+        rejection = self._rejection()
+        if rejection is not None:
+            status, message, retry_after = rejection
+            headers = {'Retry-After': f"{retry_after:.2f}"} if retry_after is not None else None
+            await write_response(writer, status, {
+                'error': {'message': message,
+                          'type': 'rate_limit_exceeded' if status == 429 else 'server_error'}
+            }, keep_alive, extra_headers=headers)
+            return
+
+        max_tokens = int(request.get('max_tokens') or self.completion_tokens)
+        words = build_answer(messages, min(max_tokens, self.completion_tokens))
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(words),
+            'total_tokens': prompt_tokens + len(words),
+        }
+        completion_id = f"chatcmpl-standin-{next(self.ids)}"
+        model = request.get('model', 'standin')
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+        self.in_flight += 1
+        self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.in_flight)
+        try:
+            await asyncio.sleep(self._first_token_delay())
+            if request.get('stream'):
+                self.counters['streamed'] += 1
+                await self._stream(writer, keep_alive, completion_id, model, words, usage, per_token)
+            else:
+                await asyncio.sleep(per_token * len(words))
+                await write_response(writer, 200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': " ".join(words)},
+                        'finish_reason': 'stop',
+                    }],
+                    'usage': usage,
+                }, keep_alive)
+            self.counters['completed'] += 1
+        finally:
+            self.in_flight -= 1
+
+    async def _stream(self, writer, keep_alive, completion_id, model, words, usage, per_token):
+        start_chunked(writer, keep_alive=keep_alive)
+
+        async def send(choice, extra=None):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [dict(index=0, **choice)],
+            }
+            chunk.update(extra or {})
+            await write_chunk(writer, b"data: " + encode_json(chunk) + b"\n\n")
+
+        for i, word in enumerate(words):
+            await send({'delta': {'content': word if i == 0 else " " + word}, 'finish_reason': None})
+            if per_token:
+                await asyncio.sleep(per_token)
+        # Groq reports usage on the final chunk under x_groq
+        await send({'delta': {}, 'finish_reason': 'stop'}, {'x_groq': {'usage': usage}})
+        await write_chunk(writer, b"data: [DONE]\n\n")
+        await end_chunked(writer)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_response(writer, e.status, {'error': {'message': e.message}},
+                                         keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, _, body, keep_alive = request
+                try:
+                    if path in COMPLETION_PATHS:
+                        if method != 'POST':
+                            raise HTTPError(405, "Use POST")
+                        await self.handle_completion(body, writer, keep_alive)
+                    elif path in MODEL_PATHS:
+                        await write_response(writer, 200, {
+                            'object': 'list', 'data': [{'id': 'standin', 'object': 'model'}]
+                        }, keep_alive)
+                    elif path == '/stats':
+                        await write_response(writer, 200, dict(self.counters, in_flight=self.in_flight),
+                                             keep_alive)
+                    else:
+                        raise HTTPError(404, f"Unknown path {path}")
+                except HTTPError as e:
+                    await write_response(writer, e.status, {'error': {'message': e.message}}, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(standin, host, port):
+    server = await asyncio.start_server(standin.handle_connection, host, port)
+    print(f"🧪 LLM stand-in on http://{host}:{port}  (LLM_BASE_URL=http://{host}:{port}/v1)")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Groq/OpenAI-compatible LLM stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300.0,
+                        help="Time to first token (default: 300 ms)")
+    parser.add_argument("--latency-jitter-ms", type=float, default=100.0,
+                        help="Uniform +/- jitter on time to first token (default: 100 ms)")
+    parser.add_argument("--tokens-per-sec", type=float, default=500.0,
+                        help="Generation speed, 0 = instant (default: 500)")
+    parser.add_argument("--completion-tokens", type=int, default=120,
+                        help="Answer length in tokens, capped by max_tokens (default: 120)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests failing with HTTP 500 (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Fraction of requests failing with HTTP 429 (default: 0)")
+    parser.add_argument("--rpm", type=int, default=0,
+                        help="Requests per minute before returning 429, 0 = unlimited (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After seconds sent with injected 429s (default: 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    standin = StandinLLM(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm=args.rpm,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(serve(standin, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Stand-in stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+LIGHTWEIGHT QUERY ROUTER
+Picks the metadata subset a query most likely needs:
+- Definition questions  → is_definition chunks
+- Table/numeric questions → has_table chunks
+- "in the O&M agreement" → chunks of that filename
+The subset is searched first (filtered Chroma + a small BM25 index), so a
+routed query scores far fewer chunks. When its best hit is weak (below
+ROUTE_MIN_SCORE) the query falls back to the whole collection, so routing
+never hides a better clause outside the subset behind a poor match.
+"""
+import os
+import re
+import threading
+
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
+from llama_index.retrievers.bm25 import BM25Retriever
+from llama_index.core.schema import TextNode
+
+DEFINITION_PATTERNS = [
+    re.compile(r'\bwhat\s+does\s+.+?\s+mean\b', re.IGNORECASE),
+    re.compile(r'\bwhat\s+is\s+meant\s+by\b', re.IGNORECASE),
+    re.compile(r'\b(?:define|definition\s+of|meaning\s+of|defined\s+as)\b', re.IGNORECASE),
+]
+
+# Only questions asking for a tabulated figure: units, percentages, tariffs.
+# Words like cost, amount, cap or "how long" appear in prose clauses as often
+# as in tables (payment terms, liability caps, notice periods).
+TABLE_PATTERNS = [
+    re.compile(r'\b(?:mw|kw|kwh|mwh|mwp|kwp)\b', re.IGNORECASE),
+    re.compile(r'%|\bper\s*cent\b|\bpercentage\b', re.IGNORECASE),
+    re.compile(r'\b(?:tariffs?|table)\b', re.IGNORECASE),
+    re.compile(r'\b(?:price|rate)s?\s+(?:per|for)\b', re.IGNORECASE),
+]
+
+# Fused score the best subset hit needs to skip the full search. With the
+# default 60/40 weighting the top BM25 hit already scores 0.4, so this asks
+# for a cosine similarity of about 0.5 on top of it.
+ROUTE_MIN_SCORE = float(os.getenv("ROUTE_MIN_SCORE", "0.7"))
+
+# Filename tokens that never identify a specific agreement
+FILENAME_NOISE = re.compile(r'^(?:final|draft|signed|clean|v\d+)$', re.IGNORECASE)
+
+def _normalize(text):
+    """Lower-case, drop '&' (O&M → om) and collapse punctuation"""
+    text = text.lower().replace('&', '')
+    text = re.sub(r'v\d+\b', ' ', text)
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+def agreement_aliases(filename):
+    """
+    Phrases that refer to one document.
+    "EN OSC V2 - OM Agreement Final.pdf" → ["om agreement"]
+    "OSCFINANCE TERM SHEETv10.pdf" → ["oscfinance term sheet", "term sheet"]
+    """
+    stem = os.path.splitext(filename)[0]
+    label = stem.split(' - ')[-1]
+    words = [w for w in _normalize(label).split() if not FILENAME_NOISE.match(w)]
+    if not words:
+        return []
+
+    aliases = [' '.join(words)]
+    if len(words) > 2 and words[-1] in ('agreement', 'sheet', 'contract'):
+        aliases.append(' '.join(words[-2:]))
+    return aliases
+
+def detect_filename(query, filenames):
+    """Return the single filename the query names, or None if none/ambiguous"""
+    padded_query = f" {_normalize(query)} "
+    best_len = 0
+    matches = set()
+
+    for filename in filenames:
+        for alias in agreement_aliases(filename):
+            if f" {alias} " not in padded_query:
+                continue
+            if len(alias) > best_len:
+                best_len = len(alias)
+                matches = {filename}
+            elif len(alias) == best_len:
+                matches.add(filename)
+
+    return matches.pop() if len(matches) == 1 else None
+
+def route_query(query, filenames=()):
+    """
+    Decide which metadata subset a query should search.
+
+    Returns:
+        Dict of metadata filters, e.g. {'is_definition': True, 'filename': '...'};
+        empty dict means search the whole collection
+    """
+    route = {}
+
+    if any(p.search(query) for p in DEFINITION_PATTERNS):
+        route['is_definition'] = True
+    elif any(p.search(query) for p in TABLE_PATTERNS):
+        route['has_table'] = True
+
+    filename = detect_filename(query, filenames)
+    if filename:
+        route['filename'] = filename
+
+    return route
+
+def matches_route(metadata, route):
+    """Whether a chunk's metadata lies in the route's subset"""
+    return all((metadata or {}).get(key) == value for key, value in route.items())
+
+def describe_route(route):
+    """Short human-readable summary for status lines"""
+    parts = []
+    if route.get('is_definition'):
+        parts.append("definitions")
+    if route.get('has_table'):
+        parts.append("tables")
+    if route.get('filename'):
+        parts.append(route['filename'])
+    return " + ".join(parts) if parts else "all clauses"
+
+class RoutedRetrievers:
+    """
+    Builds (and caches) vector + BM25 retrievers restricted to a route's subset.
+    The vector side pushes filters down to Chroma; the BM25 side gets its own
+    small index over the matching nodes.
+    """
+
+    def __init__(self, index, embed_model, ids, doc_texts, metadatas, similarity_top_k=10):
+        self.index = index
+        self.embed_model = embed_model
+        self.similarity_top_k = similarity_top_k
+        self.records = list(zip(ids, doc_texts, [m or {} for m in metadatas]))
+        self.filenames = sorted({m.get('filename') for _, _, m in self.records if m.get('filename')})
+        self._cache = {}
+        # Subset top-k per cached route (to rebuild the vector side in rebind)
+        self._top_k = {}
+        self._lock = threading.Lock()
+
+    def route(self, query):
+        return route_query(query, self.filenames)
+
+    @staticmethod
+    def _key(route):
+        return tuple(sorted(route.items()))
+
+    def is_cached(self, route):
+        return self._key(route) in self._cache
+
+    def get(self, route):
+        """Return (vector_retriever, bm25_retriever) for the subset, or None if empty"""
+        key = self._key(route)
+        if key in self._cache:
+            return self._cache[key]
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self._build(route)
+            return self._cache[key]
+
+    def possible_routes(self):
+        """Every non-empty route route_query() can return for this collection"""
+        for kind in ({'is_definition': True}, {'has_table': True}, {}):
+            if kind:
+                yield dict(kind)
+            for filename in self.filenames:
+                yield {**kind, 'filename': filename}
+
+    def prewarm(self):
+        """
+        Build the retrievers of every route now, e.g. before forking server
+        workers so they share the subset BM25 indexes instead of each
+        building its own.
+
+        Returns:
+            Number of non-empty routes
+        """
+        for route in self.possible_routes():
+            self.get(route)
+        return sum(1 for retrievers in self._cache.values() if retrievers is not None)
+
+    def rebind(self, index):
+        """Point every vector retriever at another index (a worker's own Chroma client); BM25 subsets are kept"""
+        with self._lock:
+            self.index = index
+            for key, retrievers in self._cache.items():
+                if retrievers is not None:
+                    route = dict(key)
+                    self._cache[key] = (self._vector_retriever(route, self._top_k[key]), retrievers[1])
+
+    def _vector_retriever(self, route, top_k):
+        filters = MetadataFilters(filters=[
+            MetadataFilter(key=name, value=value) for name, value in route.items()
+        ])
+        return VectorIndexRetriever(
+            index=self.index,
+            similarity_top_k=top_k,
+            embed_model=self.embed_model,
+            filters=filters
+        )
+
+    def _build(self, route):
+        subset = [
+            TextNode(id_=node_id, text=text, metadata=meta)
+            for node_id, text, meta in self.records
+            if matches_route(meta, route)
+        ]
+
+        if not subset:
+            return None
+
+        top_k = min(self.similarity_top_k, len(subset))
+        self._top_k[self._key(route)] = top_k
+
+        vector_retriever = self._vector_retriever(route, top_k)
+        bm25_retriever = BM25Retriever.from_defaults(
+            nodes=subset,
+            similarity_top_k=top_k
+        )
+
+        return vector_retriever, bm25_retriever
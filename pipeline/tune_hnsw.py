@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+HNSW PARAMETER AUTO-TUNER FOR THE LIVE solar_ppa_collection VERSION
+- Rebuilds candidate collections from the SAME stored embeddings (no re-embedding)
+- Grid over hnsw:M, hnsw:construction_ef and hnsw:search_ef
+- Measures build time, query p50/p99 and recall@k against exact cosine search
+- Writes the winning configuration to hnsw_config.json (applied by
+  index_02 --rebuild)
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+from datetime import datetime
+
+import numpy as np
+import chromadb
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.storage_utils import CHROMA_DB_PATH, HNSW_CONFIG_PATH
+from utils.index_versions import active_collection_name
+from utils.tracing import percentile
+
+ADD_BATCH_SIZE = 1000
+
+def parse_int_list(value):
+    """Parse a comma separated list of integers ("8,16,32")"""
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def load_stored_vectors(collection):
+    """Fetch ids and embeddings already stored in the live collection"""
+    data = collection.get(include=["embeddings"])
+    ids = list(data["ids"])
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    return ids, embeddings
+
+def exact_top_k(embeddings, queries, k):
+    """Brute-force cosine top-k (ground truth for recall)"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.maximum(norms, 1e-12)
+    q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    q_normalized = queries / np.maximum(q_norms, 1e-12)
+
+    scores = q_normalized @ normalized.T
+    k = min(k, embeddings.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+def build_candidate(client, name, ids, embeddings, m, construction_ef, search_ef):
+    """Create an in-memory collection with the given HNSW params, return build seconds"""
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+
+    collection = client.create_collection(
+        name=name,
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        }
+    )
+
+    start = time.perf_counter()
+    for i in range(0, len(ids), ADD_BATCH_SIZE):
+        collection.add(
+            ids=ids[i:i + ADD_BATCH_SIZE],
+            embeddings=embeddings[i:i + ADD_BATCH_SIZE].tolist()
+        )
+    return collection, time.perf_counter() - start
+
+def measure_queries(collection, queries, ids, exact, k):
+    """Run every query individually, return sorted latencies (ms) and mean recall@k"""
+    id_to_row = {node_id: row for row, node_id in enumerate(ids)}
+    latencies = []
+    recalls = []
+
+    for query, truth in zip(queries, exact):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        found = {id_to_row[node_id] for node_id in result["ids"][0]}
+        recalls.append(len(found & truth) / max(len(truth), 1))
+
+    return sorted(latencies), sum(recalls) / max(len(recalls), 1)
+
+def embed_questions(path):
+    """Embed real questions (one per line) with BGE-M3 for representative queries"""
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    with open(path, 'r', encoding='utf-8') as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    print(f"🔄 Embedding {len(questions)} questions with BGE-M3...")
+    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+    return np.asarray(
+        [embed_model.get_query_embedding(q) for q in questions],
+        dtype=np.float32
+    )
+
+def choose_best(results, min_recall):
+    """Lowest p99 among configs meeting the recall target, else highest recall"""
+    eligible = [r for r in results if r["recall"] >= min_recall]
+    if eligible:
+        return min(eligible, key=lambda r: (r["p99_ms"], r["p50_ms"], r["build_seconds"]))
+    return max(results, key=lambda r: (r["recall"], -r["p99_ms"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters for solar_ppa_collection")
+    parser.add_argument("--m", type=parse_int_list, default=[8, 16, 32],
+                        help="Candidate hnsw:M values (default: 8,16,32)")
+    parser.add_argument("--construction-ef", type=parse_int_list, default=[100, 200],
+                        help="Candidate hnsw:construction_ef values (default: 100,200)")
+    parser.add_argument("--search-ef", type=parse_int_list, default=[16, 64, 128],
+                        help="Candidate hnsw:search_ef values (default: 16,64,128)")
+    parser.add_argument("--top-k", type=int, default=10,
+                        help="k used for recall (matches the retriever's similarity_top_k)")
+    parser.add_argument("--num-queries", type=int, default=200,
+                        help="Stored vectors sampled as queries when --questions is not given")
+    parser.add_argument("--questions", help="Text file with one real question per line")
+    parser.add_argument("--min-recall", type=float, default=0.99,
+                        help="Recall@k a configuration must reach to be eligible")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print the results without writing hnsw_config.json")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    print("=" * 80)
+    print("⚙️  HNSW AUTO-TUNER")
+    print("=" * 80)
+    print(f"📁 ChromaDB: {CHROMA_DB_PATH}")
+
+    db = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    try:
+        live_collection = db.get_collection(active_collection_name())
+    except Exception as e:
+        print(f"❌ Collection not found: {e}")
+        return
+
+    ids, embeddings = load_stored_vectors(live_collection)
+    if len(ids) == 0:
+        print("⚠️  Collection is empty - run index_02.py first")
+        return
+    print(f"✅ Loaded {len(ids)} stored vectors ({embeddings.shape[1]}-dim)")
+
+    if args.questions:
+        queries = embed_questions(args.questions)
+    else:
+        rng = random.Random(args.seed)
+        sample = rng.sample(range(len(ids)), min(args.num_queries, len(ids)))
+        queries = embeddings[sample]
+    print(f"🔍 {len(queries)} queries, recall@{args.top_k} vs exact search")
+
+    exact = exact_top_k(embeddings, queries, args.top_k)
+    k = min(args.top_k, len(ids))
+
+    client = chromadb.EphemeralClient()
+    grid = list(itertools.product(args.m, args.construction_ef, args.search_ef))
+    results = []
+
+    print(f"\n🧪 Evaluating {len(grid)} configurations")
+    print(f"   {'M':>4} {'c_ef':>6} {'s_ef':>6} {'build s':>9} {'p50 ms':>8} {'p99 ms':>8} {'recall':>8}")
+
+    for m, construction_ef, search_ef in grid:
+        collection, build_seconds = build_candidate(
+            client, "hnsw_tuning_candidate", ids, embeddings, m, construction_ef, search_ef
+        )
+        latencies, recall = measure_queries(collection, queries, ids, exact, k)
+
+        result = {
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+            "build_seconds": round(build_seconds, 4),
+            "p50_ms": round(percentile(latencies, 50), 4),
+            "p99_ms": round(percentile(latencies, 99), 4),
+            "recall": round(recall, 4),
+        }
+        results.append(result)
+        print(f"   {m:>4} {construction_ef:>6} {search_ef:>6} {build_seconds:>9.3f} "
+              f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {recall:>8.4f}")
+
+    client.delete_collection("hnsw_tuning_candidate")
+
+    best = choose_best(results, args.min_recall)
+    if best["recall"] < args.min_recall:
+        print(f"\n⚠️  No configuration reached recall {args.min_recall} - using highest recall")
+
+    collection_metadata = {
+        key: best[key] for key in ("hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+    }
+    print(f"\n🏆 Best: {collection_metadata}")
+    print(f"   p50 {best['p50_ms']:.3f} ms | p99 {best['p99_ms']:.3f} ms | recall {best['recall']:.4f}")
+
+    if args.dry_run:
+        print("\n⏭️  Dry run - config not written")
+        return
+
+    config = {
+        "collection_metadata": collection_metadata,
+        "tuned_at": datetime.now().isoformat(),
+        "num_vectors": len(ids),
+        "num_queries": len(queries),
+        "top_k": args.top_k,
+        "min_recall": args.min_recall,
+        "best": best,
+        "measurements": results,
+    }
+    with open(HNSW_CONFIG_PATH, "w", encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    print(f"\n💾 Wrote {HNSW_CONFIG_PATH}")
+    print("   Apply it with: python pipeline/index_02.py --rebuild")
+
+if __name__ == "__main__":
+    main()
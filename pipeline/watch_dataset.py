@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+CONTINUOUS INCREMENTAL INGESTION
+- Watches Dataset/ for new, changed and deleted PDFs (inotify, polling
+  fallback) and debounces bursts of writes (utils/fs_watch.py)
+- Docling, BGE-M3 and the Chroma collection are loaded ONCE and stay warm
+- Only the affected documents are converted, chunked and embedded; the
+  BM25 cache is rebuilt once per batch of changes
+- A replaced PDF's old vectors, facts and tracker row are dropped after the
+  new version is indexed; a deleted PDF's are dropped immediately
+- Content is indexed once per hash: a renamed PDF or the surviving copy of
+  a deleted duplicate takes over the indexed content instead of losing it
+- Each batch is published as a new generation of the live collection
+  (utils/index_versions.py), which running chat processes reload on
+- Publish latency = first file event → vectors + BM25 written and the
+  generation published, reported per document and as session percentiles.
+  End-to-end freshness stops when a chat process serves the generation and
+  is recorded there (legal_rag_index_freshness_seconds)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from docling.document_converter import DocumentConverter
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pipeline.ingest_01 import PARSING_PARAMETERS, convert_pdf
+from pipeline.index_02 import (
+    load_embed_model, open_collection, index_queued_document, chroma_write_lock
+)
+from pipeline.chat_03 import refresh_bm25_cache, _quiet
+from utils.storage_utils import (
+    DATA_DIR, ensure_environment, calculate_file_hash, is_file_processed,
+    get_hashes_for_file, unregister_from_db, get_tracker, get_cached_path, get_archived_path,
+    get_file_record, rename_in_db
+)
+from utils.facts_store import replace_facts_for_file, rename_facts_for_file
+from utils.index_versions import active_collection_name, publish_generation, INDEX_RELOAD_SECONDS
+from utils.fs_watch import DirectoryWatcher, Change, ADDED, DELETED
+from utils.metrics import counter, histogram, write_job_metrics
+from utils.profiling import Profiler, add_profile_argument
+
+FRESHNESS_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+
+CHANGES_APPLIED = counter(
+    "legal_rag_watch_changes_total", "Dataset changes handled by the watcher", ["kind", "status"]
+)
+PUBLISH_SECONDS = histogram(
+    "legal_rag_watch_publish_seconds", "First file event to the change being published to chat",
+    ["kind"], buckets=FRESHNESS_BUCKETS
+)
+WATCH_STAGE_SECONDS = histogram(
+    "legal_rag_watch_stage_seconds", "Watcher time per stage", ["stage"]
+)
+
+class IncrementalIndexer:
+    """Warm conversion + indexing pipeline applying one change at a time"""
+
+    def __init__(self, converter, embed_model, chroma_collection, cache_format, profiler):
+        self.converter = converter
+        self.embed_model = embed_model
+        self.chroma_collection = chroma_collection
+        self.cache_format = cache_format
+        self.profiler = profiler
+
+    def _drop(self, file_hash):
+        """Vectors, tracker row and pending/archived cache of one file version"""
+        self.chroma_collection.delete(where={'file_hash': file_hash})
+        unregister_from_db(file_hash)
+        for cache_path in (get_cached_path(file_hash), get_archived_path(file_hash)):
+            if cache_path:
+                os.remove(cache_path)
+
+    def _relabel(self, file_hash, name):
+        """Point the chunks of already indexed content at another file name"""
+        records = self.chroma_collection.get(where={'file_hash': file_hash}, include=['metadatas'])
+        if not records['ids']:
+            return
+        labels = {'filename': name, 'source': os.path.join(DATA_DIR, name)}
+        metadatas = []
+        for metadata in records['metadatas']:
+            metadata = {**metadata, **{k: v for k, v in labels.items() if k in metadata}}
+            # llama-index rebuilds retrieved nodes from this serialized copy
+            if metadata.get('_node_content'):
+                node = json.loads(metadata['_node_content'])
+                node_metadata = node.get('metadata', {})
+                node_metadata.update({k: v for k, v in labels.items() if k in node_metadata})
+                metadata['_node_content'] = json.dumps(node)
+            metadatas.append(metadata)
+        self.chroma_collection.update(ids=records['ids'], metadatas=metadatas)
+
+    def _move(self, file_hash, old_name, new_name, move_facts=True):
+        """Track indexed content under another PDF name instead of re-indexing it"""
+        print(f"   🔀 {old_name} → {new_name}: same content, already indexed")
+        rename_in_db(file_hash, new_name)
+        if move_facts:
+            rename_facts_for_file(old_name, new_name, self.chroma_collection.name)
+        self._relabel(file_hash, new_name)
+
+    def _present_copy(self, file_hash, exclude):
+        """Another PDF in Dataset/ with this content, if any (only same-size files are hashed)"""
+        record = get_file_record(file_hash)
+        size = record['file_size'] if record else None
+        for name in sorted(os.listdir(DATA_DIR)):
+            if name == exclude or not name.lower().endswith('.pdf'):
+                continue
+            path = os.path.join(DATA_DIR, name)
+            try:
+                if size is not None and os.path.getsize(path) != size:
+                    continue
+                if calculate_file_hash(path) == file_hash:
+                    return name
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _retire(self, file_hash, name, move_facts=True):
+        """Drop a version `name` no longer has, unless another present PDF has the same content"""
+        survivor = self._present_copy(file_hash, exclude=name)
+        if survivor is None:
+            self._drop(file_hash)
+        else:
+            self._move(file_hash, name, survivor, move_facts=move_facts)
+
+    def follow_promotion(self):
+        """Write to the live version after index_02 --rebuild promoted a new one"""
+        collection_name = active_collection_name()
+        if collection_name != self.chroma_collection.name:
+            print(f"\n🔀 Live index is now {collection_name}")
+            self.chroma_collection = open_collection(collection_name)
+
+    def upsert(self, name):
+        """
+        Index a new or rewritten PDF.
+
+        Returns:
+            Stage timings (seconds), or None if the content was already indexed
+            under this name or under another PDF that is still present
+        """
+        file_hash = calculate_file_hash(os.path.join(DATA_DIR, name))
+        old_hashes = [h for h in get_hashes_for_file(name) if h != file_hash]
+        if is_file_processed(file_hash):
+            record = get_file_record(file_hash)
+            tracked_name = record['file_name'] if record else name
+            if tracked_name == name or os.path.exists(os.path.join(DATA_DIR, tracked_name)):
+                # Unchanged, or a duplicate copy of a PDF that is still present
+                return None
+            # Renamed (the old name is gone, whatever order the events came in)
+            started = time.perf_counter()
+            self._move(file_hash, tracked_name, name)
+            for old_hash in old_hashes:
+                self._retire(old_hash, name, move_facts=False)
+            return {'index': time.perf_counter() - started}
+
+        timings = {}
+        started = time.perf_counter()
+        with WATCH_STAGE_SECONDS.time(stage='convert'):
+            convert_pdf(self.converter, name, file_hash, self.cache_format, self.profiler)
+        timings['convert'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with WATCH_STAGE_SECONDS.time(stage='index'):
+            try:
+                chunks = index_queued_document(file_hash, self.chroma_collection,
+                                               self.embed_model, self.profiler)
+            except Exception:
+                # Untrack the half-indexed version so the next event retries it
+                self._drop(file_hash)
+                raise
+            # New version is searchable - now retire the old one. Its facts
+            # were replaced with the new version's, so a surviving copy of the
+            # old content keeps its vectors but not the facts.
+            for old_hash in old_hashes:
+                self._retire(old_hash, name, move_facts=False)
+        timings['index'] = time.perf_counter() - started
+        timings['chunks'] = chunks
+        return timings
+
+    def remove(self, name):
+        """Drop everything indexed for a deleted PDF that no other PDF has the content of"""
+        started = time.perf_counter()
+        hashes = get_hashes_for_file(name)
+        for file_hash in hashes:
+            self._retire(file_hash, name)
+        replace_facts_for_file(name, [], self.chroma_collection.name)
+        return {'index': time.perf_counter() - started, 'versions': len(hashes)}
+
+    def refresh_bm25(self):
+        started = time.perf_counter()
+        with WATCH_STAGE_SECONDS.time(stage='bm25'):
+            refresh_bm25_cache(self.chroma_collection, log=_quiet)
+        return time.perf_counter() - started
+
+def startup_changes():
+    """Changes made while the watcher was not running (tracker vs Dataset/), deletions first"""
+    now = time.time()
+    present = {f for f in os.listdir(DATA_DIR) if f.lower().endswith('.pdf')}
+    tracked = set(get_tracker().processed_files().values())
+    changes = [Change(DELETED, name, os.path.join(DATA_DIR, name), now)
+               for name in sorted(tracked - present)]
+    changes += [Change(ADDED, name, os.path.join(DATA_DIR, name), now)
+                for name in sorted(present)]
+    return changes
+
+def apply_changes(indexer, changes, publish_log):
+    """
+    Apply one settled batch, rebuild BM25 once, publish the new generation
+    for chat processes to reload, then record the publish latency.
+
+    The local Chroma store is locked for the batch only, so index_02 runs
+    (including --rebuild) can take turns with the watcher.
+    """
+    with chroma_write_lock():
+        indexer.follow_promotion()
+        applied = []
+        # Deletions first: a rename arrives as a deletion plus an addition, in
+        # no particular order when found by a polling rescan
+        for change in sorted(changes, key=lambda change: change.kind != DELETED):
+            print(f"\n📥 {change.kind}: {change.name}")
+            try:
+                if change.kind == DELETED:
+                    timings = indexer.remove(change.name)
+                else:
+                    timings = indexer.upsert(change.name)
+                    if timings is None:
+                        print("   ⏭️  Content unchanged - already indexed")
+                        CHANGES_APPLIED.inc(kind=change.kind, status='unchanged')
+                        continue
+            except Exception as e:
+                print(f"   ❌ {change.name}: {e}")
+                CHANGES_APPLIED.inc(kind=change.kind, status='error')
+                continue
+            CHANGES_APPLIED.inc(kind=change.kind, status='ok')
+            applied.append((change, timings))
+
+        if not applied:
+            return
+        bm25_seconds = indexer.refresh_bm25()
+        pointer = publish_generation(indexer.chroma_collection.name,
+                                     changed_at=min(change.first_seen for change, _ in applied))
+    published_at = time.time()
+
+    for change, timings in applied:
+        latency = published_at - change.first_seen
+        PUBLISH_SECONDS.observe(latency, kind=change.kind)
+        publish_log.append(latency)
+        stages = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in timings.items()
+                           if stage in ('convert', 'index'))
+        print(f"   ⏱️  {change.name}: published {latency:.1f}s after first event "
+              f"({stages}, bm25 {bm25_seconds:.1f}s)")
+    print(f"   🧵 {indexer.chroma_collection.count()} vectors | generation {pointer['generation']} "
+          f"(chat reloads within ~{INDEX_RELOAD_SECONDS:g}s) | publish {freshness_summary(publish_log)}")
+
+def freshness_summary(values):
+    if len(values) < 2:
+        return f"{values[0]:.1f}s"
+    cuts = statistics.quantiles(values, n=20, method='inclusive')
+    return (f"p50 {statistics.median(values):.1f}s p95 {cuts[18]:.1f}s "
+            f"max {max(values):.1f}s over {len(values)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch Dataset/ and index PDF changes as they land")
+    parser.add_argument("--format", choices=sorted(PARSING_PARAMETERS), default="elements",
+                        help="Cache format for converted PDFs (see ingest_01)")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="Seconds without writes before a file counts as settled (default: 2)")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Directory scan interval when inotify is unavailable (default: 2)")
+    parser.add_argument("--no-inotify", action="store_true", help="Force the polling fallback")
+    parser.add_argument("--no-initial-sync", action="store_true",
+                        help="Ignore PDFs added or removed while the watcher was stopped")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    profiler = Profiler("watch_dataset", args.profile)
+
+    started_at = time.time()
+    load_dotenv()
+    ensure_environment()
+
+    print("=" * 70)
+    print("👀 DATASET WATCHER - continuous incremental ingestion")
+    print("=" * 70)
+
+    print("\n🔄 Loading Docling converter...")
+    with WATCH_STAGE_SECONDS.time(stage='warmup'):
+        converter = DocumentConverter()
+        embed_model = load_embed_model(profiler)
+        chroma_collection = open_collection()
+    indexer = IncrementalIndexer(converter, embed_model, chroma_collection, args.format, profiler)
+
+    watcher = DirectoryWatcher(DATA_DIR, suffixes=('.pdf',), debounce_seconds=args.debounce,
+                               poll_seconds=args.poll_interval, use_inotify=not args.no_inotify)
+    print(f"\n👀 Watching {DATA_DIR} ({watcher.mode}, debounce {args.debounce:g}s) - Ctrl+C to stop")
+
+    publish_log = []
+    try:
+        if not args.no_initial_sync:
+            apply_changes(indexer, startup_changes(), publish_log)
+        while True:
+            changes = watcher.poll(timeout=1.0)
+            if changes:
+                apply_changes(indexer, changes, publish_log)
+                write_job_metrics("watch", started_at)
+    except KeyboardInterrupt:
+        print("\n👋 Stopping watcher")
+    finally:
+        watcher.close()
+        write_job_metrics("watch", started_at)
+        profiler.write_reports()
+        if publish_log:
+            print(f"📊 Publish latency: {freshness_summary(publish_log)}")
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,13 @@ import sys
 import subprocess
 import fcntl
 import atexit
+import argparse
 
 from llama_index.core import Settings
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 
+from utils.profiling import Profiler, add_profile_argument, profile_run_id
+
 # ---------- SINGLETON LOCK ----------
 PID_FILE = "/tmp/solar_rag_pipeline.pid"
 
@@ -32,15 +35,26 @@ def enforce_singleton():
             pass
     atexit.register(cleanup)
 
-enforce_singleton()
 # ------------------------------------
 
-# ---------- GLOBAL SETTINGS ----------
-print("🌍 FORCING BGE-M3 Multilingual Embeddings (1024-dim)...")
-Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
-# --------------------------------------
-
 def main():
+    parser = argparse.ArgumentParser(description="Run ingestion, indexing and chat")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    
+    enforce_singleton()
+    profiler = Profiler("rag_run", args.profile)
+    # Phases are profiled in their own processes, under the same run id
+    phase_args = ["--profile", args.profile] if args.profile else []
+    if args.profile:
+        print(f"🔬 Profile run id: {profile_run_id()}")
+    
+    # ---------- GLOBAL SETTINGS ----------
+    print("🌍 FORCING BGE-M3 Multilingual Embeddings (1024-dim)...")
+    with profiler.stage("embed_model"):
+        Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+    # --------------------------------------
+    
     print("🔋 --- SOLAR RAG PIPELINE --- 🔋")
     
     # Absolute paths
@@ -51,15 +65,17 @@ def main():
     
     # Phase 1: Ingest
     print("\n🚀 Phase 1: Ingestion")
-    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "ingest_01.py")])
+    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "ingest_01.py")] + phase_args)
     
     # Phase 2: Index
     print("\n🚀 Phase 2: Indexing")
-    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "index_02.py")])
+    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "index_02.py")] + phase_args)
     
     # Phase 3: Chat
     print("\n🚀 Phase 3: Chat")
-    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "chat_03.py")])
+    subprocess.run([sys.executable, os.path.join(project_root, "pipeline", "chat_03.py")] + phase_args)
+    
+    profiler.write_reports()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import os
 import shutil
 import sqlite3
-from utils.storage_utils import CACHE_DIR, PROJECT_ROOT
+from utils.storage_utils import CACHE_DIR, PROJECT_ROOT, FACTS_DB
 
 def reset_system():
     print("🧹 Starting full RAG system reset...")
@@ -31,10 +31,19 @@ def reset_system():
             conn.commit()
             conn.close()
             os.remove(db_path) # Now safe to remove
+            # WAL-mode sidecars would otherwise replay stale rows into a new tracker
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
         except Exception as e:
             print(f"     ⚠️ Note: Could not delete DB file (might be open): {e}")
 
-    # 4. Clear Logs
+    # 4. Clear the structured facts store
+    if os.path.exists(FACTS_DB):
+        print(f"  -> Deleting Facts Store: {FACTS_DB}")
+        os.remove(FACTS_DB)
+
+    # 5. Clear Logs
     log_file = os.path.join(PROJECT_ROOT, "ingestion.log")
     if os.path.exists(log_file):
         os.remove(log_file)
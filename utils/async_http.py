@@ -0,0 +1,110 @@
+import json
+from typing import Dict, Optional
+
+# --- MINIMAL ASYNCIO HTTP/1.1 HELPERS ---
+# Shared by pipeline/chat_server.py and pipeline/llm_standin.py so neither
+# needs a web framework. Supports keep-alive, Content-Length bodies and
+# chunked streaming responses.
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+async def read_request(reader):
+    """
+    Parse one HTTP/1.1 request.
+
+    Returns:
+        (method, path, headers, body, keep_alive), or None when the client
+        closed the connection
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "Too many headers")
+
+    try:
+        length = int(headers.get('content-length', '0') or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+    path = target.split('?', 1)[0]
+    return method.upper(), path, headers, body, keep_alive
+
+def encode_json(payload):
+    return json.dumps(payload, ensure_ascii=False, default=float).encode('utf-8')
+
+def _head(status, content_type, keep_alive, extra_headers):
+    lines = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        f"Content-Type: {content_type}; charset=utf-8",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+    return lines
+
+async def write_response(writer, status, payload, keep_alive=True,
+                         content_type="application/json",
+                         extra_headers: Optional[Dict[str, str]] = None):
+    """Write a complete response; dict payloads are sent as JSON"""
+    body = payload if isinstance(payload, bytes) else encode_json(payload)
+    lines = _head(status, content_type, keep_alive, extra_headers)
+    lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+def start_chunked(writer, status=200, content_type="text/event-stream", keep_alive=True,
+                  extra_headers: Optional[Dict[str, str]] = None):
+    """Send headers for a chunked (streaming) response"""
+    lines = _head(status, content_type, keep_alive, extra_headers)
+    lines += ["Cache-Control: no-cache", "Transfer-Encoding: chunked"]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+async def write_chunk(writer, data: bytes):
+    writer.write(f"{len(data):X}\r\n".encode('latin-1') + data + b"\r\n")
+    await writer.drain()
+
+async def end_chunked(writer):
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+__all__ = [
+    'HTTPError',
+    'read_request',
+    'encode_json',
+    'write_response',
+    'start_chunked',
+    'write_chunk',
+    'end_chunked'
+]
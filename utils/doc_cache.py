@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Compressed, streamable cache format for converted documents.
+
+A cache file is one compressed JSONL stream (zstd when the optional
+`zstandard` package is installed, gzip otherwise) so it can be inspected
+with `zcat` / `zstdcat`:
+
+    {"cache_format": "legal_rag_doc", "cache_version": 1}
+    {"kind": "document", "format": "markdown", "metadata": {...}, "chars": 48211, "records": 31}
+    {"kind": "section", "text": "## 1. DEFINITIONS ...\\n..."}
+    ...
+    {"kind": "document", "format": "docling_elements", "version": 1, "metadata": {...}, "records": 812}
+    {"kind": "element", "element": {"type": "heading", "text": "1. DEFINITIONS", "level": 1}}
+    ...
+
+Markdown is stored one record per `## ` section (the pieces join back to the
+exact text) and Docling elements one record per element, so index_02 can
+split a document while it is being decompressed instead of loading it whole.
+Legacy `<hash>.json` caches are converted on first read.
+
+    python utils/doc_cache.py migrate [--dir cache/]
+    python utils/doc_cache.py report [--dir cache/]
+
+`report` compares on-disk size and load time with the legacy pretty-printed
+JSON format.
+"""
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import argparse
+import tempfile
+from typing import List, Dict, Any, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.docling_elements import ELEMENTS_FORMAT
+
+CACHE_FORMAT = "legal_rag_doc"
+CACHE_VERSION = 1
+LEGACY_EXTENSION = ".json"
+ZSTD_EXTENSION = ".jsonl.zst"
+GZIP_EXTENSION = ".jsonl.gz"
+CACHE_EXTENSIONS = (ZSTD_EXTENSION, GZIP_EXTENSION)
+CACHE_EXTENSION = ZSTD_EXTENSION if zstandard is not None else GZIP_EXTENSION
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_MAGIC = b'\x1f\x8b'
+
+class CacheFormatError(ValueError):
+    """File is not a readable document cache (bad header, unknown version/codec)"""
+
+def is_cache_file(filename: str) -> bool:
+    """True for compressed and legacy `.json` document caches"""
+    return filename.endswith(CACHE_EXTENSIONS) or filename.endswith(LEGACY_EXTENSION)
+
+def cache_hash(filename: str) -> str:
+    """File hash a cache file is named after (`<hash>.jsonl.zst` → `<hash>`)"""
+    return os.path.basename(filename).split('.', 1)[0]
+
+def cache_path_for(cache_dir: str, file_hash: str) -> str:
+    return os.path.join(cache_dir, f"{file_hash}{CACHE_EXTENSION}")
+
+def find_cache_file(cache_dir: str, file_hash: str) -> Optional[str]:
+    """Existing cache file for a hash, compressed formats first"""
+    for extension in CACHE_EXTENSIONS + (LEGACY_EXTENSION,):
+        path = os.path.join(cache_dir, f"{file_hash}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def split_sections(text: str) -> List[str]:
+    """
+    Split markdown before each `## ` heading line.
+
+    Every piece but the last ends with a newline and ''.join(pieces) == text,
+    so readers can rebuild the exact text or stream it line by line.
+    """
+    pieces = []
+    start = 0
+    position = text.find('\n## ')
+    while position != -1:
+        pieces.append(text[start:position + 1])
+        start = position + 1
+        position = text.find('\n## ', position + 1)
+    pieces.append(text[start:])
+    return pieces
+
+def _document_records(document: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Header record followed by content records for one legacy-shaped document"""
+    metadata = document.get('metadata', {})
+    if document.get('format') == ELEMENTS_FORMAT:
+        elements = document.get('elements', [])
+        yield {'kind': 'document', 'format': ELEMENTS_FORMAT, 'version': document.get('version'),
+               'metadata': metadata, 'records': len(elements)}
+        for element in elements:
+            yield {'kind': 'element', 'element': element}
+        return
+
+    text = document.get('text', '')
+    sections = split_sections(text)
+    yield {'kind': 'document', 'format': 'markdown', 'metadata': metadata,
+           'chars': len(text), 'records': len(sections)}
+    for section in sections:
+        yield {'kind': 'section', 'text': section}
+
+def _open_write(path: str):
+    raw = open(path, 'wb')
+    if path.endswith(ZSTD_EXTENSION):
+        if zstandard is None:
+            raw.close()
+            raise CacheFormatError("zstandard is not installed - cannot write .zst caches")
+        return raw, zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+    return raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+
+def write_cache(path: str, documents: List[Dict[str, Any]]) -> str:
+    """
+    Write documents (legacy cache shape) as a compressed cache file.
+
+    Written to a temporary file and renamed, so readers never see a
+    half-written cache.
+
+    Args:
+        path: Destination ending in `.jsonl.zst` or `.jsonl.gz`
+        documents: List of {'text', 'metadata'} or
+            {'format': 'docling_elements', 'version', 'elements', 'metadata'} dicts
+
+    Returns:
+        The destination path
+    """
+    tmp_path = f"{path}.tmp"
+    raw, stream = _open_write(tmp_path)
+    try:
+        with raw, stream:
+            header = {'cache_format': CACHE_FORMAT, 'cache_version': CACHE_VERSION}
+            stream.write(json.dumps(header).encode('utf-8') + b'\n')
+            for document in documents:
+                for record in _document_records(document):
+                    line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+                    stream.write(line.encode('utf-8') + b'\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def _open_read(path: str):
+    raw = open(path, 'rb')
+    magic = raw.read(4)
+    raw.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        # GzipFile does not close a fileobj it was handed - the caller closes `raw`
+        return raw, io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode='rb'), encoding='utf-8')
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raw.close()
+            raise CacheFormatError(f"{os.path.basename(path)} is zstd-compressed - pip install zstandard")
+        return raw, io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding='utf-8')
+    raw.close()
+    raise CacheFormatError(f"{os.path.basename(path)}: unknown compression")
+
+class CacheReader:
+    """
+    Streaming reader for a compressed cache file.
+
+    Content is decompressed as it is consumed; only the first document is
+    streamed (converted PDFs are cached one document per file), read_cache()
+    returns every document.
+
+        with CacheReader(path) as reader:
+            reader.document            # first document header record
+            for line in reader.iter_lines(): ...
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._raw, self._stream = _open_read(path)
+        try:
+            header = json.loads(self._stream.readline() or 'null')
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('cache_format') != CACHE_FORMAT:
+            self.close()
+            raise CacheFormatError(f"{os.path.basename(path)}: missing cache header")
+        if header.get('cache_version') != CACHE_VERSION:
+            self.close()
+            raise CacheFormatError(
+                f"{os.path.basename(path)}: cache version {header.get('cache_version')} "
+                f"(expected {CACHE_VERSION})"
+            )
+        self.header = header
+        self._pending = None
+        self.document = self._next_record() or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._stream.close()
+        self._raw.close()
+
+    def _next_record(self) -> Optional[Dict[str, Any]]:
+        if self._pending is not None:
+            record, self._pending = self._pending, None
+            return record
+        line = self._stream.readline()
+        return json.loads(line) if line else None
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Content records of the current document (stops at the next document header)"""
+        while True:
+            record = self._next_record()
+            if record is None:
+                return
+            if record.get('kind') == 'document':
+                self._pending = record
+                return
+            yield record
+
+    @property
+    def format(self) -> str:
+        return self.document.get('format', 'markdown')
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.document.get('metadata', {})
+
+    def iter_elements(self) -> Iterator[Dict[str, Any]]:
+        for record in self.iter_records():
+            if record.get('kind') == 'element':
+                yield record['element']
+
+    def iter_sections(self) -> Iterator[str]:
+        for record in self.iter_records():
+            if record.get('kind') == 'section':
+                yield record['text']
+
+    def iter_lines(self) -> Iterator[str]:
+        """Markdown lines without newlines (same boundaries as text.split('\\n'))"""
+        last = ''
+        for section in self.iter_sections():
+            lines = section.split('\n')
+            last = lines.pop()
+            yield from lines
+        yield last
+
+    def next_document(self) -> bool:
+        """Skip the rest of the current document; False when there is none left"""
+        for _ in self.iter_records():
+            pass
+        record = self._next_record()
+        self.document = record or {}
+        return record is not None
+
+def _read_legacy(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        documents = json.load(f)
+    if not isinstance(documents, list) or not all(isinstance(doc, dict) for doc in documents):
+        raise CacheFormatError(f"{os.path.basename(path)}: legacy cache is not a document list")
+    return documents
+
+def read_cache(path: str) -> List[Dict[str, Any]]:
+    """
+    Load every document of a cache file, compressed or legacy `.json`.
+
+    Returns:
+        List of documents in the legacy shape ({'text', 'metadata'} or
+        {'format', 'version', 'elements', 'metadata'})
+    """
+    if path.endswith(LEGACY_EXTENSION):
+        return _read_legacy(path)
+
+    documents = []
+    with CacheReader(path) as reader:
+        while reader.document:
+            header = reader.document
+            if header.get('format') == ELEMENTS_FORMAT:
+                documents.append({
+                    'format': ELEMENTS_FORMAT,
+                    'version': header.get('version'),
+                    'elements': list(reader.iter_elements()),
+                    'metadata': header.get('metadata', {}),
+                })
+            else:
+                documents.append({
+                    'text': ''.join(reader.iter_sections()),
+                    'metadata': header.get('metadata', {}),
+                })
+            if not reader.next_document():
+                break
+    return documents
+
+def migrate_legacy(path: str) -> str:
+    """
+    Convert a legacy `<hash>.json` cache to the compressed format.
+
+    The legacy file is removed only after the new one is complete.
+
+    Returns:
+        Path of the compressed cache (unchanged path if already compressed)
+    """
+    if not path.endswith(LEGACY_EXTENSION):
+        return path
+    documents = _read_legacy(path)
+    new_path = path[:-len(LEGACY_EXTENSION)] + CACHE_EXTENSION
+    write_cache(new_path, documents)
+    os.remove(path)
+    return new_path
+
+def _default_cache_dir() -> str:
+    return os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')), "cache")
+
+def _cache_files(cache_dir: str) -> List[str]:
+    return sorted(
+        os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+        if is_cache_file(name) and not name.endswith('.tmp')
+    )
+
+def _time_best(fn, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def _stream_document(path: str) -> int:
+    """Consume the first document the way index_02 does (lines or elements)"""
+    with CacheReader(path) as reader:
+        items = reader.iter_elements() if reader.format == ELEMENTS_FORMAT else reader.iter_lines()
+        return sum(1 for _ in items)
+
+def compare_formats(path: str, tmp_dir: str, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Size and load time of one cache in the legacy and compressed formats.
+
+    Both representations are rebuilt from the file's documents in `tmp_dir`
+    (legacy: json.dump indent=2, as save_to_cache used to write).
+    """
+    documents = read_cache(path)
+    name = cache_hash(path)
+    legacy_path = os.path.join(tmp_dir, f"{name}{LEGACY_EXTENSION}")
+    compressed_path = os.path.join(tmp_dir, f"{name}{CACHE_EXTENSION}")
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump(documents, f, indent=2, ensure_ascii=False)
+    write_cache(compressed_path, documents)
+
+    row = {
+        'file': os.path.basename(path),
+        'legacy_bytes': os.path.getsize(legacy_path),
+        'compressed_bytes': os.path.getsize(compressed_path),
+        'legacy_load_ms': _time_best(lambda: _read_legacy(legacy_path), repeats),
+        'compressed_load_ms': _time_best(lambda: read_cache(compressed_path), repeats),
+        'compressed_stream_ms': _time_best(lambda: _stream_document(compressed_path), repeats),
+    }
+    os.remove(legacy_path)
+    os.remove(compressed_path)
+    return row
+
+def report(cache_dir: str, repeats: int = 5) -> List[Dict[str, Any]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path in _cache_files(cache_dir):
+            try:
+                rows.append(compare_formats(path, tmp_dir, repeats))
+            except (OSError, ValueError) as e:
+                print(f"   ⚠️  Skipping {os.path.basename(path)}: {e}")
+    if not rows:
+        print(f"⏭️  No cache files in {cache_dir}")
+        return rows
+
+    print(f"{'file':<28} {'json KB':>9} {CACHE_EXTENSION + ' KB':>13} {'ratio':>6} "
+          f"{'json ms':>8} {'load ms':>8} {'stream ms':>9}")
+    for row in rows + [_totals(rows)]:
+        ratio = row['legacy_bytes'] / max(1, row['compressed_bytes'])
+        print(f"{row['file'][:28]:<28} {row['legacy_bytes'] / 1024:>9.1f} "
+              f"{row['compressed_bytes'] / 1024:>13.1f} {ratio:>5.1f}x "
+              f"{row['legacy_load_ms']:>8.2f} {row['compressed_load_ms']:>8.2f} "
+              f"{row['compressed_stream_ms']:>9.2f}")
+    return rows
+
+def _totals(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    totals = {'file': f"TOTAL ({len(rows)} files)"}
+    for key in rows[0]:
+        if key != 'file':
+            totals[key] = sum(row[key] for row in rows)
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Document cache tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="Convert legacy .json caches to the compressed format")
+    migrate.add_argument("--dir", default=_default_cache_dir())
+
+    compare = sub.add_parser("report", help="On-disk size and load time vs. legacy JSON")
+    compare.add_argument("--dir", default=_default_cache_dir())
+    compare.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"❌ No cache directory: {args.dir}")
+        sys.exit(1)
+
+    codec = 'zstd' if zstandard is not None else 'gzip - zstandard is not installed, report compares gzip'
+    print(f"🗜️  Cache codec: {codec}")
+    if args.command == "migrate":
+        migrated = 0
+        for path in _cache_files(args.dir):
+            if path.endswith(LEGACY_EXTENSION):
+                try:
+                    new_path = migrate_legacy(path)
+                except (OSError, ValueError) as e:
+                    print(f"   ⚠️  Skipping {os.path.basename(path)}: {e}")
+                    continue
+                print(f"   ✓ {os.path.basename(path)} → {os.path.basename(new_path)}")
+                migrated += 1
+        print(f"✅ Migrated {migrated} legacy cache file(s)")
+    else:
+        report(args.dir, args.repeats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from typing import List, Dict, Any, Optional
+
+# --- COMPACT DOCLING ELEMENTS ---
+# ingest_01 caches the typed items of Docling's DoclingDocument instead of
+# its markdown export, so index_02 gets section headers, paragraphs, list
+# items and table cells directly rather than re-parsing `## N.` and `|---|`.
+#
+# One element per item, None/empty fields omitted:
+#   {"type": "heading", "text": "4. GRID CONNECTION", "level": 1, "page": 7}
+#   {"type": "text", "text": "...", "page": 7}
+#   {"type": "list_item", "text": "...", "marker": "(a)", "page": 7}
+#   {"type": "table", "rows": [["Subject", "Key Information"], ...], "page": 8}
+
+ELEMENTS_FORMAT = "docling_elements"
+ELEMENTS_VERSION = 1
+
+HEADING_LABELS = {'title', 'section_header'}
+# Furniture and non-text items that never carry clause content
+SKIPPED_LABELS = {'page_header', 'page_footer', 'picture', 'chart', 'formula'}
+
+def _label(item) -> str:
+    label = getattr(item, 'label', '')
+    return str(getattr(label, 'value', label))
+
+def _page(item) -> Optional[int]:
+    prov = getattr(item, 'prov', None)
+    return prov[0].page_no if prov else None
+
+def table_rows(table_item) -> List[List[str]]:
+    """
+    Cell texts of a Docling TableItem, row by row.
+
+    Args:
+        table_item: TableItem whose `data.grid` holds TableCell rows
+
+    Returns:
+        List of rows, each a list of cell strings (spanned cells repeat)
+    """
+    grid = getattr(getattr(table_item, 'data', None), 'grid', None) or []
+    return [[(cell.text or '').strip() for cell in row] for row in grid]
+
+def compact_elements(document) -> List[Dict[str, Any]]:
+    """
+    Convert a DoclingDocument into compact, JSON-serializable elements.
+
+    Args:
+        document: docling_core DoclingDocument (result.document from DocumentConverter)
+
+    Returns:
+        List of element dicts in reading order
+    """
+    elements = []
+    for item, _level in document.iterate_items():
+        label = _label(item)
+        if label in SKIPPED_LABELS:
+            continue
+
+        element = {}
+        if label in HEADING_LABELS:
+            element = {'type': 'heading', 'text': item.text, 'level': getattr(item, 'level', 1)}
+        elif label == 'table':
+            rows = table_rows(item)
+            if not rows:
+                continue
+            element = {'type': 'table', 'rows': rows}
+        elif label == 'list_item':
+            element = {'type': 'list_item', 'text': item.text, 'marker': getattr(item, 'marker', None)}
+        elif getattr(item, 'text', None):
+            element = {'type': 'text', 'text': item.text}
+        else:
+            continue
+
+        element['page'] = _page(item)
+        elements.append({key: value for key, value in element.items() if value not in (None, '')})
+    return elements
+
+def table_to_markdown(rows: List[List[str]]) -> str:
+    """Pipe table with a separator after the first row (how chunks show tables)"""
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [cell.replace('|', '/').replace('\n', ' ') for cell in row] + [''] * (width - len(row))
+        lines.append('| ' + ' | '.join(cells) + ' |')
+        if i == 0:
+            lines.append('|' + '---|' * width)
+    return '\n'.join(lines)
+
+def element_to_markdown(element: Dict[str, Any]) -> str:
+    """Markdown line(s) for one element, matching Docling's markdown export"""
+    kind = element.get('type')
+    if kind == 'heading':
+        return f"## {element['text']}"
+    if kind == 'table':
+        return table_to_markdown(element['rows'])
+    if kind == 'list_item':
+        return f"- {element['text']}"
+    return element.get('text', '')
+
+def elements_to_markdown(elements: List[Dict[str, Any]]) -> str:
+    """Whole-document markdown (semantic fallback, debugging)"""
+    return '\n\n'.join(element_to_markdown(element) for element in elements)
+
+def cached_markdown(cached_document: Dict[str, Any]) -> str:
+    """Markdown of a cache entry in either format (elements are rendered)"""
+    if cached_document.get('format') == ELEMENTS_FORMAT:
+        return elements_to_markdown(cached_document.get('elements', []))
+    return cached_document.get('text', '')
@@ -0,0 +1,228 @@
+import os
+import re
+import sqlite3
+from typing import List, Dict, Any
+
+from utils.storage_utils import FACTS_DB
+
+# --- FACTS STORE ---
+# Exact-match store for definitions and table key-values extracted by index_02.
+# Lookups hit the primary key index on the normalized term, so answering a
+# "what is X" question costs one indexed SELECT instead of embedding + search.
+# Facts are stored per Chroma collection version (utils/index_versions.py), so
+# a promotion or rollback serves the facts of the clauses it serves.
+
+_LEADING_ARTICLES = re.compile(r'^(?:the|a|an)\s+')
+_NON_WORD = re.compile(r'[^\w%&/]+')
+
+def normalize_term(term: str) -> str:
+    """
+    Normalize a term for exact-match lookups.
+
+    "  The Effective Date " -> "effective date", "**Default Rate**" -> "default rate"
+
+    Args:
+        term: Raw term text (from a definition, a table key or a question)
+
+    Returns:
+        Lower-cased key with punctuation, quotes and leading articles removed
+    """
+    key = _NON_WORD.sub(' ', term.lower()).strip()
+    key = _LEADING_ARTICLES.sub('', key)
+    return ' '.join(key.split())
+
+def init_facts_db():
+    """
+    Initialize SQLite database for structured facts.
+    Creates table if it doesn't exist; a store written before facts were
+    versioned is migrated, its rows assigned to the live collection.
+    """
+    conn = sqlite3.connect(FACTS_DB)
+    c = conn.cursor()
+    columns = [row[1] for row in c.execute("PRAGMA table_info(facts)")]
+    legacy = bool(columns) and 'collection' not in columns
+    if legacy:
+        c.execute("DROP INDEX IF EXISTS idx_facts_filename")
+        c.execute("ALTER TABLE facts RENAME TO facts_legacy")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS facts (
+            collection TEXT NOT NULL,
+            term_key TEXT NOT NULL,
+            term TEXT NOT NULL,
+            value TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            clause_number TEXT,
+            clause_title TEXT,
+            PRIMARY KEY (collection, term_key, filename, kind)
+        )
+    ''')
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_facts_filename
+        ON facts (collection, filename)
+    ''')
+
+    if legacy:
+        from utils.index_versions import active_collection_name
+        c.execute("""
+            INSERT OR REPLACE INTO facts
+            SELECT ?, term_key, term, value, kind, filename, clause_number, clause_title
+            FROM facts_legacy
+        """, (active_collection_name(),))
+        c.execute("DROP TABLE facts_legacy")
+
+    conn.commit()
+    conn.close()
+
+def replace_facts_for_file(filename: str, facts: List[Dict[str, Any]], collection: str) -> int:
+    """
+    Replace all stored facts of one document in one collection version.
+
+    Args:
+        filename: Source document name
+        facts: Dicts with term, value, kind ('definition' or 'table'),
+               clause_number and clause_title
+        collection: Collection version the document's clauses were indexed into
+
+    Returns:
+        Number of facts written
+    """
+    init_facts_db()
+
+    rows = []
+    for fact in facts:
+        term_key = normalize_term(fact['term'])
+        if not term_key or not fact.get('value'):
+            continue
+        rows.append((
+            collection,
+            term_key,
+            fact['term'],
+            fact['value'],
+            fact['kind'],
+            filename,
+            fact.get('clause_number'),
+            fact.get('clause_title')
+        ))
+
+    conn = sqlite3.connect(FACTS_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM facts WHERE collection = ? AND filename = ?", (collection, filename))
+    c.executemany("""
+        INSERT OR REPLACE INTO facts
+        (collection, term_key, term, value, kind, filename, clause_number, clause_title)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+def rename_facts_for_file(old_filename: str, new_filename: str, collection: str) -> int:
+    """
+    Move the facts of a document to its new file name.
+
+    Args:
+        old_filename: Name the facts were stored under
+        new_filename: Name of the renamed (or surviving duplicate) document
+        collection: Collection version whose facts are moved
+
+    Returns:
+        Number of facts moved
+    """
+    if not os.path.exists(FACTS_DB):
+        return 0
+
+    init_facts_db()
+    conn = sqlite3.connect(FACTS_DB)
+    c = conn.cursor()
+    c.execute("UPDATE OR REPLACE facts SET filename = ? WHERE collection = ? AND filename = ?",
+              (new_filename, collection, old_filename))
+    moved = c.rowcount
+    conn.commit()
+    conn.close()
+    return moved
+
+def lookup_fact(term: str, collection: str) -> List[Dict[str, Any]]:
+    """
+    Look up a term by its normalized key.
+
+    Args:
+        term: Term as written by the user
+        collection: Collection version being served
+
+    Returns:
+        Matching facts (definitions first), empty list on a miss
+    """
+    term_key = normalize_term(term)
+    if not term_key or not os.path.exists(FACTS_DB):
+        return []
+
+    conn = sqlite3.connect(FACTS_DB)
+    conn.row_factory = sqlite3.Row
+    try:
+        c = conn.cursor()
+        c.execute("""
+            SELECT term, value, kind, filename, clause_number, clause_title
+            FROM facts WHERE collection = ? AND term_key = ?
+            ORDER BY kind = 'definition' DESC, filename
+        """, (collection, term_key))
+        results = [dict(row) for row in c.fetchall()]
+    except sqlite3.OperationalError:
+        # Store from before facts were versioned: migrate once, then retry
+        conn.close()
+        init_facts_db()
+        return lookup_fact(term, collection)
+    conn.close()
+    return results
+
+def delete_facts_for_file(filename: str, collection: str):
+    """
+    Remove all facts extracted from a document.
+
+    Args:
+        filename: Source document name
+        collection: Collection version to remove them from
+    """
+    if not os.path.exists(FACTS_DB):
+        return
+
+    init_facts_db()
+    conn = sqlite3.connect(FACTS_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM facts WHERE collection = ? AND filename = ?", (collection, filename))
+    conn.commit()
+    conn.close()
+
+def delete_facts_for_collection(collection: str) -> int:
+    """
+    Remove the facts of a dropped collection version.
+
+    Args:
+        collection: Collection version name
+
+    Returns:
+        Number of facts removed
+    """
+    if not os.path.exists(FACTS_DB):
+        return 0
+
+    init_facts_db()
+    conn = sqlite3.connect(FACTS_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM facts WHERE collection = ?", (collection,))
+    removed = c.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+__all__ = [
+    'normalize_term',
+    'init_facts_db',
+    'replace_facts_for_file',
+    'rename_facts_for_file',
+    'lookup_fact',
+    'delete_facts_for_file',
+    'delete_facts_for_collection'
+]
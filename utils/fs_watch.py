@@ -0,0 +1,220 @@
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+from typing import Dict, List, Optional, Tuple
+
+# --- DIRECTORY WATCHER ---
+# Notices files added to, rewritten in or removed from one directory.
+# Linux inotify (through ctypes, no extra dependency) when available,
+# otherwise a periodic os.scandir() comparison of size and mtime.
+#
+# Writes arrive in bursts (a copy is many IN_MODIFY events; an editor saves
+# via temp file + rename), so a file is only reported once it has had no
+# events for `debounce_seconds` and its size/mtime stopped changing.
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o00004000
+IN_CLOEXEC = 0o02000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+READ_SIZE = 64 * 1024
+
+ADDED = 'added'
+CHANGED = 'changed'
+DELETED = 'deleted'
+
+class Change:
+    """A settled change to one file"""
+
+    def __init__(self, kind, name, path, first_seen):
+        self.kind = kind
+        self.name = name
+        self.path = path
+        # time.time() of the first event of the burst (freshness clock start)
+        self.first_seen = first_seen
+
+    def __repr__(self):
+        return f"Change({self.kind}, {self.name})"
+
+class _Inotify:
+    """Non-blocking inotify descriptor watching one directory"""
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout: float) -> Optional[List[str]]:
+        """
+        Names with events within `timeout` seconds.
+
+        Returns:
+            List of file names (may repeat), or None if the kernel queue
+            overflowed or the directory itself went away (caller rescans)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            raw_name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                return None
+            if raw_name:
+                names.append(os.fsdecode(raw_name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class DirectoryWatcher:
+    """
+    Debounced add/change/delete notifications for one directory.
+
+        watcher = DirectoryWatcher(DATA_DIR, suffixes=('.pdf',))
+        while True:
+            for change in watcher.poll(timeout=1.0):
+                ...
+
+    Files present when the watcher starts count as already known; the
+    caller reconciles them (e.g. against the tracker) itself.
+    """
+
+    def __init__(self, directory: str, suffixes: Tuple[str, ...] = ('.pdf',),
+                 debounce_seconds: float = 2.0, poll_seconds: float = 2.0,
+                 use_inotify: bool = True):
+        self.directory = directory
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.debounce_seconds = debounce_seconds
+        self.poll_seconds = poll_seconds
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(directory)
+            except (OSError, AttributeError) as e:
+                # AttributeError: libc without inotify symbols (non-Linux)
+                print(f"   ⚠️  inotify unavailable ({e}) - polling every {poll_seconds:g}s")
+        # Stat of every file as last reported to the caller
+        self.known = self._scan()
+        # Stat as last observed (polling diff base)
+        self._observed = dict(self.known)
+        # name -> [first_seen wall time, last event monotonic, stat at last event]
+        self._pending: Dict[str, list] = {}
+        self._last_scan = time.monotonic()
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def _wanted(self, name: str) -> bool:
+        return name.lower().endswith(self.suffixes) and not name.startswith('.')
+
+    def _stat(self, name: str):
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _scan(self) -> Dict[str, tuple]:
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and self._wanted(entry.name):
+                    st = entry.stat()
+                    snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def _touch(self, name: str):
+        pending = self._pending.get(name)
+        first_seen = pending[0] if pending else time.time()
+        self._pending[name] = [first_seen, time.monotonic(), self._stat(name)]
+
+    def _rescan(self):
+        current = self._scan()
+        for name in set(current) | set(self._observed):
+            if current.get(name) != self._observed.get(name):
+                self._touch(name)
+        self._observed = current
+
+    def _settled(self) -> List[Change]:
+        now = time.monotonic()
+        changes = []
+        for name, (first_seen, last_event, last_stat) in list(self._pending.items()):
+            if now - last_event < self.debounce_seconds:
+                continue
+            stat = self._stat(name)
+            if stat is not None and stat != last_stat:
+                # Still being written without events (e.g. network filesystems)
+                self._pending[name] = [first_seen, now, stat]
+                continue
+            del self._pending[name]
+
+            path = os.path.join(self.directory, name)
+            if stat is None:
+                if self.known.pop(name, None) is not None:
+                    changes.append(Change(DELETED, name, path, first_seen))
+            elif name not in self.known:
+                self.known[name] = stat
+                changes.append(Change(ADDED, name, path, first_seen))
+            elif self.known[name] != stat:
+                self.known[name] = stat
+                changes.append(Change(CHANGED, name, path, first_seen))
+        return changes
+
+    def poll(self, timeout: float = 1.0) -> List[Change]:
+        """
+        Wait up to `timeout` seconds for events.
+
+        Returns:
+            Changes whose bursts have settled (possibly empty)
+        """
+        if self._inotify is not None:
+            names = self._inotify.read(timeout)
+            if names is None:
+                print("   ⚠️  inotify queue overflow - rescanning")
+                self._rescan()
+            else:
+                for name in names:
+                    if self._wanted(name):
+                        self._touch(name)
+        else:
+            time.sleep(timeout)
+            if time.monotonic() - self._last_scan >= self.poll_seconds:
+                self._rescan()
+                self._last_scan = time.monotonic()
+        return self._settled()
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Blue/green versions of the Chroma collection.
+
+A full rebuild (index_02 --rebuild) writes `solar_ppa_collection__v<N>`, its
+BM25 snapshot and its facts (utils/facts_store.py keeps facts per version)
+while the previous version keeps serving, then promotes it by atomically
+replacing chroma_db/active_index.json:
+
+    {"collection": "solar_ppa_collection__v3", "version": 3, "vectors": 5210,
+     "documents": 41, "promoted_at": "2026-03-02T10:14:07"}
+
+Chat processes poll the pointer and swap to the new version without
+restarting (ChatEngine.reload_if_promoted). The watcher, which edits the
+live collection in place, bumps the pointer's `generation` instead (with
+`changed_at`, the first file event it covers) so chat reloads that too.
+Without a pointer the original unversioned `solar_ppa_collection` is live,
+so existing stores keep working.
+
+    python utils/index_versions.py status
+    python utils/index_versions.py promote 2      # roll back to v2
+    python utils/index_versions.py prune [--keep 2]
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import chromadb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.storage_utils import CHROMA_DB_PATH, BM25_CACHE_DIR, INDEX_POINTER_PATH
+from utils.facts_store import delete_facts_for_collection
+
+COLLECTION_BASE = "solar_ppa_collection"
+VERSION_PATTERN = re.compile(rf'^{COLLECTION_BASE}__v(\d+)$')
+
+# Chroma server for concurrent index workers (unset: local persistent store)
+CHROMA_HOST = os.getenv("CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+# Versions kept after a promotion: the live one plus the previous one, so
+# queries still running on it finish and `promote` can roll back
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+# How often chat processes look for a newly promoted version
+INDEX_RELOAD_SECONDS = float(os.getenv("INDEX_RELOAD_SECONDS", "5"))
+
+# BM25 cache files written by chat_03.save_bm25_cache (arrays live in bm25_index-<hash>/)
+BM25_SNAPSHOT_FILES = ("bm25_hash.txt", "bm25_retriever.pkl")
+
+def chroma_client():
+    """Chroma server client when CHROMA_HOST is set, else the local persistent store"""
+    if CHROMA_HOST:
+        return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+def reset_chroma_clients():
+    """
+    Forget Chroma clients inherited over fork(). chromadb shares one System
+    (SQLite connections, HNSW segments) per path across clients, so without
+    this a forked worker's new client would reuse the parent's.
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+        # Dropped without stop(): the inherited connections belong to the parent
+        SharedSystemClient._identifier_to_system.clear()
+    except (ImportError, AttributeError):
+        pass
+
+def versioned_name(version: int) -> str:
+    return f"{COLLECTION_BASE}__v{version}"
+
+def collection_version(name: str) -> Optional[int]:
+    """
+    Version number of a collection name.
+
+    Returns:
+        N for `solar_ppa_collection__vN`, 0 for the unversioned collection,
+        None for unrelated collections
+    """
+    if name == COLLECTION_BASE:
+        return 0
+    match = VERSION_PATTERN.match(name)
+    return int(match.group(1)) if match else None
+
+def bm25_snapshot_dir(collection_name: str) -> str:
+    """BM25 cache directory of one collection version"""
+    if collection_name == COLLECTION_BASE:
+        # Where the cache lived before collections were versioned
+        return BM25_CACHE_DIR
+    return os.path.join(BM25_CACHE_DIR, collection_name)
+
+def read_pointer() -> Optional[Dict[str, Any]]:
+    """
+    The active version record.
+
+    Returns:
+        Pointer dictionary, or None if no version was ever promoted
+    """
+    try:
+        with open(INDEX_POINTER_PATH, 'r', encoding='utf-8') as f:
+            pointer = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # Only a hand-edited file can be partial (promote() replaces atomically)
+        print(f"   ⚠️ Ignoring unreadable index pointer: {e}")
+        return None
+    return pointer if isinstance(pointer, dict) and pointer.get('collection') else None
+
+def active_collection_name() -> str:
+    pointer = read_pointer()
+    return pointer['collection'] if pointer else COLLECTION_BASE
+
+def active_generation(pointer: Optional[Dict[str, Any]] = None) -> tuple:
+    """(collection name, generation) chat should be serving, from `pointer` or the file"""
+    pointer = pointer or read_pointer()
+    if not pointer:
+        return COLLECTION_BASE, 0
+    return pointer['collection'], pointer.get('generation', 0)
+
+def pointer_signature() -> Optional[tuple]:
+    """Cheap change check: promote() always creates a new file (new inode)"""
+    try:
+        st = os.stat(INDEX_POINTER_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def list_versions(db) -> List[str]:
+    """Versioned (and legacy unversioned) collection names, oldest first"""
+    names = []
+    for collection in db.list_collections():
+        # chromadb >= 0.6 returns names, older releases Collection objects
+        name = getattr(collection, 'name', collection)
+        if collection_version(name) is not None:
+            names.append(name)
+    return sorted(names, key=collection_version)
+
+def next_version(db) -> int:
+    versions = [collection_version(name) for name in list_versions(db)]
+    pointer = read_pointer()
+    if pointer:
+        versions.append(pointer.get('version') or 0)
+    return max(versions, default=0) + 1
+
+def promote(collection_name: str, **details) -> Dict[str, Any]:
+    """
+    Make a collection the live version.
+
+    The pointer is written to a temporary file, fsynced and renamed over the
+    old one, so readers see either the old or the new pointer, never a mix.
+
+    Args:
+        collection_name: Collection to serve from now on
+        **details: Extra fields recorded in the pointer (vectors, documents, ...)
+
+    Returns:
+        The new pointer dictionary
+    """
+    pointer = {
+        'collection': collection_name,
+        'version': collection_version(collection_name),
+        **details,
+        'promoted_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    _write_pointer(pointer)
+    return pointer
+
+def publish_generation(collection_name: str, changed_at: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Announce that the live collection (and its BM25 snapshot) changed in place.
+
+    Keeps the pointer's other fields and increments `generation`; chat
+    processes reload a snapshot whose (collection, generation) differs.
+
+    Args:
+        collection_name: The live collection that was written
+        changed_at: Epoch seconds of the first change this generation covers
+
+    Returns:
+        The new pointer dictionary
+    """
+    pointer = read_pointer() or {}
+    if pointer.get('collection') != collection_name:
+        pointer = {'collection': collection_name, 'version': collection_version(collection_name)}
+    pointer['generation'] = pointer.get('generation', 0) + 1
+    pointer['changed_at'] = changed_at
+    pointer['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    _write_pointer(pointer)
+    return pointer
+
+def _write_pointer(pointer: Dict[str, Any]):
+    pointer_dir = os.path.dirname(INDEX_POINTER_PATH)
+    os.makedirs(pointer_dir, exist_ok=True)
+    tmp_path = f"{INDEX_POINTER_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(pointer, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, INDEX_POINTER_PATH)
+    # Persist the rename itself
+    dir_fd = os.open(pointer_dir, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def remove_bm25_snapshot(collection_name: str):
+    snapshot_dir = bm25_snapshot_dir(collection_name)
+    if collection_name != COLLECTION_BASE:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        return
+    # The legacy snapshot shares its directory with the versioned ones
+    if not os.path.isdir(snapshot_dir):
+        return
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        if name.startswith("bm25_index") and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in BM25_SNAPSHOT_FILES:
+            os.remove(path)
+
+def prune_versions(db, keep: int = INDEX_KEEP_VERSIONS) -> List[str]:
+    """
+    Drop versions older than the live one, keeping `keep` versions in total.
+
+    Versions newer than the live one are never touched (a rebuild may be
+    writing them).
+
+    Returns:
+        Names of the dropped collections
+    """
+    active = active_collection_name()
+    active_version = collection_version(active)
+    older = [name for name in list_versions(db)
+             if collection_version(name) < active_version]
+    dropped = older[:max(0, len(older) - (keep - 1))]
+    for name in dropped:
+        db.delete_collection(name)
+        remove_bm25_snapshot(name)
+        delete_facts_for_collection(name)
+    return dropped
+
+def print_status(db):
+    pointer = read_pointer()
+    active = active_collection_name()
+    print(f"📌 Pointer: {INDEX_POINTER_PATH}")
+    if pointer:
+        print(f"   Live: {active} (promoted {pointer.get('promoted_at', '?')})")
+    else:
+        print(f"   Live: {active} (no pointer - unversioned collection)")
+    for name in list_versions(db):
+        marker = "▶" if name == active else " "
+        try:
+            count = db.get_collection(name).count()
+        except Exception as e:
+            count = f"unreadable: {e}"
+        bm25 = "bm25 ✓" if os.path.exists(os.path.join(bm25_snapshot_dir(name), "bm25_hash.txt")) else "bm25 -"
+        print(f"   {marker} {name:<34} {count} vectors  {bm25}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Blue/green collection versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List versions and the live one")
+    rollback = sub.add_parser("promote", help="Point chat at another version (e.g. roll back)")
+    rollback.add_argument("version", type=int, help="Version number (0 = unversioned collection)")
+    prune = sub.add_parser("prune", help="Drop old versions")
+    prune.add_argument("--keep", type=int, default=INDEX_KEEP_VERSIONS,
+                       help=f"Versions to keep including the live one (default: {INDEX_KEEP_VERSIONS})")
+    args = parser.parse_args()
+
+    db = chroma_client()
+    if args.command == "status":
+        print_status(db)
+    elif args.command == "promote":
+        name = versioned_name(args.version) if args.version else COLLECTION_BASE
+        if name not in list_versions(db):
+            print(f"❌ No collection {name}")
+            sys.exit(1)
+        count = db.get_collection(name).count()
+        promote(name, vectors=count)
+        print(f"✅ {name} is live ({count} vectors)")
+    else:
+        dropped = prune_versions(db, max(1, args.keep))
+        for name in dropped:
+            print(f"   🗑️ Dropped {name}")
+        print(f"✅ Pruned {len(dropped)} version(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms (optionally labelled) are declared once per
+module and updated from any thread. The HTTP service exposes them at
+/metrics; batch scripts dump them for node_exporter's textfile collector
+with write_job_metrics().
+"""
+import os
+import math
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+METRICS_TEXTFILE_DIR = Path(os.getenv("METRICS_TEXTFILE_DIR", str(PROJECT_ROOT / "logs" / "metrics")))
+
+# Seconds; covers sub-millisecond lookups up to slow PDF conversions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _label_string(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self):
+        """[(suffix, label_values, extra_labels, value)]"""
+        raise NotImplementedError
+
+    def render(self, const_labels=()):
+        """Exposition lines; `const_labels` pairs are added to every sample unless the metric has that label"""
+        documentation = self.documentation.replace('\\', r'\\').replace('\n', r'\n')
+        lines = [f"# HELP {self.name} {documentation}", f"# TYPE {self.name} {self.kind}"]
+        const_labels = tuple((name, value) for name, value in const_labels
+                             if name not in self.label_names)
+        for suffix, values, extra, value in self._samples():
+            labels = _label_string(self.label_names, values, tuple(extra) + const_labels)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.label_names:
+            items = [((), 0)]
+        return [("", key, (), value) for key, value in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", key, (), value) for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1),
+                                             'sum': 0.0, 'count': 0}
+            state['counts'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a `with` block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']})
+                           for key, s in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state['counts']):
+                cumulative += count
+                samples.append(("_bucket", key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append(("_sum", key, (), state['sum']))
+            samples.append(("_count", key, (), state['count']))
+        return samples
+
+class MetricsRegistry:
+    """Named metric families; declaring an existing name returns the same metric"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self, const_labels=()):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(const_labels))
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path, const_labels=()):
+        """Atomically write the exposition so the collector never reads a partial file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render(const_labels))
+        os.replace(tmp_path, path)
+        return path
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def counter(name, documentation, labels=()):
+    return REGISTRY.counter(name, documentation, labels)
+
+def gauge(name, documentation, labels=()):
+    return REGISTRY.gauge(name, documentation, labels)
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.histogram(name, documentation, labels, buckets)
+
+JOB_DURATION = gauge("legal_rag_job_duration_seconds", "Wall time of the last batch run", ["job"])
+JOB_LAST_RUN = gauge("legal_rag_job_last_run_timestamp_seconds", "Unix time the last batch run ended", ["job"])
+
+def write_job_metrics(job, started_at, directory=None):
+    """
+    Record a batch run and dump the registry for the textfile collector.
+
+    Every sample gets a job="<job>" label. A script's registry also holds
+    the metrics of the pipeline modules it imports (the watcher's includes
+    ingest and index counters, label-less counters always render), so
+    without it the .prom files would repeat each other's series and
+    node_exporter would reject them.
+
+    Args:
+        job: Script name, used as label and file name (<job>.prom)
+        started_at: time.time() when the run began
+        directory: Output directory (default: METRICS_TEXTFILE_DIR)
+
+    Returns:
+        Path of the written file, or None if it could not be written
+    """
+    JOB_DURATION.set(round(time.time() - started_at, 3), job=job)
+    JOB_LAST_RUN.set(round(time.time(), 3), job=job)
+    try:
+        return REGISTRY.write_textfile(Path(directory or METRICS_TEXTFILE_DIR) / f"{job}.prom",
+                                       const_labels=(('job', job),))
+    except OSError as e:
+        print(f"⚠️  Could not write metrics: {e}")
+        return None
+
+__all__ = [
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'MetricsRegistry',
+    'REGISTRY',
+    'CONTENT_TYPE',
+    'counter',
+    'gauge',
+    'histogram',
+    'write_job_metrics'
+]
@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import signal
+import socket
+import traceback
+from typing import Callable, Dict, Optional
+
+from utils.metrics import MetricsRegistry, METRICS_TEXTFILE_DIR
+from utils.proc_memory import memory_usage, memory_available, format_bytes
+
+# --- PREFORK WORKERS ---
+# The parent loads everything read-only (models, BM25 indexes, clause texts)
+# once, then forks N workers that accept on one shared listening socket.
+# Pages the workers only read stay shared copy-on-write; each worker's own
+# cost is its USS (utils/proc_memory.py), reported periodically so the
+# number of workers per box can be sized from real numbers.
+#
+# The parent runs no threads and serves no requests: it respawns workers
+# that die, forwards SIGTERM/SIGINT, and can replace all workers with fresh
+# forks (rolling_restart) after reloading shared state.
+
+WORKER_STOP_SECONDS = float(os.getenv("WORKER_STOP_SECONDS", "30"))
+RESPAWN_DELAY_SECONDS = 1.0
+MEMORY_KINDS = ('rss', 'pss', 'uss', 'shared')
+
+def listen_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """Listening socket created before forking, so every worker accepts on it"""
+    sock = socket.create_server((host, port), backlog=backlog)
+    sock.setblocking(False)
+    return sock
+
+def describe_exit(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"exit code {os.WEXITSTATUS(status)}"
+
+class PreforkSupervisor:
+    """
+    Fork `workers` children running `run_worker(slot)` and keep them alive.
+
+        supervisor = PreforkSupervisor(4, run_worker)
+        supervisor.run(tick=check_for_new_index, tick_seconds=5)
+
+    `run_worker` runs in the child and should return when told to stop
+    (SIGTERM); the child then exits without running the parent's atexit
+    handlers.
+    """
+
+    def __init__(self, workers: int, run_worker: Callable[[int], None],
+                 memory_report_seconds: float = 60.0,
+                 stop_seconds: float = WORKER_STOP_SECONDS):
+        self.workers = workers
+        self.run_worker = run_worker
+        self.memory_report_seconds = memory_report_seconds
+        self.stop_seconds = stop_seconds
+        # pid -> slot, including workers being replaced
+        self.children: Dict[int, int] = {}
+        self.retiring = set()
+        self.stopping = False
+        # Parent-only registry, written for the textfile collector
+        self.registry = MetricsRegistry()
+        self.memory_gauge = self.registry.gauge(
+            "legal_rag_server_memory_bytes", "Memory per prefork server process", ["process", "kind"]
+        )
+        self.restarts = self.registry.counter(
+            "legal_rag_server_worker_restarts_total", "Workers respawned after dying", ["reason"]
+        )
+
+    def _spawn(self, slot: int) -> int:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self.run_worker(slot)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = slot
+        return pid
+
+    def _serving(self):
+        """(slot, pid) of the workers not being replaced"""
+        return sorted((slot, pid) for pid, slot in self.children.items() if pid not in self.retiring)
+
+    def rolling_restart(self):
+        """
+        Replace every worker with a fresh fork of the parent's current state
+        (e.g. after it loaded a new index version). Each old worker is told
+        to drain only once its replacement is forked.
+        """
+        for slot, pid in self._serving():
+            self.retiring.add(pid)
+            new_pid = self._spawn(slot)
+            print(f"   🔄 Worker {slot}: pid {pid} → {new_pid}")
+            os.kill(pid, signal.SIGTERM)
+
+    def _reap(self, block: bool = False):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            slot = self.children.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif slot is not None and not self.stopping:
+                print(f"   ⚠️  Worker {slot} (pid {pid}) died with {describe_exit(status)} - respawning")
+                self.restarts.inc(reason='signal' if os.WIFSIGNALED(status) else 'exit')
+                time.sleep(RESPAWN_DELAY_SECONDS)
+                self._spawn(slot)
+            if block:
+                return
+
+    def memory_report(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """
+        Print RSS / PSS / USS / shared per process and how many more workers
+        fit in MemAvailable at the average worker USS.
+
+        Returns:
+            {process name: usage}, or None without /proc
+        """
+        processes = [('master', os.getpid())] + [(f"worker-{slot}", pid) for slot, pid in self._serving()]
+        usage = {}
+        for name, pid in processes:
+            memory = memory_usage(pid)
+            if memory is not None:
+                usage[name] = memory
+                for kind in MEMORY_KINDS:
+                    self.memory_gauge.set(memory[kind], process=name, kind=kind)
+        if not usage:
+            return None
+
+        print(f"\n📊 Memory ({len(processes) - 1} workers; USS = private pages, "
+              f"the cost of one more worker)")
+        print(f"   {'process':<10} {'pid':>7} " + " ".join(f"{kind.upper():>10}" for kind in MEMORY_KINDS))
+        for name, pid in processes:
+            if name in usage:
+                print(f"   {name:<10} {pid:>7} " +
+                      " ".join(f"{format_bytes(usage[name][kind]):>10}" for kind in MEMORY_KINDS))
+
+        worker_uss = [memory['uss'] for name, memory in usage.items() if name != 'master']
+        total_pss = sum(memory['pss'] for memory in usage.values())
+        if worker_uss:
+            average = sum(worker_uss) // len(worker_uss)
+            available = memory_available()
+            fit = ""
+            if available:
+                fit = (f" - ~{available // max(1, average)} more fit in MemAvailable "
+                       f"({format_bytes(available)})")
+            print(f"   ➕ {format_bytes(average)} USS per worker{fit}; "
+                  f"server total (PSS) {format_bytes(total_pss)}")
+
+        try:
+            self.registry.write_textfile(METRICS_TEXTFILE_DIR / "chat_server_memory.prom")
+        except OSError as e:
+            print(f"⚠️  Could not write memory metrics: {e}")
+        return usage
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self, tick: Optional[Callable[[], None]] = None, tick_seconds: float = 5.0):
+        """Spawn the workers and supervise them until SIGTERM/SIGINT"""
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        now = time.monotonic()
+        next_tick = now + tick_seconds
+        # First report once the workers have warmed up, then periodically
+        next_report = now + min(10.0, self.memory_report_seconds)
+        try:
+            while not self.stopping:
+                self._reap()
+                now = time.monotonic()
+                if tick is not None and now >= next_tick:
+                    tick()
+                    next_tick = now + tick_seconds
+                if self.memory_report_seconds > 0 and now >= next_report:
+                    self.memory_report()
+                    next_report = now + self.memory_report_seconds
+                time.sleep(0.2)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """SIGTERM every worker, wait up to stop_seconds for them to drain, then SIGKILL"""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.stop_seconds
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.children:
+            self._reap(block=True)
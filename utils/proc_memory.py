@@ -0,0 +1,82 @@
+import os
+from typing import Dict, Optional
+
+# --- PROCESS MEMORY ---
+# Per-process memory split from /proc/<pid>/smaps_rollup (Linux >= 4.14,
+# falling back to summing /proc/<pid>/smaps), for sizing prefork workers:
+#
+#   rss     resident pages, shared ones counted in full by every process
+#   pss     resident pages, shared ones divided among the processes mapping them
+#   uss     Private_Clean + Private_Dirty: freed if the process exits, i.e.
+#           the real cost of one more worker
+#   shared  Shared_Clean + Shared_Dirty (model weights, mmapped indexes and
+#           copy-on-write pages inherited from the prefork parent)
+#
+# Values are bytes.
+
+SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Private_Clean': 'uss',
+    'Private_Dirty': 'uss',
+    'Shared_Clean': 'shared',
+    'Shared_Dirty': 'shared',
+    'Swap': 'swap',
+}
+
+def _parse_smaps(lines) -> Dict[str, int]:
+    usage = dict.fromkeys(SMAPS_FIELDS.values(), 0)
+    for line in lines:
+        key, _, rest = line.partition(':')
+        field = SMAPS_FIELDS.get(key)
+        if field is None:
+            continue
+        parts = rest.split()
+        if parts and parts[-1] == 'kB':
+            usage[field] += int(parts[0]) * 1024
+    return usage
+
+def memory_usage(pid='self') -> Optional[Dict[str, int]]:
+    """
+    RSS / PSS / USS / shared / swap of one process.
+
+    Args:
+        pid: Process id, or 'self'
+
+    Returns:
+        Dictionary of byte counts, or None if the process is gone or /proc
+        is unavailable (non-Linux)
+    """
+    for name in ('smaps_rollup', 'smaps'):
+        try:
+            with open(f"/proc/{pid}/{name}", 'r') as f:
+                return _parse_smaps(f)
+        except FileNotFoundError:
+            if not os.path.exists(f"/proc/{pid}"):
+                return None
+        except (PermissionError, ProcessLookupError):
+            return None
+    return None
+
+def memory_available() -> Optional[int]:
+    """MemAvailable from /proc/meminfo in bytes (None if unavailable)"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return "?"
+    if abs(value) < 1024:
+        return f"{value} B"
+    for unit in ('KB', 'MB'):
+        value /= 1024
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+    value /= 1024
+    return f"{value:.2f} GB"
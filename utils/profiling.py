@@ -0,0 +1,258 @@
+"""
+Per-stage profiling for the pipeline entry points (--profile).
+
+Each named stage is profiled while it runs:
+- sampling (default): a background thread samples the stage's thread stack
+  every PROFILE_INTERVAL_MS and writes folded stacks (<stage>.folded) for
+  flamegraph.pl / speedscope / inferno
+- cprofile: deterministic cProfile as well (<stage>.prof for snakeviz /
+  pstats); folded samples are still written
+- tracemalloc peak memory per stage plus the allocation sites that grew
+  during the worst call
+Reports land in logs/profiles/<run id>/<script>/ together with a top-N
+hotspot summary (summary.txt, summary.json).
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PROFILES_DIR = PROJECT_ROOT / "logs" / "profiles"
+PROFILE_MODES = ('sampling', 'cprofile')
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "1") != "0"
+TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+def add_profile_argument(parser):
+    """Standard --profile [sampling|cprofile] option"""
+    parser.add_argument(
+        "--profile", nargs="?", const="sampling", default=None, choices=PROFILE_MODES,
+        help="Profile each stage (sampling by default, or cprofile) into logs/profiles/"
+    )
+
+def profile_run_id():
+    """Shared by rag_run.py and the phases it launches (PROFILE_RUN_ID)"""
+    run_id = os.getenv("PROFILE_RUN_ID")
+    if not run_id:
+        run_id = datetime.now().strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}"
+        os.environ["PROFILE_RUN_ID"] = run_id
+    return run_id
+
+def _frame_label(code):
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+class StageProfile:
+    def __init__(self, name, mode):
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.peak_bytes = 0
+        self.top_allocations = []
+        self.samples = Counter()
+        self.profile = cProfile.Profile() if mode == 'cprofile' else None
+
+class _Sampler(threading.Thread):
+    """Samples the stacks of threads currently inside a stage"""
+
+    def __init__(self, profiler, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            active = dict(self.profiler._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stage in active.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stage.samples[";".join(reversed(stack))] += 1
+
+class Profiler:
+    """
+    Usage:
+        profiler = Profiler("index_02", args.profile)
+        with profiler.stage("split"):
+            ...
+        profiler.write_reports()
+
+    Disabled (mode None) stages cost a single `if`.
+    """
+
+    def __init__(self, script, mode=None):
+        self.script = script
+        self.mode = mode
+        self.enabled = mode in PROFILE_MODES
+        self.stages = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        if self.enabled:
+            if PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._sampler = _Sampler(self, PROFILE_INTERVAL_MS / 1000.0)
+            self._sampler.start()
+            print(f"🔬 Profiling enabled ({mode}, {PROFILE_INTERVAL_MS:g} ms samples"
+                  f"{', tracemalloc' if PROFILE_TRACEMALLOC else ''})")
+
+    @contextmanager
+    def stage(self, name):
+        thread_id = threading.get_ident()
+        # Nested stages are attributed to the outermost one
+        if not self.enabled or thread_id in self._active:
+            yield
+            return
+
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageProfile(name, self.mode)
+
+        tracking_memory = tracemalloc.is_tracing()
+        if tracking_memory:
+            start_snapshot = self._snapshot()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        self._active[thread_id] = stage
+        if stage.profile is not None:
+            stage.profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if stage.profile is not None:
+                stage.profile.disable()
+            self._active.pop(thread_id, None)
+            stage.calls += 1
+            stage.wall_seconds += elapsed
+
+            if tracking_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                if peak > stage.peak_bytes:
+                    stage.peak_bytes = peak
+                    # Where the worst call grew memory (still allocated at its end)
+                    growth = self._snapshot().compare_to(start_snapshot, 'lineno')
+                    stage.top_allocations = [
+                        {'site': str(stat.traceback), 'size_bytes': stat.size_diff,
+                         'count': stat.count_diff}
+                        for stat in sorted(growth, key=lambda stat: stat.size_diff, reverse=True)[:10]
+                        if stat.size_diff > 0
+                    ]
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, threading.__file__),
+        ])
+
+    @staticmethod
+    def _sample_hotspots(samples, top_n):
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_counts[frame] += count
+        total = sum(samples.values()) or 1
+        as_rows = lambda counts: [
+            {'function': fn, 'samples': n, 'percent': round(100.0 * n / total, 2)}
+            for fn, n in counts.most_common(top_n)
+        ]
+        return as_rows(self_counts), as_rows(inclusive_counts)
+
+    @staticmethod
+    def _cprofile_hotspots(profile, top_n):
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f"{function} ({os.path.basename(filename)}:{line})",
+                'calls': ncalls,
+                'self_seconds': round(tottime, 6),
+                'cumulative_seconds': round(cumtime, 6),
+            })
+        by_self = sorted(rows, key=lambda r: r['self_seconds'], reverse=True)[:top_n]
+        by_cumulative = sorted(rows, key=lambda r: r['cumulative_seconds'], reverse=True)[:top_n]
+        return by_self, by_cumulative
+
+    def write_reports(self, top_n=TOP_N):
+        """Write folded stacks, .prof files and the hotspot summary. Returns the directory."""
+        if not self.enabled:
+            return None
+        self._sampler.stopped.set()
+        self._sampler.join(timeout=1)
+
+        output_dir = PROFILES_DIR / profile_run_id() / self.script
+        output_dir.mkdir(parents=True, exist_ok=True)
+        summary = {'script': self.script, 'mode': self.mode,
+                   'interval_ms': PROFILE_INTERVAL_MS, 'stages': {}}
+        lines = [f"PROFILE: {self.script} ({self.mode})", "=" * 78]
+
+        for name, stage in self.stages.items():
+            file_stem = "".join(c if c.isalnum() or c in '-_' else '_' for c in name)
+            with open(output_dir / f"{file_stem}.folded", 'w', encoding='utf-8') as f:
+                for stack, count in stage.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+
+            stage_summary = {
+                'calls': stage.calls,
+                'wall_seconds': round(stage.wall_seconds, 4),
+                'samples': sum(stage.samples.values()),
+                'peak_memory_bytes': stage.peak_bytes,
+                'top_allocations': stage.top_allocations,
+            }
+            stage_summary['self'], stage_summary['inclusive'] = self._sample_hotspots(stage.samples, top_n)
+            if stage.profile is not None:
+                stage.profile.dump_stats(str(output_dir / f"{file_stem}.prof"))
+                stage_summary['cprofile_self'], stage_summary['cprofile_cumulative'] = \
+                    self._cprofile_hotspots(stage.profile, top_n)
+            summary['stages'][name] = stage_summary
+
+            lines.append(f"\n■ {name}: {stage.calls} call(s), {stage.wall_seconds:.3f}s wall, "
+                         f"{stage_summary['samples']} samples, peak +{stage.peak_bytes / 1e6:.1f} MB")
+            hotspots = stage_summary.get('cprofile_self') or stage_summary['self']
+            for row in hotspots[:top_n]:
+                if 'self_seconds' in row:
+                    lines.append(f"   {row['self_seconds']:>9.4f}s self {row['cumulative_seconds']:>9.4f}s cum "
+                                 f"{row['calls']:>8}x  {row['function']}")
+                else:
+                    lines.append(f"   {row['percent']:>6.2f}% ({row['samples']:>5})  {row['function']}")
+            for allocation in [a for a in stage.top_allocations if a['size_bytes'] >= 1024][:5]:
+                lines.append(f"   🧠 {allocation['size_bytes'] / 1e6:>8.2f} MB  {allocation['site']}")
+
+        with open(output_dir / "summary.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        with open(output_dir / "summary.txt", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+        print(f"\n🔬 Profile written to {output_dir}")
+        return output_dir
+
+__all__ = [
+    'Profiler',
+    'add_profile_argument',
+    'profile_run_id',
+    'PROFILE_MODES'
+]
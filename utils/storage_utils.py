@@ -2,15 +2,30 @@ import os
 import json
 import sqlite3
 import hashlib
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from utils.docling_elements import ELEMENTS_FORMAT, ELEMENTS_VERSION
+from utils.doc_cache import (
+    cache_hash, cache_path_for, find_cache_file, is_cache_file,
+    migrate_legacy, read_cache, write_cache
+)
+
 # --- ABSOLUTE PATH CONFIGURATION ---
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DATA_DIR = os.path.join(PROJECT_ROOT, "Dataset")
 CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
 CHROMA_DB_PATH = os.path.join(PROJECT_ROOT, "chroma_db")
 TRACKER_DB = os.path.join(PROJECT_ROOT, "ingestion_tracker.db")
+HNSW_CONFIG_PATH = os.path.join(PROJECT_ROOT, "hnsw_config.json")
+FACTS_DB = os.path.join(PROJECT_ROOT, "facts.db")
+# Caches already indexed (kept so index_02 --rebuild need not re-convert)
+CACHE_ARCHIVE_DIR = os.path.join(CACHE_DIR, "indexed")
+BM25_CACHE_DIR = os.path.join(CACHE_DIR, "bm25_cache")
+# Which versioned collection is live (utils/index_versions.py)
+INDEX_POINTER_PATH = os.path.join(CHROMA_DB_PATH, "active_index.json")
 
 def ensure_environment():
     """Create all necessary directories if they don't exist."""
@@ -46,33 +61,259 @@ def calculate_file_hash(file_path: str, chunk_size: int = 65536) -> str:
             sha256_hash.update(chunk)
     return sha256_hash.hexdigest()
 
+# --- INGESTION TRACKER ---
+# One long-lived connection per process (reopened after fork) in WAL mode, so
+# parallel ingest workers read while another writes. register_in_db calls
+# made inside TrackerStore.batch() are buffered and written in one short
+# transaction instead of one commit per file.
+
+TRACKER_BUSY_TIMEOUT_MS = int(os.getenv("TRACKER_BUSY_TIMEOUT_MS", "30000"))
+TRACKER_BATCH_SIZE = int(os.getenv("TRACKER_BATCH_SIZE", "100"))
+# WAL needs shared memory between processes, i.e. one host; set DELETE when
+# workers on several hosts share the tracker over a network filesystem
+TRACKER_JOURNAL_MODE = os.getenv("TRACKER_JOURNAL_MODE", "WAL")
+
+_TRACKER_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS parsed_files (
+        file_hash TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        json_path TEXT NOT NULL,
+        parsing_parameters TEXT DEFAULT 'markdown',
+        processed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        file_size INTEGER,
+        page_count INTEGER DEFAULT 0
+    )
+    """,
+    # Index for faster lookups
+    """
+    CREATE INDEX IF NOT EXISTS idx_file_hash
+    ON parsed_files (file_hash)
+    """,
+)
+
+# Constant SQL strings, so sqlite3's per-connection statement cache reuses
+# the prepared statements for the life of the connection
+_SQL_IS_PROCESSED = "SELECT 1 FROM parsed_files WHERE file_hash = ?"
+_SQL_REGISTER = """
+    INSERT OR REPLACE INTO parsed_files
+    (file_hash, file_name, json_path, parsing_parameters, processed_date, file_size, page_count)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+"""
+_SQL_ALL_HASHES = "SELECT file_hash FROM parsed_files"
+_SQL_FILES = "SELECT file_hash, file_name FROM parsed_files"
+_SQL_HASHES_FOR_FILE = "SELECT file_hash FROM parsed_files WHERE file_name = ?"
+_SQL_FILE_RECORD = "SELECT file_name, file_size FROM parsed_files WHERE file_hash = ?"
+_SQL_RENAME = "UPDATE parsed_files SET file_name = ? WHERE file_hash = ?"
+_SQL_UNREGISTER = "DELETE FROM parsed_files WHERE file_hash = ?"
+_SQL_STATS = "SELECT COUNT(*), SUM(page_count), SUM(file_size) FROM parsed_files"
+_SQL_LATEST = "SELECT file_name, processed_date FROM parsed_files ORDER BY processed_date DESC LIMIT 1"
+
+class TrackerStore:
+    """
+    Ingestion tracker (parsed_files table) over one WAL-mode connection.
+
+    The database is opened and its schema created on first use; a forked
+    child opens its own connection instead of sharing the parent's.
+
+        tracker = get_tracker()
+        with tracker.batch():
+            for ...:
+                tracker.register(file_hash, file_name, cache_path)
+    """
+
+    def __init__(self, path: str = TRACKER_DB, batch_size: int = TRACKER_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=TRACKER_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,  # explicit transactions only
+            check_same_thread=False,
+            cached_statements=64
+        )
+        conn.execute(f"PRAGMA journal_mode={TRACKER_JOURNAL_MODE}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={TRACKER_BUSY_TIMEOUT_MS}")
+        for statement in _TRACKER_SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """This process's connection (opened on first use and after fork)"""
+        if self._conn is None or self._pid != os.getpid():
+            self._forget()
+            self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _forget(self):
+        """Drop per-process state; a connection inherited across fork is never used or closed"""
+        self._conn = None
+        self._pid = None
+        self._batch_depth = 0
+        self._pending = {}
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+        self._forget()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self.flush()
+                self._conn.close()
+            self._forget()
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer register() calls and write them in one transaction on exit.
+
+        Buffered rows are flushed even if the block raises: each one
+        describes a cache file that is already on disk.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Write transaction on this process's connection (BEGIN IMMEDIATE takes
+        the write lock up front, so read-then-write sequences cannot race).
+
+        Yields:
+            The sqlite3 connection; committed on exit, rolled back on error
+        """
+        with self._lock:
+            conn = self.connection
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def flush(self) -> int:
+        """Write buffered registrations in one transaction; returns rows written"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            rows = list(self._pending.values())
+            with self.transaction() as conn:
+                conn.executemany(_SQL_REGISTER, rows)
+            self._pending = {}
+            return len(rows)
+
+    def is_processed(self, file_hash: str) -> bool:
+        with self._lock:
+            if file_hash in self._pending:
+                return True
+            return self.connection.execute(_SQL_IS_PROCESSED, (file_hash,)).fetchone() is not None
+
+    def register(self, file_hash: str, file_name: str, cache_path: str,
+                 parsing_parameters: str = "markdown", file_size: Optional[int] = None,
+                 page_count: int = 0):
+        row = (file_hash, file_name, cache_path, parsing_parameters, file_size, page_count)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._forget()
+            self._pending[file_hash] = row
+            if self._batch_depth == 0 or len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def processed_hashes(self) -> List[str]:
+        with self._lock:
+            self.flush()
+            return [row[0] for row in self.connection.execute(_SQL_ALL_HASHES)]
+
+    def processed_files(self) -> Dict[str, str]:
+        """file_hash -> file_name for every tracked file"""
+        with self._lock:
+            self.flush()
+            return dict(self.connection.execute(_SQL_FILES).fetchall())
+
+    def hashes_for_file(self, file_name: str) -> List[str]:
+        """Hashes registered under a file name (several if it was rewritten)"""
+        with self._lock:
+            self.flush()
+            return [row[0] for row in self.connection.execute(_SQL_HASHES_FOR_FILE, (file_name,))]
+
+    def file_record(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Tracked file name and size of one content hash"""
+        with self._lock:
+            self.flush()
+            row = self.connection.execute(_SQL_FILE_RECORD, (file_hash,)).fetchone()
+        return {'file_name': row[0], 'file_size': row[1]} if row else None
+
+    def rename(self, file_hash: str, file_name: str) -> bool:
+        with self._lock:
+            self.flush()
+            with self.transaction() as conn:
+                return conn.execute(_SQL_RENAME, (file_name, file_hash)).rowcount > 0
+
+    def unregister(self, file_hash: str) -> bool:
+        with self._lock:
+            self._pending.pop(file_hash, None)
+            with self.transaction() as conn:
+                return conn.execute(_SQL_UNREGISTER, (file_hash,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self.flush()
+            total_files, total_pages, total_size_bytes = self.connection.execute(_SQL_STATS).fetchone()
+            latest = self.connection.execute(_SQL_LATEST).fetchone()
+        return {
+            "total_files": total_files,
+            "total_pages": total_pages or 0,
+            "total_size_mb": round((total_size_bytes or 0) / (1024 * 1024), 2),
+            "latest_file": latest[0] if latest else None,
+            "latest_date": latest[1] if latest else None
+        }
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker() -> TrackerStore:
+    """Process-wide TrackerStore for TRACKER_DB (nothing is opened until first use)"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TrackerStore(TRACKER_DB)
+        return _tracker
+
+def _tracker_after_fork():
+    # The parent's lock may be held by a thread that does not exist in the child
+    global _tracker_lock
+    _tracker_lock = threading.Lock()
+    if _tracker is not None:
+        _tracker._after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tracker_after_fork)
+
 def init_tracker_db():
     """
     Initialize SQLite database for tracking processed files.
     Creates table if it doesn't exist.
     """
-    conn = sqlite3.connect(TRACKER_DB)
-    c = conn.cursor()
-    c.execute(''' 
-        CREATE TABLE IF NOT EXISTS parsed_files (
-            file_hash TEXT PRIMARY KEY,
-            file_name TEXT NOT NULL,
-            json_path TEXT NOT NULL,
-            parsing_parameters TEXT DEFAULT 'markdown',
-            processed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            file_size INTEGER,
-            page_count INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # Create index for faster lookups
-    c.execute('''
-        CREATE INDEX IF NOT EXISTS idx_file_hash 
-        ON parsed_files (file_hash)
-    ''')
-    
-    conn.commit()
-    conn.close()
+    get_tracker().connection  # opens the database and creates the schema
     print(f"✅ Tracker database initialized at: {TRACKER_DB}")
 
 def is_file_processed(file_hash: str) -> bool:
@@ -83,22 +324,13 @@ def is_file_processed(file_hash: str) -> bool:
         file_hash: SHA-256 hash of the file
     
     Returns:
-        True if file exists in database, False otherwise
+        True if file exists in database (or is buffered in a batch), False otherwise
     """
-    if not os.path.exists(TRACKER_DB):
-        init_tracker_db()
-        return False
-    
-    conn = sqlite3.connect(TRACKER_DB)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM parsed_files WHERE file_hash = ?", (file_hash,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    return get_tracker().is_processed(file_hash)
 
 def save_to_cache(file_hash: str, llama_documents: List[Any], metadata: Optional[Dict] = None) -> str:
     """
-    Save processed documents to JSON cache.
+    Save processed documents to the compressed cache (utils/doc_cache.py).
     
     Args:
         file_hash: SHA-256 hash of the source file
@@ -110,9 +342,6 @@ def save_to_cache(file_hash: str, llama_documents: List[Any], metadata: Optional
     """
     ensure_environment()
     
-    cache_file_name = f"{file_hash}.json"
-    full_cache_path = os.path.join(CACHE_DIR, cache_file_name)
-    
     # Convert documents to serializable format
     data_to_save = []
     for doc in llama_documents:
@@ -130,12 +359,40 @@ def save_to_cache(file_hash: str, llama_documents: List[Any], metadata: Optional
     if metadata:
         data_to_save[0]['metadata'].update(metadata)
     
-    with open(full_cache_path, "w", encoding='utf-8') as f:
-        json.dump(data_to_save, f, indent=2, ensure_ascii=False)
+    full_cache_path = write_cache(cache_path_for(CACHE_DIR, file_hash), data_to_save)
     
     print(f"   💾 Cached: {os.path.basename(full_cache_path)}")
     return full_cache_path
 
+def save_elements_to_cache(file_hash: str, elements: List[Dict[str, Any]], metadata: Dict) -> str:
+    """
+    Save compact Docling elements (utils/docling_elements.py) to the compressed cache.
+    
+    Args:
+        file_hash: SHA-256 hash of the source file
+        elements: Element dicts from compact_elements()
+        metadata: Document metadata (filename, source, ...)
+    
+    Returns:
+        Path to the saved cache file
+    """
+    ensure_environment()
+    
+    data_to_save = [{
+        'format': ELEMENTS_FORMAT,
+        'version': ELEMENTS_VERSION,
+        'elements': elements,
+        'metadata': {
+            **metadata,
+            'file_hash': file_hash,
+            'cached_date': datetime.now().isoformat()
+        }
+    }]
+    full_cache_path = write_cache(cache_path_for(CACHE_DIR, file_hash), data_to_save)
+    
+    print(f"   💾 Cached {len(elements)} elements: {os.path.basename(full_cache_path)}")
+    return full_cache_path
+
 def register_in_db(
     file_hash: str, 
     file_name: str, 
@@ -150,25 +407,68 @@ def register_in_db(
     Args:
         file_hash: SHA-256 hash of the file
         file_name: Original filename
-        cache_path: Path to the cached JSON file
+        cache_path: Path to the cache file
         parsing_parameters: Method used for parsing
         file_size: Size of the original file in bytes
         page_count: Number of pages in the document
+    
+    Inside `get_tracker().batch()` the row is buffered and committed with
+    the rest of the batch.
     """
-    if not os.path.exists(TRACKER_DB):
-        init_tracker_db()
-    
-    conn = sqlite3.connect(TRACKER_DB)
-    c = conn.cursor()
-    c.execute("""
-        INSERT OR REPLACE INTO parsed_files 
-        (file_hash, file_name, json_path, parsing_parameters, processed_date, file_size, page_count)
-        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
-    """, (file_hash, file_name, cache_path, parsing_parameters, file_size, page_count))
-    conn.commit()
-    conn.close()
+    get_tracker().register(file_hash, file_name, cache_path, parsing_parameters,
+                           file_size=file_size, page_count=page_count)
     print(f"   🗄️ Registered in tracker: {file_name}")
 
+def unregister_from_db(file_hash: str) -> bool:
+    """
+    Remove a file from the tracking database (its PDF was deleted or replaced).
+    
+    Args:
+        file_hash: SHA-256 hash of the file
+    
+    Returns:
+        True if a row was removed
+    """
+    return get_tracker().unregister(file_hash)
+
+def rename_in_db(file_hash: str, file_name: str) -> bool:
+    """
+    Track already indexed content under another file name (the PDF was
+    renamed, or the surviving copy of a duplicate is now the source).
+    
+    Args:
+        file_hash: SHA-256 hash of the file
+        file_name: New original filename
+    
+    Returns:
+        True if the hash was tracked
+    """
+    return get_tracker().rename(file_hash, file_name)
+
+def get_file_record(file_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Tracked name and size of a content hash.
+    
+    Args:
+        file_hash: SHA-256 hash of the file
+    
+    Returns:
+        {'file_name', 'file_size'}, or None if the hash is not tracked
+    """
+    return get_tracker().file_record(file_hash)
+
+def get_hashes_for_file(file_name: str) -> List[str]:
+    """
+    Hashes registered for a file name.
+    
+    Args:
+        file_name: Original filename
+    
+    Returns:
+        List of file hash strings (empty if never processed)
+    """
+    return get_tracker().hashes_for_file(file_name)
+
 def get_cached_path(file_hash: str) -> Optional[str]:
     """
     Get the cache file path for a given file hash.
@@ -177,14 +477,42 @@ def get_cached_path(file_hash: str) -> Optional[str]:
         file_hash: SHA-256 hash of the file
     
     Returns:
-        Path to cache file if exists, None otherwise
+        Path to cache file (compressed or legacy .json) if exists, None otherwise
     """
-    cache_path = os.path.join(CACHE_DIR, f"{file_hash}.json")
-    return cache_path if os.path.exists(cache_path) else None
+    return find_cache_file(CACHE_DIR, file_hash)
+
+def get_archived_path(file_hash: str) -> Optional[str]:
+    """
+    Get the archived cache of an already indexed file.
+    
+    Args:
+        file_hash: SHA-256 hash of the file
+    
+    Returns:
+        Path inside CACHE_ARCHIVE_DIR if it exists, None otherwise
+    """
+    if not os.path.isdir(CACHE_ARCHIVE_DIR):
+        return None
+    return find_cache_file(CACHE_ARCHIVE_DIR, file_hash)
+
+def archive_cache_file(cache_path: str) -> str:
+    """
+    Move an indexed cache file into CACHE_ARCHIVE_DIR.
+    
+    Args:
+        cache_path: Cache file inside CACHE_DIR
+    
+    Returns:
+        Path of the archived file
+    """
+    os.makedirs(CACHE_ARCHIVE_DIR, exist_ok=True)
+    archived_path = os.path.join(CACHE_ARCHIVE_DIR, os.path.basename(cache_path))
+    os.replace(cache_path, archived_path)
+    return archived_path
 
 def load_from_cache(file_hash: str) -> Optional[List[Dict]]:
     """
-    Load cached documents from JSON file.
+    Load cached documents, migrating a legacy .json cache on first read.
     
     Args:
         file_hash: SHA-256 hash of the source file
@@ -196,8 +524,7 @@ def load_from_cache(file_hash: str) -> Optional[List[Dict]]:
     if not cache_path:
         return None
     
-    with open(cache_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_cache(migrate_legacy(cache_path))
 
 def get_all_processed_hashes() -> List[str]:
     """
@@ -206,16 +533,7 @@ def get_all_processed_hashes() -> List[str]:
     Returns:
         List of file hash strings
     """
-    if not os.path.exists(TRACKER_DB):
-        init_tracker_db()
-        return []
-    
-    conn = sqlite3.connect(TRACKER_DB)
-    c = conn.cursor()
-    c.execute("SELECT file_hash FROM parsed_files")
-    results = [row[0] for row in c.fetchall()]
-    conn.close()
-    return results
+    return get_tracker().processed_hashes()
 
 def cleanup_cache(keep_hashes: Optional[List[str]] = None):
     """
@@ -231,16 +549,19 @@ def cleanup_cache(keep_hashes: Optional[List[str]] = None):
     if keep_hashes:
         db_hashes.update(keep_hashes)
     
-    # Check all cache files
+    # Check all cache files (pending and archived)
     removed = 0
-    for filename in os.listdir(CACHE_DIR):
-        if filename.endswith('.json'):
-            file_hash = filename[:-5]  # Remove .json
-            if file_hash not in db_hashes:
-                file_path = os.path.join(CACHE_DIR, filename)
-                os.remove(file_path)
-                removed += 1
-                print(f"   🗑️ Removed orphaned cache: {filename}")
+    for cache_dir in (CACHE_DIR, CACHE_ARCHIVE_DIR):
+        if not os.path.isdir(cache_dir):
+            continue
+        for filename in os.listdir(cache_dir):
+            if is_cache_file(filename):
+                file_hash = cache_hash(filename)
+                if file_hash not in db_hashes:
+                    file_path = os.path.join(cache_dir, filename)
+                    os.remove(file_path)
+                    removed += 1
+                    print(f"   🗑️ Removed orphaned cache: {filename}")
     
     if removed > 0:
         print(f"   ✅ Cleaned {removed} orphaned cache files")
@@ -254,56 +575,53 @@ def get_parsing_stats() -> Dict[str, Any]:
     Returns:
         Dictionary with statistics
     """
-    if not os.path.exists(TRACKER_DB):
-        init_tracker_db()
-        return {"total_files": 0, "total_pages": 0, "total_size_mb": 0}
-    
-    conn = sqlite3.connect(TRACKER_DB)
-    c = conn.cursor()
-    
-    # Total files
-    c.execute("SELECT COUNT(*) FROM parsed_files")
-    total_files = c.fetchone()[0]
-    
-    # Total pages
-    c.execute("SELECT SUM(page_count) FROM parsed_files")
-    total_pages = c.fetchone()[0] or 0
-    
-    # Total size
-    c.execute("SELECT SUM(file_size) FROM parsed_files")
-    total_size_bytes = c.fetchone()[0] or 0
-    total_size_mb = total_size_bytes / (1024 * 1024)
+    return get_tracker().stats()
+
+def load_hnsw_config() -> Dict[str, Any]:
+    """
+    Load tuned HNSW collection metadata written by pipeline/tune_hnsw.py.
     
-    # Most recent file
-    c.execute("SELECT file_name, processed_date FROM parsed_files ORDER BY processed_date DESC LIMIT 1")
-    latest = c.fetchone()
+    Returns:
+        Dictionary of 'hnsw:*' metadata keys, empty if no config exists
+    """
+    if not os.path.exists(HNSW_CONFIG_PATH):
+        return {}
     
-    conn.close()
+    try:
+        with open(HNSW_CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"   ⚠️ Ignoring unreadable HNSW config: {e}")
+        return {}
     
     return {
-        "total_files": total_files,
-        "total_pages": total_pages,
-        "total_size_mb": round(total_size_mb, 2),
-        "latest_file": latest[0] if latest else None,
-        "latest_date": latest[1] if latest else None
+        key: value
+        for key, value in config.get('collection_metadata', {}).items()
+        if key.startswith('hnsw:')
     }
 
-# Initialize everything when module is imported
-ensure_environment()
-init_tracker_db()
-
 # Export commonly used functions
 __all__ = [
     'PROJECT_ROOT', 'DATA_DIR', 'CACHE_DIR', 'CHROMA_DB_PATH', 'TRACKER_DB',
+    'HNSW_CONFIG_PATH', 'FACTS_DB', 'CACHE_ARCHIVE_DIR', 'BM25_CACHE_DIR', 'INDEX_POINTER_PATH',
     'ensure_environment',
     'calculate_file_hash',
     'init_tracker_db',
+    'TrackerStore',
+    'get_tracker',
     'is_file_processed',
     'save_to_cache',
     'register_in_db',
+    'unregister_from_db',
+    'rename_in_db',
+    'get_file_record',
+    'get_hashes_for_file',
     'get_cached_path',
+    'get_archived_path',
+    'archive_cache_file',
     'load_from_cache',
     'get_all_processed_hashes',
     'cleanup_cache',
-    'get_parsing_stats'
+    'get_parsing_stats',
+    'load_hnsw_config'
 ]
\ No newline at end of file
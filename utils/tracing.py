@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Lightweight per-query stage tracing.
+
+A Trace collects named spans (duration + attributes such as candidate
+counts, token counts and cache hits) for one query and is written as one
+JSON line to a rotating trace file (logs/traces.jsonl by default). Several
+processes (prefork server workers, batch_query, chat) can share the file:
+rotation is coordinated through an flock on traces.jsonl.lock.
+
+    python utils/tracing.py summary [--last N] [--name query]
+
+prints latency percentiles and histograms per span.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+LOGS_DIR = PROJECT_ROOT / "logs"
+TRACE_FILE = Path(os.getenv("TRACE_FILE", str(LOGS_DIR / "traces.jsonl")))
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") != "0"
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+
+# Histogram bucket upper bounds (ms)
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+_logger = None
+_logger_lock = threading.Lock()
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler for a file several processes append to.
+
+    Each record is written under an exclusive flock on `<file>.lock`; the
+    rollover decision uses the file's real size on disk, and a process
+    whose file was rotated by another one reopens the new file instead of
+    appending to (and later rotating again) the renamed backup.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding=None):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount,
+                         encoding=encoding, delay=True)
+        self.lock_path = f"{self.baseFilename}.lock"
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = None
+
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        try:
+            size = os.stat(self.baseFilename).st_size
+        except FileNotFoundError:
+            return False
+        return size > 0 and size + len(self.format(record)) + 1 > self.maxBytes
+
+    def emit(self, record):
+        try:
+            # Opened per record: an flock on a descriptor inherited across
+            # fork() would be shared with the parent instead of excluding it
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._reopen_if_rotated()
+                    super().emit(record)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+def _trace_logger():
+    """Logger writing bare JSON lines to the rotating trace file (created on first use)"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            handler = SharedRotatingFileHandler(
+                TRACE_FILE, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger('legal_rag.trace')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+class Span:
+    def __init__(self, name, parent, start_ms, attrs):
+        self.name = name
+        self.parent = parent
+        self.start_ms = start_ms
+        self.duration_ms = 0.0
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        record = {'name': self.name, 'start_ms': self.start_ms, 'duration_ms': self.duration_ms}
+        if self.parent:
+            record['parent'] = self.parent
+        if self.attrs:
+            record['attrs'] = self.attrs
+        return record
+
+class Trace:
+    """
+    Spans of one query. A query moves between threads but runs one stage
+    at a time, so spans nest through a simple stack.
+    """
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._stack = []
+
+    def _offset_ms(self):
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a stage; the yielded Span takes extra attributes via .set()"""
+        span = Span(name, self._stack[-1].name if self._stack else None, self._offset_ms(), attrs)
+        self._stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            self._stack.pop()
+            self.spans.append(span)
+
+    def add_span(self, name, duration_ms, **attrs):
+        """Record a stage timed elsewhere (e.g. LLM queue wait from the scheduler)"""
+        span = Span(name, self._stack[-1].name if self._stack else None,
+                    round(self._offset_ms() - (duration_ms or 0.0), 3), attrs)
+        span.duration_ms = round(duration_ms or 0.0, 3)
+        self.spans.append(span)
+        return span
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def stage_ms(self):
+        """Total milliseconds per span name, e.g. {'embed_ms': 12.3, 'llm_ms': 840.0}"""
+        totals = {}
+        for span in self.spans:
+            key = f"{span.name}_ms"
+            totals[key] = round(totals.get(key, 0.0) + span.duration_ms, 3)
+        return totals
+
+    def busy_ms(self):
+        """Time spent inside top-level spans (excludes waiting between stages)"""
+        return round(sum(span.duration_ms for span in self.spans if span.parent is None), 3)
+
+    def finish(self, status='ok', **attrs):
+        """Write the trace to the trace file. Returns the record."""
+        self.attrs.update(attrs)
+        record = {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'timestamp': round(self.started, 3),
+            'duration_ms': self._offset_ms(),
+            'status': status,
+            'attrs': self.attrs,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+        if TRACE_ENABLED:
+            try:
+                _trace_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+            except OSError:
+                pass
+        return record
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+class _NullTrace:
+    """Stand-in when the caller does not trace: spans cost nothing"""
+    _span = _NullSpan()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        yield self._span
+
+    def add_span(self, name, duration_ms, **attrs):
+        return self._span
+
+    def set(self, **attrs):
+        pass
+
+NULL_TRACE = _NullTrace()
+
+def start_trace(name, **attrs):
+    return Trace(name, **attrs)
+
+# --- SUMMARY COMMAND ---
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def read_traces(path=TRACE_FILE):
+    """Traces from the current file and its rotated backups, oldest first"""
+    path = Path(path)
+    files = [Path(f"{path}.{i}") for i in range(TRACE_BACKUPS, 0, -1)] + [path]
+    for file in files:
+        if not file.exists():
+            continue
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def histogram(values, width=40):
+    """Text histogram lines over HISTOGRAM_BUCKETS"""
+    counts = [0] * len(HISTOGRAM_BUCKETS)
+    for value in values:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= bound:
+                counts[i] += 1
+                break
+    peak = max(counts) or 1
+    lines = []
+    lower = 0
+    for bound, count in zip(HISTOGRAM_BUCKETS, counts):
+        label = f"> {lower:g}" if bound == float('inf') else f"≤ {bound:g}"
+        if count:
+            lines.append(f"      {label:>9} ms │{'█' * max(1, round(count / peak * width)):<{width}} {count}")
+        lower = bound
+    return lines
+
+def summarize_traces(traces):
+    """{span name: sorted durations} plus the whole-trace durations under '(total)'"""
+    durations = {'(total)': []}
+    for trace in traces:
+        durations['(total)'].append(trace.get('duration_ms', 0.0))
+        for span in trace.get('spans', []):
+            durations.setdefault(span['name'], []).append(span['duration_ms'])
+    return {name: sorted(values) for name, values in durations.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="Latency percentiles + histograms per span")
+    summary.add_argument("--file", default=str(TRACE_FILE))
+    summary.add_argument("--name", default=None, help="Only traces with this name (e.g. query)")
+    summary.add_argument("--last", type=int, default=None, help="Only the N most recent traces")
+    summary.add_argument("--no-histograms", action="store_true")
+    args = parser.parse_args()
+
+    traces = [t for t in read_traces(args.file) if args.name is None or t.get('name') == args.name]
+    if args.last:
+        traces = traces[-args.last:]
+    if not traces:
+        print(f"⚠️  No traces in {args.file}")
+        return 1
+
+    statuses = {}
+    for trace in traces:
+        statuses[trace.get('status')] = statuses.get(trace.get('status'), 0) + 1
+    print("=" * 70)
+    print(f"📈 {len(traces)} trace(s) from {args.file}")
+    print("   " + " | ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    print("=" * 70)
+    print(f"{'span':<16}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+
+    durations = summarize_traces(traces)
+    for name, values in durations.items():
+        print(f"{name:<16}{len(values):>7}{percentile(values, 50):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}{values[-1]:>10.1f}")
+        if not args.no_histograms:
+            for line in histogram(values):
+                print(line)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from typing import Dict, Any, Optional
+
+from utils.storage_utils import get_tracker
+
+# --- WORK QUEUE ---
+# Lease-based queue in the tracker database, so several ingest_01 / index_02
+# workers (processes on one host, or hosts sharing the tracker) can pull
+# documents without processing one twice.
+#
+#   queued --claim--> leased --complete--> done
+#                       |  \--fail--> queued (retry) / failed (max attempts)
+#                       \--lease expired (worker died)--> queued
+#
+# A claim sets a random lease token; heartbeat/complete/fail only apply while
+# the token still matches, so a worker whose lease expired and was re-claimed
+# elsewhere cannot overwrite the new owner's state.
+
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "300"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+
+STATUSES = ('queued', 'leased', 'done', 'failed')
+
+_QUEUE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS work_queue (
+        stage TEXT NOT NULL,
+        item TEXT NOT NULL,
+        payload TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_token TEXT,
+        lease_expires REAL,
+        enqueued_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        last_error TEXT,
+        PRIMARY KEY (stage, item)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_work_queue_claim
+    ON work_queue (stage, status, enqueued_at)
+    """,
+)
+
+def worker_id() -> str:
+    """host:pid of this process (recorded on the rows it leases)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class Lease:
+    """A claimed queue item; pass it back to heartbeat/complete/fail"""
+
+    def __init__(self, stage, item, payload, token, attempts, expires):
+        self.stage = stage
+        self.item = item
+        self.payload = payload
+        self.token = token
+        self.attempts = attempts
+        self.expires = expires
+        self.lost = False
+
+    def __repr__(self):
+        return f"Lease({self.stage}:{self.item[:12]}, attempt {self.attempts})"
+
+class WorkQueue:
+    """
+    One stage ('ingest', 'index') of the work queue.
+
+    Times are wall-clock (time.time()) so leases mean the same on every
+    host; keep QUEUE_LEASE_SECONDS well above any clock skew between hosts.
+    """
+
+    def __init__(self, stage: str, lease_seconds: float = QUEUE_LEASE_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS, tracker=None):
+        self.stage = stage
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.tracker = tracker or get_tracker()
+        self.worker = worker_id()
+        self._ready_pid = None
+
+    def _transaction(self):
+        if self._ready_pid != os.getpid():
+            with self.tracker.transaction() as conn:
+                for statement in _QUEUE_SCHEMA:
+                    conn.execute(statement)
+            self._ready_pid = os.getpid()
+        return self.tracker.transaction()
+
+    def enqueue(self, item: str, payload: Optional[Dict[str, Any]] = None, requeue: bool = False) -> bool:
+        """
+        Add an item (no-op if it is already queued or leased).
+
+        Args:
+            item: Unique key within the stage (a file hash)
+            payload: JSON-serializable details for the worker
+            requeue: Also reset a done/failed item to queued
+
+        Returns:
+            True if the item was added or re-queued
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO work_queue (stage, item, payload, enqueued_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (stage, item) DO UPDATE SET
+                    payload = excluded.payload, status = 'queued', attempts = 0,
+                    worker = NULL, lease_token = NULL, lease_expires = NULL,
+                    last_error = NULL, enqueued_at = excluded.enqueued_at,
+                    updated_at = excluded.updated_at
+                WHERE ? AND status IN ('done', 'failed')
+            """, (self.stage, item, json.dumps(payload or {}), now, now, int(requeue)))
+            return cursor.rowcount > 0
+
+    def requeue_expired(self) -> int:
+        """
+        Return items whose lease ran out (worker died or hung) to the queue.
+
+        Items already tried max_attempts times are marked failed instead.
+
+        Returns:
+            Number of expired leases released
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE work_queue
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    last_error = 'lease expired (worker ' || COALESCE(worker, '?') || ')',
+                    worker = NULL, lease_token = NULL, lease_expires = NULL, updated_at = ?
+                WHERE stage = ? AND status = 'leased' AND lease_expires < ?
+            """, (self.max_attempts, now, self.stage, now))
+            return cursor.rowcount
+
+    def claim(self) -> Optional[Lease]:
+        """
+        Lease the oldest queued item.
+
+        Returns:
+            Lease, or None when nothing is queued
+        """
+        now = time.time()
+        token = uuid.uuid4().hex
+        expires = now + self.lease_seconds
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT item, payload, attempts FROM work_queue
+                WHERE stage = ? AND status = 'queued'
+                ORDER BY enqueued_at LIMIT 1
+            """, (self.stage,)).fetchone()
+            if row is None:
+                return None
+            item, payload, attempts = row
+            conn.execute("""
+                UPDATE work_queue
+                SET status = 'leased', worker = ?, lease_token = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE stage = ? AND item = ?
+            """, (self.worker, token, expires, now, self.stage, item))
+        return Lease(self.stage, item, json.loads(payload or '{}'), token, attempts + 1, expires)
+
+    def _update_lease(self, lease: Lease, sql: str, params) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                sql + " WHERE stage = ? AND item = ? AND status = 'leased' AND lease_token = ?",
+                (*params, lease.stage, lease.item, lease.token)
+            )
+            if cursor.rowcount == 0:
+                lease.lost = True
+            return cursor.rowcount > 0
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend the lease; False if it was lost (expired and re-claimed elsewhere)"""
+        expires = time.time() + self.lease_seconds
+        ok = self._update_lease(lease, "UPDATE work_queue SET lease_expires = ?, updated_at = ?",
+                                (expires, time.time()))
+        if ok:
+            lease.expires = expires
+        return ok
+
+    def complete(self, lease: Lease) -> bool:
+        """Mark done; False if the lease was lost"""
+        return self._update_lease(
+            lease,
+            "UPDATE work_queue SET status = 'done', lease_token = NULL, lease_expires = NULL, "
+            "last_error = NULL, updated_at = ?",
+            (time.time(),)
+        )
+
+    def fail(self, lease: Lease, error: str, retry: bool = True) -> bool:
+        """Re-queue (or mark failed after max_attempts / when retry=False); False if the lease was lost"""
+        status = 'queued' if retry and lease.attempts < self.max_attempts else 'failed'
+        return self._update_lease(
+            lease,
+            "UPDATE work_queue SET status = ?, worker = NULL, lease_token = NULL, "
+            "lease_expires = NULL, last_error = ?, updated_at = ?",
+            (status, str(error)[:1000], time.time())
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Item count per status"""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM work_queue WHERE stage = ? GROUP BY status",
+                (self.stage,)
+            ).fetchall()
+        counts = {status: 0 for status in STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+    def keep_alive(self, lease: Lease, interval: Optional[float] = None) -> 'LeaseKeeper':
+        return LeaseKeeper(self, lease, interval or self.lease_seconds / 3)
+
+    def items(self, poll_seconds: float = QUEUE_POLL_SECONDS):
+        """
+        Claim items until the stage is drained.
+
+        Expired leases are re-queued on every poll. While other workers still
+        hold leases this keeps polling, since their items come back if they die.
+
+        Yields:
+            Lease objects (the caller completes or fails each one)
+        """
+        while True:
+            self.requeue_expired()
+            lease = self.claim()
+            if lease is not None:
+                yield lease
+                continue
+            if self.stats()['leased'] == 0:
+                return
+            time.sleep(poll_seconds)
+
+class LeaseKeeper:
+    """
+    Heartbeat a lease from a background thread while the work runs.
+
+        with queue.keep_alive(lease):
+            process(lease.payload)
+    """
+
+    def __init__(self, queue: WorkQueue, lease: Lease, interval: float):
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.lease):
+                    print(f"   ⚠️  Lost lease on {self.lease.item[:12]} (claimed by another worker)")
+                    return
+            except Exception as e:
+                print(f"   ⚠️  Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self.lease
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()